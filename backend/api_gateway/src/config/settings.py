@@ -56,6 +56,11 @@ class Settings(BaseSettings):
     # 路由配置
     ROUTE_PREFIX: str = "/api/v1"
     
+    # Prometheus指标抓取：不走JWT认证，需携带 Authorization: Bearer <METRICS_TOKEN>，照常限流；
+    # 未配置令牌时网关不开放指标端点
+    METRICS_PATH: str = "/metrics"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    
     # 健康检查路径（不需要认证）
     PUBLIC_PATHS: List[str] = [
         "/health",
@@ -15,7 +15,17 @@ from api_gateway.src.middleware.cors import setup_cors
 from api_gateway.src.middleware.auth import auth_middleware
 from api_gateway.src.middleware.rate_limit import rate_limit_middleware
 from api_gateway.src.routes.gateway import router
+from api_gateway.src.routes.ops import metrics_router, router as ops_router
 from shared.middleware.error_handler import error_handler_middleware
+from shared.utils.log_sampling import access_log_sampler
+from shared.utils.loop_monitor import loop_monitor
+from shared.utils.metrics_registry import metrics_registry
+from shared.utils.monitoring import alert_manager, metrics_collector
+from shared.utils.request_context import update_request_context
+from shared.utils.tracing import tracer
+
+metrics_registry.configure(service="api_gateway")
+tracer.configure(service="api_gateway")
 
 
 app = FastAPI(
@@ -38,8 +48,10 @@ async def rate_limit_middleware_wrapper(request: Request, call_next):
 @app.middleware("http")
 async def auth_middleware_wrapper(request: Request, call_next):
     """认证中间件包装器"""
-    # 检查是否是公开路径
-    if any(request.url.path.startswith(path) for path in settings.PUBLIC_PATHS):
+    # 检查是否是公开路径（指标端点由抓取令牌保护，不需要JWT）
+    if request.url.path == settings.METRICS_PATH or any(
+        request.url.path.startswith(path) for path in settings.PUBLIC_PATHS
+    ):
         response = await call_next(request)
         return response
     
@@ -55,14 +67,17 @@ async def auth_middleware_wrapper(request: Request, call_next):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # 将用户信息添加到请求状态中
+    # 将用户信息添加到请求状态和日志上下文中
     request.state.user = user
+    update_request_context(user_id=user.get("user_id"))
     
     response = await call_next(request)
     return response
 
 
-# 注册路由
+# 注册路由（指标和运维端点必须在通配转发路由之前注册）
+app.include_router(ops_router)
+app.include_router(metrics_router)
 app.include_router(router)
 
 # 错误处理中间件（必须在最后注册）
@@ -71,6 +86,26 @@ async def error_handler(request, call_next):
     return await error_handler_middleware(request, call_next)
 
 
+@app.on_event("startup")
+async def start_background_workers():
+    """启动后台任务"""
+    metrics_collector.start()
+    metrics_registry.start_exporter()
+    alert_manager.start_evaluator()
+    loop_monitor.start()
+    access_log_sampler.start_refresher()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """停止后台任务"""
+    metrics_collector.stop(timeout=5)
+    metrics_registry.stop_exporter(timeout=5)
+    alert_manager.stop_evaluator(timeout=5)
+    loop_monitor.stop(timeout=5)
+    access_log_sampler.stop_refresher(timeout=5)
+
+
 @app.get("/")
 async def root():
     """根路径"""
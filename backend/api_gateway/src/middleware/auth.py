@@ -67,6 +67,7 @@ async def get_current_user(request: Request) -> Optional[dict]:
         "user_id": payload.get("sub"),
         "username": payload.get("username"),
         "email": payload.get("email"),
+        "is_admin": payload.get("admin") is True,
     }
 
 
@@ -76,8 +77,10 @@ async def auth_middleware(request: Request, call_next):
     
     对需要认证的路径进行 Token 验证
     """
-    # 检查是否是公开路径
-    if any(request.url.path.startswith(path) for path in settings.PUBLIC_PATHS):
+    # 检查是否是公开路径（指标端点由抓取令牌保护，不需要JWT）
+    if request.url.path == settings.METRICS_PATH or any(
+        request.url.path.startswith(path) for path in settings.PUBLIC_PATHS
+    ):
         response = await call_next(request)
         return response
     
@@ -13,6 +13,7 @@ backend_path = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
 from api_gateway.src.config.settings import settings
+from shared.utils.memory_profiler import memory_profiler
 
 
 # 简单的内存限流器（生产环境应使用 Redis）
@@ -53,10 +54,19 @@ class RateLimiter:
             remaining = max_requests - len(self.requests[key])
         
         return len(self.requests[key]) <= max_requests, remaining
+    
+    def memory_summary(self) -> Dict[str, int]:
+        """限流记录的键数量和时间戳总数"""
+        timestamps = list(self.requests.values())
+        return {
+            "keys": len(timestamps),
+            "timestamps": sum(len(times) for times in timestamps),
+        }
 
 
 # 全局限流器实例
 rate_limiter = RateLimiter()
+memory_profiler.register_structure("rate_limiter.requests", rate_limiter.memory_summary)
 
 
 def get_client_ip(request: Request) -> str:
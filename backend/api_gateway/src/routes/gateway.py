@@ -13,6 +13,8 @@ backend_path = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
 from api_gateway.src.config.settings import settings
+from shared.utils.request_context import REQUEST_ID_HEADER, get_request_context
+from shared.utils.tracing import tracer
 
 
 router = APIRouter()
@@ -50,11 +52,16 @@ async def forward_request(
     # 准备请求头（排除一些不需要转发的头）
     headers = {}
     for key, value in request.headers.items():
-        # 跳过一些不需要转发的头
-        if key.lower() in ["host", "content-length", "connection"]:
+        # 跳过一些不需要转发的头（traceparent由网关的span重新生成，请求ID使用网关的请求上下文）
+        if key.lower() in ["host", "content-length", "connection", "traceparent", "x-request-id"]:
             continue
         headers[key] = value
     
+    # 下游服务沿用网关的请求ID，日志可以按同一个request_id关联
+    context = get_request_context()
+    if context is not None:
+        headers[REQUEST_ID_HEADER] = context.request_id
+    
     # 如果有用户信息，添加到请求头
     if hasattr(request.state, "user") and request.state.user:
         user = request.state.user
@@ -62,16 +69,23 @@ async def forward_request(
             headers["X-User-ID"] = str(user.get("user_id", ""))
             headers["X-Username"] = user.get("username", "")
     
-    # 转发请求
+    # 转发请求（下游服务通过traceparent延续同一个追踪）
     async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
         try:
-            response = await client.request(
-                method=method or request.method,
-                url=full_url,
-                headers=headers,
-                content=body,
-                params=dict(request.query_params),
-            )
+            with tracer.span(
+                "gateway.forward",
+                kind="client",
+                attributes={"http.method": method or request.method, "http.url": full_url}
+            ) as span:
+                tracer.inject(headers, span)
+                response = await client.request(
+                    method=method or request.method,
+                    url=full_url,
+                    headers=headers,
+                    content=body,
+                    params=dict(request.query_params),
+                )
+                span.set_attribute("http.status_code", response.status_code)
             
             # 创建响应
             response_headers = dict(response.headers)
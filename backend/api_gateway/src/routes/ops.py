@@ -0,0 +1,124 @@
+"""
+API Gateway 运维端点
+
+网关没有数据库，不挂载各服务共用的管理路由（依赖数据库模型校验管理员）；
+这里暴露网关进程自身的内存诊断（数据结构统计、tracemalloc快照对比），
+按令牌中的 admin 声明校验管理员权限（登录时由 user_token_claims 写入）。
+
+Prometheus指标端点（cluster范围会读取Redis中所有worker的快照）同样不对公网开放：
+需携带 METRICS_TOKEN 抓取令牌，未配置令牌时返回403。
+"""
+from fastapi import APIRouter, Depends, Header, Query, Request
+from typing import Optional
+import asyncio
+import hmac
+import sys
+from pathlib import Path
+
+# 添加backend目录到路径
+backend_path = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(backend_path))
+
+from api_gateway.src.config.settings import settings
+from shared.api.metrics import get_metrics
+from shared.utils.exceptions import AuthenticationError, AuthorizationError
+from shared.utils.memory_profiler import memory_profiler
+
+
+async def require_gateway_admin(request: Request) -> dict:
+    """
+    要求当前用户是管理员（不访问数据库，只看认证中间件解析出的令牌声明）
+    
+    Raises:
+        AuthenticationError: 未认证
+        AuthorizationError: 令牌没有 admin 声明
+    """
+    user = getattr(request.state, "user", None)
+    if not user:
+        raise AuthenticationError("未授权，请先登录")
+    if not user.get("is_admin"):
+        raise AuthorizationError("需要管理员权限", resource="gateway")
+    return user
+
+
+async def require_metrics_token(authorization: str = Header("")):
+    """
+    要求请求携带指标抓取令牌（Authorization: Bearer <METRICS_TOKEN>）
+    
+    Raises:
+        AuthorizationError: 未配置令牌或令牌不匹配
+    """
+    expected = settings.METRICS_TOKEN
+    token = authorization[len("Bearer "):].strip() if authorization.startswith("Bearer ") else ""
+    if not expected or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise AuthorizationError("需要指标抓取令牌", resource="metrics")
+
+
+# 指标端点（复用各服务共用的实现，外加抓取令牌校验）
+metrics_router = APIRouter(tags=["监控"], dependencies=[Depends(require_metrics_token)])
+metrics_router.add_api_route(settings.METRICS_PATH, get_metrics, methods=["GET"], include_in_schema=False)
+
+
+router = APIRouter(
+    prefix="/gateway",
+    tags=["网关运维"],
+    dependencies=[Depends(require_gateway_admin)]
+)
+
+
+@router.get("/memory", response_model=dict)
+async def get_gateway_memory():
+    """tracemalloc状态、已保留的快照和网关进程内数据结构（限流器记录等）的对象数量"""
+    data = memory_profiler.status()
+    data["service"] = "api_gateway"
+    data["structures"] = memory_profiler.structure_summary()
+    
+    return {
+        "code": 200,
+        "data": data
+    }
+
+
+@router.post("/memory/tracemalloc/start", response_model=dict)
+async def start_tracemalloc(
+    frames: int = Query(10, ge=1, le=100, description="每次分配记录的调用栈深度")
+):
+    """在网关进程中启动tracemalloc（会增加内存和CPU开销，用完后应停止）"""
+    return {
+        "code": 200,
+        "data": memory_profiler.start(frames)
+    }
+
+
+@router.post("/memory/tracemalloc/stop", response_model=dict)
+async def stop_tracemalloc():
+    """停止tracemalloc并丢弃快照"""
+    return {
+        "code": 200,
+        "data": memory_profiler.stop()
+    }
+
+
+@router.post("/memory/snapshots", response_model=dict)
+async def take_memory_snapshot(
+    label: Optional[str] = Query(None, max_length=100, description="快照标签")
+):
+    """拍摄内存快照"""
+    return {
+        "code": 200,
+        "data": await asyncio.to_thread(memory_profiler.take_snapshot, label)
+    }
+
+
+@router.get("/memory/diff", response_model=dict)
+async def get_memory_diff(
+    base: Optional[int] = Query(None, description="基准快照ID，默认为目标快照的前一个"),
+    target: Optional[int] = Query(None, description="目标快照ID，默认为最新快照"),
+    groupBy: str = Query("lineno", pattern="^(lineno|filename|traceback)$", description="按分配位置分组的方式"),
+    limit: int = Query(20, ge=1, le=200, description="返回的条目数")
+):
+    """比较两个快照，返回内存增长最多的分配位置和数据结构对象数量的变化"""
+    return {
+        "code": 200,
+        "data": await asyncio.to_thread(memory_profiler.diff, base, target, groupBy, limit)
+    }
@@ -0,0 +1,20 @@
+-- 游标（keyset）分页索引
+-- 排序键以主键结尾，索引需要包含 id 才能直接按 (…, id) 定位下一页。
+-- 使用 CONCURRENTLY 建索引不锁表；CONCURRENTLY 不能在事务块中执行，
+-- 请直接用 psql -f 运行本文件（不要加 --single-transaction / -1）。
+
+-- 消息列表：(conversation_id, created_at, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_conversation_created_id
+    ON messages(conversation_id, created_at, id);
+
+-- 任务列表：(user_id, created_at DESC, id DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tasks_user_created
+    ON tasks(user_id, created_at DESC, id DESC);
+
+-- 对话列表：(user_id, is_pinned DESC, updated_at DESC, id DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_user_pinned_id
+    ON conversations(user_id, is_pinned DESC, updated_at DESC, id DESC);
+
+-- 新索引是旧索引的超集，删除被取代的索引以减少写放大
+DROP INDEX CONCURRENTLY IF EXISTS idx_messages_conversation_created;
+DROP INDEX CONCURRENTLY IF EXISTS idx_conversations_user_pinned;
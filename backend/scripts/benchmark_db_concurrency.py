@@ -0,0 +1,124 @@
+"""数据库访问并发基准测试
+
+在同一个事件循环中并发执行 N 个“请求”（每个请求调用一次 TaskService.get_tasks，
+可附加 pg_sleep 模拟慢查询），对比两种会话：
+
+- sync: 同步Session经 SyncSessionAdapter 调用（迁移前的行为，查询阻塞事件循环）
+- async: asyncpg驱动的 AsyncSession（查询期间事件循环可以处理其他请求）
+
+输出吞吐量、请求耗时分位数和事件循环最大调度延迟。
+
+用法（需要可访问的PostgreSQL，读取 DATABASE_URL）：
+    python scripts/benchmark_db_concurrency.py --mode both --concurrency 50 --requests 500 --sleep-ms 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加backend目录到路径
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from sqlalchemy import text
+
+from shared.config.database import (
+    SyncSessionAdapter,
+    get_async_session_local,
+    get_session_local,
+)
+from services.agent_service.src.services.task_service import TaskService
+
+
+async def _heartbeat(stop: asyncio.Event, lags: List[float], interval: float = 0.01):
+    """记录事件循环调度延迟"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(time.perf_counter() - expected, 0.0))
+
+
+async def _request(db, user_id: uuid.UUID, sleep_ms: float):
+    if sleep_ms > 0:
+        await db.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": sleep_ms / 1000})
+    await TaskService(db).get_tasks(user_id, page=1, page_size=20)
+
+
+async def _run_sync(user_id: uuid.UUID, sleep_ms: float) -> float:
+    session = get_session_local()()
+    start = time.perf_counter()
+    try:
+        await _request(SyncSessionAdapter(session), user_id, sleep_ms)
+    finally:
+        session.close()
+    return time.perf_counter() - start
+
+
+async def _run_async(user_id: uuid.UUID, sleep_ms: float) -> float:
+    start = time.perf_counter()
+    async with get_async_session_local()() as db:
+        await _request(db, user_id, sleep_ms)
+    return time.perf_counter() - start
+
+
+async def benchmark(mode: str, concurrency: int, requests: int, sleep_ms: float) -> Dict[str, Any]:
+    """以指定并发执行 requests 个请求"""
+    run = _run_sync if mode == "sync" else _run_async
+    user_id = uuid.uuid4()
+    semaphore = asyncio.Semaphore(concurrency)
+    durations: List[float] = []
+    lags: List[float] = []
+
+    async def one():
+        async with semaphore:
+            durations.append(await run(user_id, sleep_ms))
+
+    # 预热连接池
+    await run(user_id, 0)
+
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+
+    durations.sort()
+    return {
+        "mode": mode,
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(durations) * 1000, 2),
+        "p95_ms": round(durations[int(len(durations) * 0.95) - 1] * 1000, 2),
+        "p99_ms": round(durations[int(len(durations) * 0.99) - 1] * 1000, 2),
+        "max_loop_lag_ms": round(max(lags, default=0.0) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库访问并发基准测试（同步Session vs AsyncSession）")
+    parser.add_argument("--mode", choices=("sync", "async", "both"), default="both")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发请求数")
+    parser.add_argument("--requests", type=int, default=500, help="总请求数")
+    parser.add_argument("--sleep-ms", type=float, default=20.0, help="每个请求附加的pg_sleep时长（毫秒），0表示不附加")
+    args = parser.parse_args()
+
+    if os.getenv("TESTING") == "true" or not os.getenv("DATABASE_URL", "").startswith("postgresql"):
+        parser.error("需要设置指向PostgreSQL的DATABASE_URL，且不能处于TESTING模式")
+
+    modes = ("sync", "async") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        result = asyncio.run(benchmark(mode, args.concurrency, args.requests, args.sleep_ms))
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,7 @@ sys.path.insert(0, str(backend_path))
 from shared.config.database import get_db
 from shared.models.user import UserCreate
 from shared.utils.exceptions import AuthenticationError
-from shared.utils.auth import create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from shared.utils.auth import create_access_token, get_current_user, user_token_claims, ACCESS_TOKEN_EXPIRE_MINUTES
 from services.agent_service.src.services.auth_service import AuthService
 
 router = APIRouter(prefix="/auth", tags=["认证"])
@@ -34,7 +34,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         user = auth_service.create_user(user_data)
         
         # 生成 Token
-        access_token = create_access_token(data={"sub": str(user.id)})
+        access_token = create_access_token(data=user_token_claims(user))
         
         return {
             "code": 200,
@@ -63,7 +63,7 @@ async def login(
     if not user or not auth_service.verify_password(form_data.password, user.password_hash):
         raise AuthenticationError("邮箱或密码错误")
     
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_access_token(data=user_token_claims(user))
     
     return {
         "code": 200,
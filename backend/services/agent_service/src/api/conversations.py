@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from uuid import UUID
 
@@ -10,7 +10,7 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
-from shared.config.database import get_db
+from shared.config.database import get_async_db, get_read_db
 from shared.models.conversation import ConversationCreate, ConversationUpdate
 from services.agent_service.src.services.conversation_service import ConversationService
 from shared.utils.auth import get_current_user
@@ -21,11 +21,11 @@ router = APIRouter(prefix="/conversations", tags=["对话"])
 async def create_conversation(
     conversation_data: ConversationCreate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建对话"""
     service = ConversationService(db)
-    conversation = service.create_conversation(current_user.id, conversation_data)
+    conversation = await service.create_conversation(current_user.id, conversation_data)
     
     return {
         "code": 200,
@@ -44,24 +44,31 @@ async def get_conversations(
     page: int = Query(1, ge=1),
     pageSize: int = Query(20, ge=1, le=100),
     pinned: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="上一页返回的nextCursor，传入时按游标翻页并忽略page"),
+    includeTotal: Optional[bool] = Query(None, description="是否返回总数，默认OFFSET分页返回、游标分页不返回"),
+    exactTotal: bool = Query(False, description="是否精确统计总数，默认使用维护的计数或估计值"),
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取对话列表"""
     service = ConversationService(db)
-    conversations, total = service.get_conversations(
+    conversations, next_cursor, total = await service.get_conversations_page(
         user_id=current_user.id,
-        page=page,
-        page_size=pageSize,
-        pinned=pinned
+        limit=pageSize,
+        cursor=cursor,
+        offset=0 if cursor else (page - 1) * pageSize,
+        pinned=pinned,
+        include_total=includeTotal if includeTotal is not None else not cursor,
+        exact_total=exactTotal
     )
     
     return {
         "code": 200,
         "data": {
-            "page": page,
+            "page": None if cursor else page,
             "pageSize": pageSize,
             "total": total,
+            "nextCursor": next_cursor,
             "items": [
                 {
                     "id": str(c.id),
@@ -81,11 +88,11 @@ async def get_conversations(
 async def get_conversation(
     conversation_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取对话详情"""
     service = ConversationService(db)
-    conversation = service.get_conversation(conversation_id, current_user.id)
+    conversation = await service.get_conversation(conversation_id, current_user.id)
     
     if not conversation:
         raise HTTPException(status_code=404, detail="对话不存在")
@@ -107,11 +114,11 @@ async def update_conversation(
     conversation_id: UUID,
     conversation_data: ConversationUpdate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新对话"""
     service = ConversationService(db)
-    conversation = service.update_conversation(
+    conversation = await service.update_conversation(
         conversation_id, current_user.id, conversation_data
     )
     
@@ -132,11 +139,11 @@ async def update_conversation(
 async def delete_conversation(
     conversation_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除对话"""
     service = ConversationService(db)
-    success = service.delete_conversation(conversation_id, current_user.id)
+    success = await service.delete_conversation(conversation_id, current_user.id)
     
     if not success:
         raise HTTPException(status_code=404, detail="对话不存在")
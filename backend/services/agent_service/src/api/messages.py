@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from uuid import UUID
 from datetime import datetime
@@ -11,7 +11,7 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
-from shared.config.database import get_db
+from shared.config.database import get_async_db
 from shared.models.message import MessageCreate
 from services.agent_service.src.services.message_service import MessageService
 from shared.utils.auth import get_current_user
@@ -24,8 +24,11 @@ async def get_messages(
     page: int = Query(1, ge=1),
     pageSize: int = Query(50, ge=1, le=100),
     before: Optional[str] = Query(None, description="获取指定时间之前的消息，格式：YYYY-MM-DDTHH:MM:SS"),
+    cursor: Optional[str] = Query(None, description="上一页返回的nextCursor，传入时按游标翻页并忽略page"),
+    includeTotal: Optional[bool] = Query(None, description="是否返回总数，默认OFFSET分页返回、游标分页不返回"),
+    exactTotal: bool = Query(False, description="是否精确统计总数，默认使用维护的计数或估计值"),
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取消息列表"""
     service = MessageService(db)
@@ -38,20 +41,24 @@ async def get_messages(
         except ValueError:
             raise HTTPException(status_code=400, detail="before参数格式错误，请使用ISO格式：YYYY-MM-DDTHH:MM:SS")
     
-    messages, total = service.get_messages(
+    messages, next_cursor, total = await service.get_messages_page(
         conversation_id=conversation_id,
         user_id=current_user.id,
-        page=page,
-        page_size=pageSize,
-        before=before_datetime
+        limit=pageSize,
+        cursor=cursor,
+        offset=0 if cursor else (page - 1) * pageSize,
+        before=before_datetime,
+        include_total=includeTotal if includeTotal is not None else not cursor,
+        exact_total=exactTotal
     )
     
     return {
         "code": 200,
         "data": {
-            "page": page,
+            "page": None if cursor else page,
             "pageSize": pageSize,
             "total": total,
+            "nextCursor": next_cursor,
             "items": [
                 {
                     "id": str(m.id),
@@ -71,7 +78,7 @@ async def create_message(
     conversation_id: UUID,
     message_data: MessageCreate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建消息"""
     service = MessageService(db)
@@ -79,7 +86,7 @@ async def create_message(
     # 确保conversation_id与路径参数一致
     message_data.conversation_id = conversation_id
     
-    message = service.create_message(
+    message = await service.create_message(
         conversation_id=conversation_id,
         user_id=current_user.id,
         message_data=message_data
@@ -106,11 +113,11 @@ async def get_message(
     conversation_id: UUID,
     message_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取单条消息"""
     service = MessageService(db)
-    message = service.get_message(
+    message = await service.get_message(
         message_id=message_id,
         conversation_id=conversation_id,
         user_id=current_user.id
@@ -136,11 +143,11 @@ async def delete_message(
     conversation_id: UUID,
     message_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除消息"""
     service = MessageService(db)
-    success = service.delete_message(
+    success = await service.delete_message(
         message_id=message_id,
         conversation_id=conversation_id,
         user_id=current_user.id
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
 import sys
@@ -9,7 +9,7 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
-from shared.config.database import get_db
+from shared.config.database import get_async_db
 from shared.models.screenplay import ScreenplayDraft, ScreenplayConfirm, ScreenplayUpdate, ScreenplayResponse
 from services.agent_service.src.services.screenplay_service import ScreenplayService
 from shared.utils.auth import get_current_user
@@ -20,7 +20,7 @@ router = APIRouter(prefix="/screenplays", tags=["剧本"])
 async def create_screenplay_draft(
     draft_data: ScreenplayDraft,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """生成剧本草稿"""
     service = ScreenplayService(db)
@@ -75,13 +75,13 @@ async def confirm_screenplay(
     screenplay_id: UUID,
     confirm_data: ScreenplayConfirm,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """确认剧本"""
     service = ScreenplayService(db)
     
     try:
-        screenplay = service.confirm_screenplay(
+        screenplay = await service.confirm_screenplay(
             screenplay_id=screenplay_id,
             user_id=current_user.id,
             feedback=confirm_data.feedback
@@ -106,11 +106,11 @@ async def confirm_screenplay(
 async def get_screenplay(
     screenplay_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取剧本详情"""
     service = ScreenplayService(db)
-    screenplay = service.get_screenplay(screenplay_id, current_user.id)
+    screenplay = await service.get_screenplay(screenplay_id, current_user.id)
     
     if not screenplay:
         raise HTTPException(status_code=404, detail="剧本不存在")
@@ -158,11 +158,11 @@ async def update_screenplay(
     screenplay_id: UUID,
     update_data: ScreenplayUpdate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新剧本"""
     service = ScreenplayService(db)
-    screenplay = service.update_screenplay(
+    screenplay = await service.update_screenplay(
         screenplay_id=screenplay_id,
         user_id=current_user.id,
         title=update_data.title
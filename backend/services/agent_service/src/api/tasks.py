@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from uuid import UUID
 
 import sys
@@ -9,7 +10,7 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
-from shared.config.database import get_db
+from shared.config.database import get_async_db, get_read_db
 from shared.models.task import TaskCreate
 from services.agent_service.src.services.task_service import TaskService
 from shared.utils.auth import get_current_user
@@ -21,11 +22,11 @@ async def create_task(
     task_data: TaskCreate,
     background_tasks: BackgroundTasks,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建任务"""
     service = TaskService(db)
-    task = service.create_task(current_user.id, task_data)
+    task = await service.create_task(current_user.id, task_data)
     
     # 如果是剧本生成任务，启动后台处理
     if task_data.type.value == "screenplay":
@@ -50,23 +51,30 @@ async def create_task(
 async def get_tasks(
     page: int = 1,
     pageSize: int = 20,
+    cursor: Optional[str] = None,
+    includeTotal: Optional[bool] = None,
+    exactTotal: bool = False,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """获取任务列表"""
+    """获取任务列表（传入cursor时按游标翻页并忽略page，总数默认只在OFFSET分页时返回，exactTotal时精确统计）"""
     service = TaskService(db)
-    tasks, total = service.get_tasks(
+    tasks, next_cursor, total = await service.get_tasks_page(
         user_id=current_user.id,
-        page=page,
-        page_size=pageSize
+        limit=pageSize,
+        cursor=cursor,
+        offset=0 if cursor else (page - 1) * pageSize,
+        include_total=includeTotal if includeTotal is not None else not cursor,
+        exact_total=exactTotal
     )
     
     return {
         "code": 200,
         "data": {
-            "page": page,
+            "page": None if cursor else page,
             "pageSize": pageSize,
             "total": total,
+            "nextCursor": next_cursor,
             "items": [
                 {
                     "id": str(t.id),
@@ -84,11 +92,11 @@ async def get_tasks(
 async def get_task(
     task_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取任务详情"""
     service = TaskService(db)
-    task = service.get_task(task_id, current_user.id)
+    task = await service.get_task(task_id, current_user.id)
     
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -111,11 +119,11 @@ async def get_task(
 async def get_task_progress(
     task_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取任务进度"""
     service = TaskService(db)
-    progress = service.get_task_progress(task_id, current_user.id)
+    progress = await service.get_task_progress(task_id, current_user.id)
     
     if not progress:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -124,3 +132,21 @@ async def get_task_progress(
         "code": 200,
         "data": progress
     }
+
+@router.get("/{task_id}/timeline", response_model=dict)
+async def get_task_timeline(
+    task_id: UUID,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取任务各阶段耗时（排队、密钥查询、调用服务商、轮询、写库、通知）"""
+    service = TaskService(db)
+    timeline = await service.get_task_timeline(task_id, current_user.id)
+    
+    if not timeline:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    return {
+        "code": 200,
+        "data": timeline
+    }
@@ -17,6 +17,8 @@ backend_path = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
 from shared.utils.exceptions import AuthenticationError
+from shared.utils.memory_profiler import memory_profiler
+from shared.utils.metrics_registry import metrics_registry
 
 # JWT配置（与auth.py保持一致）
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -115,10 +117,25 @@ class ConnectionManager:
         # 清理断开的连接
         for conn in disconnected:
             self.disconnect(conn)
+    
+    def memory_summary(self) -> Dict[str, int]:
+        """连接表中的条目数量（用于排查连接断开后未清理的记录）"""
+        return {
+            "active_users": len(self.active_connections),
+            "active_connections": sum(len(connections) for connections in list(self.active_connections.values())),
+            "connection_subscriptions": len(self.connection_subscriptions),
+            "subscribed_tasks": sum(len(tasks) for tasks in list(self.connection_subscriptions.values())),
+            "connection_users": len(self.connection_users),
+        }
 
 
 # 全局连接管理器实例
 manager = ConnectionManager()
+memory_profiler.register_structure("websocket.manager", manager.memory_summary)
+
+metrics_registry.gauge(
+    "websocket_connections", "当前WebSocket连接数"
+).set_function(lambda: len(manager.connection_users))
 
 
 def verify_websocket_token(token: str) -> UUID:
@@ -2,6 +2,8 @@ import httpx
 from typing import Dict, Any, Optional
 import json
 
+from shared.utils.tracing import tracer
+
 class GLMClient:
     """智谱 GLM API 客户端"""
     
@@ -34,17 +36,19 @@ class GLMClient:
         stream: bool = False
     ) -> Dict[str, Any]:
         """聊天补全"""
-        response = await self.client.post(
-            "/chat/completions",
-            json={
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                "stream": stream
-            }
-        )
-        response.raise_for_status()
-        return response.json()
+        with tracer.span("glm.chat_completion", kind="client", attributes={"llm.model": model}) as span:
+            response = await self.client.post(
+                "/chat/completions",
+                json={
+                    "model": model,
+                    "messages": messages,
+                    "temperature": temperature,
+                    "stream": stream
+                }
+            )
+            span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+            return response.json()
     
     async def generate_screenplay(
         self,
@@ -12,7 +12,18 @@ sys.path.insert(0, str(backend_path))
 
 from services.agent_service.src.api import auth, conversations, tasks, screenplays, messages
 from services.agent_service.src.api.websocket import websocket_endpoint
+from shared.api import admin, metrics
 from shared.middleware.error_handler import error_handler_middleware
+from shared.utils.cache import cache_manager
+from shared.utils.log_sampling import access_log_sampler
+from shared.utils.loop_monitor import loop_monitor
+from shared.utils.metrics_registry import metrics_registry
+from shared.utils.monitoring import alert_manager, metrics_collector
+from shared.utils.task_timeline import task_log_writer
+from shared.utils.tracing import tracer
+
+metrics_registry.configure(service="agent_service")
+tracer.configure(service="agent_service")
 
 app = FastAPI(
     title="AI漫导 Agent Service",
@@ -40,6 +51,8 @@ app.include_router(conversations.router, prefix="/api/v1")
 app.include_router(tasks.router, prefix="/api/v1")
 app.include_router(screenplays.router, prefix="/api/v1")
 app.include_router(messages.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
+app.include_router(metrics.router)
 
 # 注册WebSocket路由
 @app.websocket("/ws")
@@ -47,6 +60,28 @@ async def websocket_route(websocket):
     """WebSocket 路由"""
     await websocket_endpoint(websocket)
 
+@app.on_event("startup")
+async def start_background_workers():
+    """启动后台任务"""
+    cache_manager.start_stats_exporter()
+    metrics_collector.start()
+    metrics_registry.start_exporter()
+    alert_manager.start_evaluator()
+    loop_monitor.start()
+    access_log_sampler.start_refresher()
+    task_log_writer.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """停止后台任务"""
+    cache_manager.stop_stats_exporter(timeout=5)
+    metrics_collector.stop(timeout=5)
+    metrics_registry.stop_exporter(timeout=5)
+    alert_manager.stop_evaluator(timeout=5)
+    loop_monitor.stop(timeout=5)
+    access_log_sampler.stop_refresher(timeout=5)
+    task_log_writer.stop(timeout=5)
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -49,7 +49,6 @@ class AuthService:
         
         self.db.add(user)
         self.db.commit()
-        self.db.refresh(user)
         
         return user
     
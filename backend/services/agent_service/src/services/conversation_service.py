@@ -1,17 +1,21 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select, update
 from uuid import UUID
 from typing import Tuple, List, Optional
+from datetime import datetime
 from shared.models.db_models import Conversation, Message
 from shared.models.conversation import ConversationCreate, ConversationUpdate
+from shared.utils.counts import count_cache, count_rows, exact_count, CONVERSATIONS
+from shared.utils.ownership import ownership_cache, CONVERSATION
+from shared.utils.pagination import decode_cursor, keyset_before, parse_bool, split_page
 
 class ConversationService:
     """对话服务"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def create_conversation(self, user_id: UUID, conversation_data: ConversationCreate) -> Conversation:
+    async def create_conversation(self, user_id: UUID, conversation_data: ConversationCreate) -> Conversation:
         """创建对话"""
         conversation = Conversation(
             user_id=user_id,
@@ -21,48 +25,117 @@ class ConversationService:
         )
         
         self.db.add(conversation)
-        self.db.commit()
-        self.db.refresh(conversation)
+        await self.db.commit()
+        
+        await ownership_cache.remember_async(CONVERSATION, conversation.id, user_id)
+        await count_cache.invalidate_async(CONVERSATIONS, user_id)
         
         return conversation
     
-    def get_conversations(
+    async def get_conversations(
         self,
         user_id: UUID,
         page: int = 1,
         page_size: int = 20,
-        pinned: Optional[bool] = None
-    ) -> Tuple[List[Conversation], int]:
-        """获取对话列表"""
-        query = self.db.query(Conversation).filter(Conversation.user_id == user_id)
+        pinned: Optional[bool] = None,
+        include_total: bool = True,
+        exact_total: bool = False
+    ) -> Tuple[List[Conversation], Optional[int]]:
+        """获取对话列表（OFFSET分页）"""
+        conversations, _, total = await self.get_conversations_page(
+            user_id,
+            limit=page_size,
+            offset=(page - 1) * page_size,
+            pinned=pinned,
+            include_total=include_total,
+            exact_total=exact_total
+        )
+        return conversations, total
+    
+    async def get_conversations_page(
+        self,
+        user_id: UUID,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        pinned: Optional[bool] = None,
+        include_total: bool = False,
+        exact_total: bool = False
+    ) -> Tuple[List[Conversation], Optional[str], Optional[int]]:
+        """
+        获取一页对话，置顶的在前，再按 (updated_at, id) 倒序
+        
+        传入cursor时按游标定位（keyset分页，走idx_conversations_user_pinned索引），
+        忽略offset。总数只在include_total时返回：默认读取按用户缓存的对话数，
+        带pinned筛选时用查询计划估计值，exact_total时执行COUNT(*)。
+        
+        Returns:
+            (对话列表, 下一页游标, 总数)
+        """
+        conditions = [Conversation.user_id == user_id]
         
         if pinned is not None:
-            query = query.filter(Conversation.is_pinned == pinned)
+            conditions.append(Conversation.is_pinned == pinned)
         
-        total = query.count()
+        query = select(Conversation).where(*conditions)
         
-        conversations = query.order_by(
-            desc(Conversation.is_pinned),
-            desc(Conversation.updated_at)
-        ).offset((page - 1) * page_size).limit(page_size).all()
+        total = None
+        if exact_total or (include_total and pinned is not None):
+            total = await count_rows(self.db, query, exact=exact_total)
+        elif include_total:
+            total = await count_cache.get_count(
+                CONVERSATIONS, user_id, lambda: exact_count(self.db, query)
+            )
         
-        return conversations, total
+        if cursor:
+            is_pinned, updated_at, conversation_id = decode_cursor(
+                cursor, parse_bool, datetime.fromisoformat, UUID
+            )
+            # 排序含布尔列，使用展开形式（前置 is_pinned <= 条件走索引范围扫描）
+            query = query.where(
+                keyset_before(
+                    (Conversation.is_pinned, Conversation.updated_at, Conversation.id),
+                    (is_pinned, updated_at, conversation_id),
+                    row_value=False
+                )
+            )
+        elif offset:
+            query = query.offset(offset)
+        
+        # 多取一行判断是否还有下一页
+        result = await self.db.execute(
+            query.order_by(
+                desc(Conversation.is_pinned),
+                desc(Conversation.updated_at),
+                desc(Conversation.id)
+            ).limit(limit + 1)
+        )
+        conversations, next_cursor = split_page(
+            result.scalars().all(),
+            limit,
+            lambda c: (bool(c.is_pinned), c.updated_at, c.id)
+        )
+        
+        return conversations, next_cursor, total
     
-    def get_conversation(self, conversation_id: UUID, user_id: UUID) -> Optional[Conversation]:
+    async def get_conversation(self, conversation_id: UUID, user_id: UUID) -> Optional[Conversation]:
         """获取对话详情"""
-        return self.db.query(Conversation).filter(
-            Conversation.id == conversation_id,
-            Conversation.user_id == user_id
-        ).first()
+        result = await self.db.execute(
+            select(Conversation).where(
+                Conversation.id == conversation_id,
+                Conversation.user_id == user_id
+            )
+        )
+        return result.scalars().first()
     
-    def update_conversation(
+    async def update_conversation(
         self,
         conversation_id: UUID,
         user_id: UUID,
         conversation_data: ConversationUpdate
     ) -> Optional[Conversation]:
         """更新对话"""
-        conversation = self.get_conversation(conversation_id, user_id)
+        conversation = await self.get_conversation(conversation_id, user_id)
         if not conversation:
             return None
         
@@ -71,29 +144,29 @@ class ConversationService:
         if conversation_data.is_pinned is not None:
             conversation.is_pinned = conversation_data.is_pinned
         
-        self.db.commit()
-        self.db.refresh(conversation)
+        await self.db.commit()
         
         return conversation
     
-    def delete_conversation(self, conversation_id: UUID, user_id: UUID) -> bool:
+    async def delete_conversation(self, conversation_id: UUID, user_id: UUID) -> bool:
         """删除对话"""
-        conversation = self.get_conversation(conversation_id, user_id)
+        conversation = await self.get_conversation(conversation_id, user_id)
         if not conversation:
             return False
         
-        self.db.delete(conversation)
-        self.db.commit()
+        await self.db.delete(conversation)
+        await self.db.commit()
+        
+        await ownership_cache.invalidate_async(CONVERSATION, conversation_id)
+        await count_cache.invalidate_async(CONVERSATIONS, user_id)
         
         return True
     
-    def update_last_accessed(self, conversation_id: UUID):
+    async def update_last_accessed(self, conversation_id: UUID):
         """更新最后访问时间"""
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id
-        ).first()
-        
-        if conversation:
-            from datetime import datetime
-            conversation.last_accessed_at = datetime.utcnow()
-            self.db.commit()
+        await self.db.execute(
+            update(Conversation).where(
+                Conversation.id == conversation_id
+            ).values(last_accessed_at=datetime.utcnow())
+        )
+        await self.db.commit()
@@ -1,96 +1,208 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
-from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, insert, literal, select, update
+from uuid import UUID, uuid4
 from typing import Tuple, List, Optional
 from datetime import datetime
 from shared.models.db_models import Message, Conversation
 from shared.models.message import MessageCreate
+from shared.utils.counts import count_rows
+from shared.utils.ownership import ownership_cache, CONVERSATION
+from shared.utils.pagination import decode_cursor, keyset_before, split_page
+
+# 对话预览文本的最大长度
+PREVIEW_LENGTH = 100
+
+
+def _preview(content: str) -> str:
+    """对话列表中显示的预览文本：最新一条消息，折叠空白并截断"""
+    return " ".join(content.split())[:PREVIEW_LENGTH]
+
 
 class MessageService:
     """消息服务"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def get_messages(
+    async def _owns_conversation(self, conversation_id: UUID, user_id: UUID) -> bool:
+        """验证对话是否存在且属于该用户（走归属缓存）"""
+        return await ownership_cache.is_owner_async(
+            CONVERSATION,
+            conversation_id,
+            user_id,
+            lambda: self.db.scalar(
+                select(Conversation.user_id).where(Conversation.id == conversation_id)
+            )
+        )
+    
+    async def get_messages(
         self,
         conversation_id: UUID,
         user_id: UUID,
         page: int = 1,
         page_size: int = 50,
-        before: Optional[datetime] = None
-    ) -> Tuple[List[Message], int]:
-        """获取消息列表"""
+        before: Optional[datetime] = None,
+        include_total: bool = True,
+        exact_total: bool = False
+    ) -> Tuple[List[Message], Optional[int]]:
+        """获取消息列表（OFFSET分页）"""
+        messages, _, total = await self.get_messages_page(
+            conversation_id,
+            user_id,
+            limit=page_size,
+            offset=(page - 1) * page_size,
+            before=before,
+            include_total=include_total,
+            exact_total=exact_total
+        )
+        return messages, total
+    
+    async def get_messages_page(
+        self,
+        conversation_id: UUID,
+        user_id: UUID,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        before: Optional[datetime] = None,
+        include_total: bool = False,
+        exact_total: bool = False
+    ) -> Tuple[List[Message], Optional[str], Optional[int]]:
+        """
+        获取一页消息，按 (created_at, id) 倒序（最新的在前）
+        
+        传入cursor时按游标定位（keyset分页，走idx_messages_conversation_created索引，
+        与翻到第几页无关），忽略offset。总数只在include_total时返回：默认读取对话的
+        message_count，带before筛选时用查询计划估计值，exact_total时执行COUNT(*)。
+        
+        Returns:
+            (消息列表, 下一页游标, 总数)
+        """
         # 首先验证对话是否存在且属于该用户
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id,
-            Conversation.user_id == user_id
-        ).first()
-        
-        if not conversation:
-            return [], 0
-        
-        # 构建查询
-        query = self.db.query(Message).filter(
-            Message.conversation_id == conversation_id
+        if not await self._owns_conversation(conversation_id, user_id):
+            return [], None, 0 if include_total or exact_total else None
+        
+        # 更新对话的最后访问时间（直接UPDATE，无需加载对话）
+        # 先提交再查询：提交会使已加载的对象过期，AsyncSession中无法再懒加载其属性
+        await self.db.execute(
+            update(Conversation).where(
+                Conversation.id == conversation_id
+            ).values(last_accessed_at=datetime.utcnow()).execution_options(
+                synchronize_session=False
+            )
         )
+        await self.db.commit()
+        
+        # 构建查询条件
+        conditions = [Message.conversation_id == conversation_id]
         
         # 如果指定了before参数，筛选指定时间之前的消息
         if before:
-            query = query.filter(Message.created_at < before)
-        
-        # 获取总数
-        total = query.count()
-        
-        # 按创建时间倒序排列（最新的在前）
-        messages = query.order_by(
-            desc(Message.created_at)
-        ).offset((page - 1) * page_size).limit(page_size).all()
-        
-        # 更新对话的最后访问时间
-        conversation.last_accessed_at = datetime.utcnow()
-        self.db.commit()
+            conditions.append(Message.created_at < before)
+        
+        # 获取总数（可选）
+        total = None
+        if exact_total or (include_total and before):
+            total = await count_rows(
+                self.db, select(Message.id).where(*conditions), exact=exact_total
+            )
+        elif include_total:
+            total = await self.db.scalar(
+                select(Conversation.message_count).where(Conversation.id == conversation_id)
+            ) or 0
+        
+        query = select(Message).where(*conditions)
+        if cursor:
+            created_at, message_id = decode_cursor(cursor, datetime.fromisoformat, UUID)
+            query = query.where(
+                keyset_before((Message.created_at, Message.id), (created_at, message_id))
+            )
+        elif offset:
+            query = query.offset(offset)
+        
+        # 多取一行判断是否还有下一页
+        result = await self.db.execute(
+            query.order_by(
+                desc(Message.created_at),
+                desc(Message.id)
+            ).limit(limit + 1)
+        )
+        messages, next_cursor = split_page(
+            result.scalars().all(), limit, lambda m: (m.created_at, m.id)
+        )
         
-        return messages, total
+        return messages, next_cursor, total
     
-    def create_message(
+    async def create_message(
         self,
         conversation_id: UUID,
         user_id: UUID,
         message_data: MessageCreate
     ) -> Optional[Message]:
-        """创建消息"""
-        # 验证对话是否存在且属于该用户
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id,
-            Conversation.user_id == user_id
-        ).first()
-        
-        if not conversation:
+        """
+        创建消息
+        
+        归属校验、消息计数+1、预览文本更新和消息插入在一条语句中完成：
+        PostgreSQL上为 WITH conversation AS (UPDATE ... RETURNING id) INSERT ... SELECT ... RETURNING，
+        对话不存在或不属于该用户时UPDATE不返回行，也就不会插入消息。计数在数据库中自增，
+        并发发送不会丢失计数。
+        """
+        # 已缓存为不存在或属于其他用户时，无需访问数据库
+        cached_owner = await ownership_cache.peek_async(CONVERSATION, conversation_id)
+        if cached_owner is not None and cached_owner != str(user_id):
             return None
         
-        # 创建消息
-        message = Message(
-            conversation_id=conversation_id,
-            role=message_data.role.value,
-            content=message_data.content,
-            type=message_data.type.value,
-            metadata=message_data.metadata
+        now = datetime.utcnow()
+        touch = update(Conversation).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id
+        ).values(
+            message_count=Conversation.message_count + 1,
+            preview_text=_preview(message_data.content),
+            last_accessed_at=now,
+            updated_at=now
         )
+        values = {
+            Message.id: uuid4(),
+            Message.role: message_data.role.value,
+            Message.content: message_data.content,
+            Message.type: message_data.type.value,
+            Message.meta_data: message_data.metadata,
+            Message.created_at: now
+        }
+        
+        if self.db.get_bind().dialect.name == "postgresql":
+            conversation = touch.returning(Conversation.id).cte("conversation")
+            columns = [Message.conversation_id, *values]
+            row = select(
+                conversation.c.id,
+                *(literal(value, column.type) for column, value in values.items())
+            )
+            message = await self.db.scalar(
+                insert(Message).from_select(columns, row).add_cte(conversation).returning(Message)
+            )
+        else:
+            # 其他数据库不支持在CTE中执行UPDATE：同一事务内先原子更新计数，再插入消息
+            message = None
+            if await self.db.scalar(touch.returning(Conversation.id).execution_options(
+                synchronize_session=False
+            )):
+                message = await self.db.scalar(
+                    insert(Message).values(
+                        {Message.conversation_id: conversation_id, **values}
+                    ).returning(Message)
+                )
+        
+        if message is None:
+            await self.db.rollback()
+            return None
         
-        self.db.add(message)
-        
-        # 更新对话的消息计数和最后访问时间
-        conversation.message_count += 1
-        conversation.last_accessed_at = datetime.utcnow()
-        conversation.updated_at = datetime.utcnow()
-        
-        self.db.commit()
-        self.db.refresh(message)
+        # RETURNING已带回全部列，无需再refresh
+        await self.db.commit()
         
         return message
     
-    def get_message(
+    async def get_message(
         self,
         message_id: UUID,
         conversation_id: UUID,
@@ -98,43 +210,42 @@ class MessageService:
     ) -> Optional[Message]:
         """获取单条消息"""
         # 验证对话是否存在且属于该用户
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id,
-            Conversation.user_id == user_id
-        ).first()
-        
-        if not conversation:
+        if not await self._owns_conversation(conversation_id, user_id):
             return None
         
         # 查询消息
-        message = self.db.query(Message).filter(
-            Message.id == message_id,
-            Message.conversation_id == conversation_id
-        ).first()
+        result = await self.db.execute(
+            select(Message).where(
+                Message.id == message_id,
+                Message.conversation_id == conversation_id
+            )
+        )
         
-        return message
+        return result.scalars().first()
     
-    def delete_message(
+    async def delete_message(
         self,
         message_id: UUID,
         conversation_id: UUID,
         user_id: UUID
     ) -> bool:
         """删除消息"""
-        message = self.get_message(message_id, conversation_id, user_id)
+        message = await self.get_message(message_id, conversation_id, user_id)
         if not message:
             return False
         
-        # 获取对话以更新消息计数
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id
-        ).first()
-        
-        if conversation and conversation.message_count > 0:
-            conversation.message_count -= 1
-            conversation.updated_at = datetime.utcnow()
+        # 在数据库中原子地更新消息计数
+        await self.db.execute(
+            update(Conversation).where(
+                Conversation.id == conversation_id,
+                Conversation.message_count > 0
+            ).values(
+                message_count=Conversation.message_count - 1,
+                updated_at=datetime.utcnow()
+            ).execution_options(synchronize_session=False)
+        )
         
-        self.db.delete(message)
-        self.db.commit()
+        await self.db.delete(message)
+        await self.db.commit()
         
         return True
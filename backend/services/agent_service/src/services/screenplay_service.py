@@ -1,4 +1,6 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from uuid import UUID
 from typing import Optional, Dict, Any
 from datetime import datetime
@@ -14,11 +16,12 @@ from shared.models.db_models import Screenplay, Scene, CharacterSheet, Task, Use
 from shared.models.screenplay import ScreenplayStatus, SceneStatus
 from services.agent_service.src.clients.glm_client import GLMClient
 from services.agent_service.src.services.task_service import TaskService, TaskStatus
+from shared.utils.task_timeline import TaskTimeline, KEY_LOOKUP, PROVIDER_REQUEST, DB_PERSIST, NOTIFY
 
 class ScreenplayService:
     """剧本服务"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.task_service = TaskService(db)
     
@@ -33,103 +36,109 @@ class ScreenplayService:
     ) -> Screenplay:
         """生成剧本草稿"""
         # 验证任务是否存在且属于用户
-        task = self.db.query(Task).filter(
-            Task.id == task_id,
-            Task.user_id == user_id
-        ).first()
-        
-        if not task:
+        if not await self.task_service.owns_task(task_id, user_id):
             raise ValueError("任务不存在")
         
-        # 获取用户的GLM API密钥（直接从数据库查询，避免跨服务导入）
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise ValueError("用户不存在")
+        timeline = TaskTimeline(task_id)
         
-        glm_api_key = user.glm_api_key
-        if not glm_api_key:
-            raise ValueError("用户未配置GLM API密钥，请先在设置中配置")
+        # 获取用户的GLM API密钥（直接从数据库查询，避免跨服务导入）
+        with timeline.stage(KEY_LOOKUP, provider="glm"):
+            user = await self.db.get(User, user_id)
+            if not user:
+                raise ValueError("用户不存在")
+            
+            glm_api_key = user.glm_api_key
+            if not glm_api_key:
+                raise ValueError("用户未配置GLM API密钥，请先在设置中配置")
         
         # 使用用户密钥创建客户端
         glm_client = GLMClient(api_key=glm_api_key)
         
         try:
             # 调用GLM客户端生成剧本
-            screenplay_data = await glm_client.generate_screenplay(
-                user_prompt=prompt,
-                user_images=user_images,
-                scene_count=scene_count,
-                character_count=character_count
-            )
+            with timeline.stage(PROVIDER_REQUEST, provider="glm", model="glm-4"):
+                screenplay_data = await glm_client.generate_screenplay(
+                    user_prompt=prompt,
+                    user_images=user_images,
+                    scene_count=scene_count,
+                    character_count=character_count
+                )
         finally:
             await glm_client.close()
         
-        # 创建剧本记录
-        screenplay = Screenplay(
-            task_id=task_id,
-            user_id=user_id,
-            title=screenplay_data.get("script_title", "未命名剧本"),
-            status=ScreenplayStatus.DRAFT.value
-        )
-        
-        self.db.add(screenplay)
-        self.db.flush()  # 获取ID
-        
-        # 创建场景记录
-        scenes_data = screenplay_data.get("scenes", [])
-        for scene_data in scenes_data:
-            scene = Scene(
-                screenplay_id=screenplay.id,
-                scene_id=scene_data["scene_id"],
-                narration=scene_data["narration"],
-                image_prompt=scene_data["image_prompt"],
-                video_prompt=scene_data["video_prompt"],
-                character_description=scene_data.get("character_description"),
-                status=SceneStatus.PENDING.value
+        with timeline.stage(DB_PERSIST) as persist:
+            # 创建剧本记录
+            screenplay = Screenplay(
+                task_id=task_id,
+                user_id=user_id,
+                title=screenplay_data.get("script_title", "未命名剧本"),
+                status=ScreenplayStatus.DRAFT.value
             )
-            self.db.add(scene)
-        
-        # 创建角色表记录
-        characters_data = screenplay_data.get("characters", [])
-        for char_data in characters_data:
-            character_sheet = CharacterSheet(
-                screenplay_id=screenplay.id,
-                name=char_data["name"],
-                description=char_data.get("description")
+            
+            self.db.add(screenplay)
+            await self.db.flush()  # 获取ID
+            screenplay_id = screenplay.id
+            
+            # 创建场景记录
+            scenes_data = screenplay_data.get("scenes", [])
+            for scene_data in scenes_data:
+                scene = Scene(
+                    screenplay_id=screenplay.id,
+                    scene_id=scene_data["scene_id"],
+                    narration=scene_data["narration"],
+                    image_prompt=scene_data["image_prompt"],
+                    video_prompt=scene_data["video_prompt"],
+                    character_description=scene_data.get("character_description"),
+                    status=SceneStatus.PENDING.value
+                )
+                self.db.add(scene)
+            
+            # 创建角色表记录
+            characters_data = screenplay_data.get("characters", [])
+            for char_data in characters_data:
+                character_sheet = CharacterSheet(
+                    screenplay_id=screenplay.id,
+                    name=char_data["name"],
+                    description=char_data.get("description")
+                )
+                self.db.add(character_sheet)
+            
+            await self.db.commit()
+            persist["scenes"] = len(scenes_data)
+        
+        # 更新任务状态（轮询任务进度的客户端由此得知结果）
+        with timeline.stage(NOTIFY):
+            await self.task_service.update_task_status(
+                task_id=task_id,
+                status=TaskStatus.COMPLETED,
+                progress=100,
+                result={"screenplay_id": str(screenplay_id)}
             )
-            self.db.add(character_sheet)
-        
-        self.db.commit()
-        self.db.refresh(screenplay)
         
-        # 更新任务状态
-        self.task_service.update_task_status(
-            task_id=task_id,
-            status=TaskStatus.COMPLETED,
-            progress=100,
-            result={"screenplay_id": str(screenplay.id)}
-        )
-        
-        return screenplay
+        # 连同场景和角色表一起重新加载（AsyncSession中不能懒加载关系）
+        return await self.get_screenplay(screenplay_id, user_id)
     
-    def get_screenplay(self, screenplay_id: UUID, user_id: UUID) -> Optional[Screenplay]:
+    async def get_screenplay(self, screenplay_id: UUID, user_id: UUID) -> Optional[Screenplay]:
         """获取剧本详情"""
-        return self.db.query(Screenplay).options(
-            joinedload(Screenplay.scenes),
-            joinedload(Screenplay.character_sheets)
-        ).filter(
-            Screenplay.id == screenplay_id,
-            Screenplay.user_id == user_id
-        ).first()
+        result = await self.db.execute(
+            select(Screenplay).options(
+                selectinload(Screenplay.scenes),
+                selectinload(Screenplay.character_sheets)
+            ).where(
+                Screenplay.id == screenplay_id,
+                Screenplay.user_id == user_id
+            )
+        )
+        return result.scalars().first()
     
-    def confirm_screenplay(
+    async def confirm_screenplay(
         self,
         screenplay_id: UUID,
         user_id: UUID,
         feedback: Optional[str] = None
     ) -> Optional[Screenplay]:
         """确认剧本"""
-        screenplay = self.get_screenplay(screenplay_id, user_id)
+        screenplay = await self.get_screenplay(screenplay_id, user_id)
         if not screenplay:
             return None
         
@@ -139,27 +148,27 @@ class ScreenplayService:
         # 更新状态为生成中
         screenplay.status = ScreenplayStatus.GENERATING.value
         screenplay.updated_at = datetime.utcnow()
+        task_id = screenplay.task_id
         
-        self.db.commit()
-        self.db.refresh(screenplay)
+        await self.db.commit()
         
         # 更新任务状态
-        self.task_service.update_task_status(
-            task_id=screenplay.task_id,
+        await self.task_service.update_task_status(
+            task_id=task_id,
             status=TaskStatus.PROCESSING,
             progress=0
         )
         
         return screenplay
     
-    def update_screenplay(
+    async def update_screenplay(
         self,
         screenplay_id: UUID,
         user_id: UUID,
         title: Optional[str] = None
     ) -> Optional[Screenplay]:
         """更新剧本"""
-        screenplay = self.get_screenplay(screenplay_id, user_id)
+        screenplay = await self.get_screenplay(screenplay_id, user_id)
         if not screenplay:
             return None
         
@@ -168,7 +177,6 @@ class ScreenplayService:
         
         screenplay.updated_at = datetime.utcnow()
         
-        self.db.commit()
-        self.db.refresh(screenplay)
+        await self.db.commit()
         
         return screenplay
\ No newline at end of file
@@ -1,8 +1,9 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select, update
 from uuid import UUID
 from typing import Tuple, List, Optional, Dict, Any
 from datetime import datetime
+import asyncio
 import sys
 from pathlib import Path
 
@@ -10,16 +11,21 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
-from shared.models.db_models import Task
+from shared.models.db_models import Task, TaskLog
 from shared.models.task import TaskCreate, TaskStatus, TaskType
+from shared.utils.counts import count_cache, exact_count, TASKS
+from shared.utils.ownership import ownership_cache, TASK
+from shared.utils.pagination import decode_cursor, keyset_before, split_page
+from shared.utils.metrics_registry import track_background_task
+from shared.utils.task_timeline import TaskTimeline, build_timeline, task_log_writer
 
 class TaskService:
     """任务服务"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def create_task(self, user_id: UUID, task_data: TaskCreate) -> Task:
+    async def create_task(self, user_id: UUID, task_data: TaskCreate) -> Task:
         """创建任务"""
         task = Task(
             user_id=user_id,
@@ -31,36 +37,102 @@ class TaskService:
         )
         
         self.db.add(task)
-        self.db.commit()
-        self.db.refresh(task)
+        await self.db.commit()
+        
+        await ownership_cache.remember_async(TASK, task.id, user_id)
+        await count_cache.invalidate_async(TASKS, user_id)
         
         return task
     
-    def get_tasks(
+    async def owns_task(self, task_id: UUID, user_id: UUID) -> bool:
+        """验证任务是否存在且属于该用户（走归属缓存）"""
+        return await ownership_cache.is_owner_async(
+            TASK,
+            task_id,
+            user_id,
+            lambda: self.db.scalar(select(Task.user_id).where(Task.id == task_id))
+        )
+    
+    async def get_tasks(
         self,
         user_id: UUID,
         page: int = 1,
-        page_size: int = 20
-    ) -> Tuple[List[Task], int]:
-        """获取任务列表"""
-        query = self.db.query(Task).filter(Task.user_id == user_id)
+        page_size: int = 20,
+        include_total: bool = True,
+        exact_total: bool = False
+    ) -> Tuple[List[Task], Optional[int]]:
+        """获取任务列表（OFFSET分页）"""
+        tasks, _, total = await self.get_tasks_page(
+            user_id,
+            limit=page_size,
+            offset=(page - 1) * page_size,
+            include_total=include_total,
+            exact_total=exact_total
+        )
+        return tasks, total
+    
+    async def get_tasks_page(
+        self,
+        user_id: UUID,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        include_total: bool = False,
+        exact_total: bool = False
+    ) -> Tuple[List[Task], Optional[str], Optional[int]]:
+        """
+        获取一页任务，按 (created_at, id) 倒序
         
-        total = query.count()
+        传入cursor时按游标定位（keyset分页，走idx_tasks_user_created索引），忽略offset。
+        总数只在include_total时返回：默认读取按用户缓存的任务数，exact_total时执行COUNT(*)。
         
-        tasks = query.order_by(desc(Task.created_at)).offset(
-            (page - 1) * page_size
-        ).limit(page_size).all()
+        Returns:
+            (任务列表, 下一页游标, 总数)
+        """
+        query = select(Task).where(Task.user_id == user_id)
         
-        return tasks, total
+        total = None
+        if exact_total:
+            total = await exact_count(self.db, query)
+        elif include_total:
+            total = await count_cache.get_count(
+                TASKS, user_id, lambda: exact_count(self.db, query)
+            )
+        
+        if cursor:
+            created_at, task_id = decode_cursor(cursor, datetime.fromisoformat, UUID)
+            query = query.where(
+                keyset_before((Task.created_at, Task.id), (created_at, task_id))
+            )
+        elif offset:
+            query = query.offset(offset)
+        
+        # 多取一行判断是否还有下一页
+        result = await self.db.execute(
+            query.order_by(
+                desc(Task.created_at),
+                desc(Task.id)
+            ).limit(limit + 1)
+        )
+        tasks, next_cursor = split_page(
+            result.scalars().all(), limit, lambda t: (t.created_at, t.id)
+        )
+        
+        return tasks, next_cursor, total
     
-    def get_task(self, task_id: UUID, user_id: UUID) -> Optional[Task]:
+    async def get_task(self, task_id: UUID, user_id: UUID) -> Optional[Task]:
         """获取任务详情"""
-        return self.db.query(Task).filter(
-            Task.id == task_id,
-            Task.user_id == user_id
-        ).first()
+        # 已缓存为不存在或属于其他用户时，无需查询数据库
+        cached_owner = await ownership_cache.peek_async(TASK, task_id)
+        if cached_owner is not None and cached_owner != str(user_id):
+            return None
+        
+        result = await self.db.execute(
+            select(Task).where(Task.id == task_id, Task.user_id == user_id)
+        )
+        return result.scalars().first()
     
-    def update_task_status(
+    async def update_task_status(
         self,
         task_id: UUID,
         status: TaskStatus,
@@ -68,34 +140,32 @@ class TaskService:
         result: Optional[Dict[str, Any]] = None,
         error_message: Optional[str] = None
     ) -> Optional[Task]:
-        """更新任务状态"""
-        task = self.db.query(Task).filter(Task.id == task_id).first()
-        if not task:
-            return None
-        
-        task.status = status.value
+        """更新任务状态（UPDATE ... RETURNING，一次往返）"""
+        now = datetime.utcnow()
+        values = {"status": status.value, "updated_at": now}
         if progress is not None:
-            task.progress = progress
+            values["progress"] = progress
         if result is not None:
-            task.result = result
+            values["result"] = result
         if error_message is not None:
-            task.error_message = error_message
+            values["error_message"] = error_message
         
-        if status == TaskStatus.COMPLETED:
-            task.completed_at = datetime.utcnow()
-        elif status == TaskStatus.FAILED:
-            task.completed_at = datetime.utcnow()
+        if status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+            values["completed_at"] = now
         
-        task.updated_at = datetime.utcnow()
+        task = await self.db.scalar(
+            update(Task).where(Task.id == task_id).values(**values).returning(Task)
+        )
+        if not task:
+            return None
         
-        self.db.commit()
-        self.db.refresh(task)
+        await self.db.commit()
         
         return task
     
-    def get_task_progress(self, task_id: UUID, user_id: UUID) -> Optional[Dict[str, Any]]:
+    async def get_task_progress(self, task_id: UUID, user_id: UUID) -> Optional[Dict[str, Any]]:
         """获取任务进度"""
-        task = self.get_task(task_id, user_id)
+        task = await self.get_task(task_id, user_id)
         if not task:
             return None
         
@@ -106,21 +176,43 @@ class TaskService:
             "errorMessage": task.error_message
         }
     
-    def process_screenplay_task(self, task_id: UUID):
-        """处理剧本任务（后台任务）"""
-        import asyncio
+    async def get_task_timeline(self, task_id: UUID, user_id: UUID) -> Optional[Dict[str, Any]]:
+        """获取任务各阶段耗时（来自task_logs）"""
+        task = await self.get_task(task_id, user_id)
+        if not task:
+            return None
+        
+        # 先写入本进程缓冲区中的事件，其他进程的事件在其下一次批量写入后可见
+        await asyncio.to_thread(task_log_writer.flush)
+        result = await self.db.execute(
+            select(TaskLog).where(TaskLog.task_id == task_id).order_by(TaskLog.created_at)
+        )
         
+        timeline = build_timeline(result.scalars().all())
+        timeline.update({
+            "taskId": str(task.id),
+            "type": task.type,
+            "status": task.status,
+        })
+        return timeline
+    
+    @track_background_task("screenplay_task")
+    async def process_screenplay_task(self, task_id: UUID):
+        """处理剧本任务（后台任务）"""
         # 获取任务
-        task = self.db.query(Task).filter(Task.id == task_id).first()
+        task = await self.db.get(Task, task_id)
         if not task:
             return
         
+        TaskTimeline(task_id).record_queue_wait(task.created_at)
+        user_id = task.user_id
+        params = task.params or {}
+        
         # 更新任务状态为处理中
-        self.update_task_status(task_id, TaskStatus.PROCESSING, progress=10)
+        await self.update_task_status(task_id, TaskStatus.PROCESSING, progress=10)
         
         try:
             # 从任务参数中提取信息
-            params = task.params or {}
             prompt = params.get("prompt", "")
             user_images = params.get("user_images")
             scene_count = params.get("scene_count", 7)
@@ -135,28 +227,22 @@ class TaskService:
             # 创建剧本服务并生成剧本草稿
             screenplay_service = ScreenplayService(self.db)
             
-            # 使用asyncio运行异步方法
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                screenplay = loop.run_until_complete(
-                    screenplay_service.create_draft(
-                        user_id=task.user_id,
-                        task_id=task_id,
-                        prompt=prompt,
-                        user_images=user_images,
-                        scene_count=scene_count,
-                        character_count=character_count
-                    )
-                )
-                # 剧本生成成功，任务状态已在create_draft中更新为COMPLETED
-            finally:
-                loop.close()
+            await screenplay_service.create_draft(
+                user_id=user_id,
+                task_id=task_id,
+                prompt=prompt,
+                user_images=user_images,
+                scene_count=scene_count,
+                character_count=character_count
+            )
+            # 剧本生成成功，任务状态已在create_draft中更新为COMPLETED
                 
         except Exception as e:
             # 更新任务状态为失败
             error_message = str(e)
-            self.update_task_status(
+            # 剧本写库失败时会话需要先回滚才能继续使用
+            await self.db.rollback()
+            await self.update_task_status(
                 task_id,
                 TaskStatus.FAILED,
                 error_message=error_message
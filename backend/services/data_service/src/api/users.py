@@ -1,6 +1,6 @@
 """用户数据 API"""
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import Optional
 
@@ -11,7 +11,7 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
-from shared.config.database import get_db
+from shared.config.database import get_async_db, get_read_db
 from services.data_service.src.services.user_service import UserService
 from shared.utils.auth import get_current_user
 from shared.models.user import UserAPIKeysUpdate
@@ -23,7 +23,7 @@ router = APIRouter(prefix="/users", tags=["用户数据"])
 async def get_user(
     user_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取用户详细信息"""
     # 只能查看自己的信息
@@ -34,7 +34,7 @@ async def get_user(
         )
     
     service = UserService(db)
-    user = service.get_user(user_id)
+    user = await service.get_user(user_id)
     
     if not user:
         raise HTTPException(
@@ -62,7 +62,7 @@ async def update_user(
     username: Optional[str] = None,
     avatar_url: Optional[str] = None,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新用户信息"""
     # 只能更新自己的信息
@@ -73,7 +73,7 @@ async def update_user(
         )
     
     service = UserService(db)
-    user = service.update_user(
+    user = await service.update_user(
         user_id=user_id,
         username=username,
         avatar_url=avatar_url
@@ -101,7 +101,7 @@ async def update_user(
 async def get_user_stats(
     user_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取用户统计数据"""
     # 只能查看自己的统计
@@ -112,7 +112,7 @@ async def get_user_stats(
         )
     
     service = UserService(db)
-    stats = service.get_user_stats(user_id)
+    stats = await service.get_user_stats(user_id)
     
     if not stats:
         raise HTTPException(
@@ -131,7 +131,7 @@ async def update_user_api_keys(
     user_id: UUID,
     api_keys: UserAPIKeysUpdate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新用户API密钥"""
     # 只能更新自己的密钥
@@ -142,7 +142,7 @@ async def update_user_api_keys(
         )
     
     service = UserService(db)
-    user = service.update_user_api_keys(
+    user = await service.update_user_api_keys(
         user_id=user_id,
         glm_api_key=api_keys.glm_api_key,
         tuzi_api_key=api_keys.tuzi_api_key,
@@ -170,7 +170,7 @@ async def update_user_api_keys(
 async def get_user_api_keys_status(
     user_id: UUID,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取用户API密钥配置状态（不返回实际密钥）"""
     if str(current_user.id) != str(user_id):
@@ -180,7 +180,7 @@ async def get_user_api_keys_status(
         )
     
     service = UserService(db)
-    user = service.get_user(user_id)
+    user = await service.get_user(user_id)
     
     if not user:
         raise HTTPException(
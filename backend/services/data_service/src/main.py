@@ -11,7 +11,17 @@ backend_path = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
 from services.data_service.src.api import users
+from shared.api import admin, metrics
 from shared.middleware.error_handler import error_handler_middleware
+from shared.utils.cache import cache_manager
+from shared.utils.log_sampling import access_log_sampler
+from shared.utils.loop_monitor import loop_monitor
+from shared.utils.metrics_registry import metrics_registry
+from shared.utils.monitoring import alert_manager, metrics_collector
+from shared.utils.tracing import tracer
+
+metrics_registry.configure(service="data_service")
+tracer.configure(service="data_service")
 
 app = FastAPI(
     title="AI漫导 Data Service",
@@ -35,6 +45,28 @@ async def error_handler(request, call_next):
 
 # 注册路由
 app.include_router(users.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
+app.include_router(metrics.router)
+
+@app.on_event("startup")
+async def start_background_workers():
+    """启动后台任务"""
+    cache_manager.start_stats_exporter()
+    metrics_collector.start()
+    metrics_registry.start_exporter()
+    alert_manager.start_evaluator()
+    loop_monitor.start()
+    access_log_sampler.start_refresher()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """停止后台任务"""
+    cache_manager.stop_stats_exporter(timeout=5)
+    metrics_collector.stop(timeout=5)
+    metrics_registry.stop_exporter(timeout=5)
+    alert_manager.stop_evaluator(timeout=5)
+    loop_monitor.stop(timeout=5)
+    access_log_sampler.stop_refresher(timeout=5)
 
 @app.get("/")
 async def root():
@@ -1,6 +1,6 @@
 """对话数据访问层"""
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select
 from uuid import UUID
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
@@ -9,42 +9,48 @@ from shared.models.db_models import Conversation, Message, Task
 class ConversationRepository:
     """对话数据访问"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def get_conversation_stats(
+    async def get_conversation_stats(
         self,
         user_id: Optional[UUID] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None
     ) -> Dict[str, Any]:
         """获取对话统计数据"""
-        query = self.db.query(Conversation)
+        conditions = []
         
         if user_id:
-            query = query.filter(Conversation.user_id == user_id)
+            conditions.append(Conversation.user_id == user_id)
         
         if start_date:
-            query = query.filter(Conversation.created_at >= start_date)
+            conditions.append(Conversation.created_at >= start_date)
         
         if end_date:
-            query = query.filter(Conversation.created_at <= end_date)
+            conditions.append(Conversation.created_at <= end_date)
         
-        total_count = query.count()
+        count_query = select(func.count(Conversation.id)).where(*conditions)
+        
+        total_count = await self.db.scalar(count_query) or 0
         
         # 平均消息数
-        avg_messages = self.db.query(func.avg(Conversation.message_count)).filter(
-            Conversation.user_id == user_id if user_id else True
-        ).scalar() or 0
+        avg_messages = await self.db.scalar(
+            select(func.avg(Conversation.message_count)).where(
+                Conversation.user_id == user_id if user_id else True
+            )
+        ) or 0
         
         # 置顶对话数
-        pinned_count = query.filter(Conversation.is_pinned == True).count()
+        pinned_count = await self.db.scalar(
+            count_query.where(Conversation.is_pinned == True)
+        ) or 0
         
         # 最近7天创建的对话
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        recent_count = query.filter(
-            Conversation.created_at >= seven_days_ago
-        ).count()
+        recent_count = await self.db.scalar(
+            count_query.where(Conversation.created_at >= seven_days_ago)
+        ) or 0
         
         return {
             "total_count": total_count,
@@ -53,7 +59,7 @@ class ConversationRepository:
             "recent_count": recent_count
         }
     
-    def get_conversation_trend(
+    async def get_conversation_trend(
         self,
         user_id: Optional[UUID] = None,
         days: int = 30
@@ -61,21 +67,23 @@ class ConversationRepository:
         """获取对话趋势数据"""
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        query = self.db.query(
+        query = select(
             func.date(Conversation.created_at).label("date"),
             func.count(Conversation.id).label("count")
-        ).filter(
+        ).where(
             Conversation.created_at >= start_date
         )
         
         if user_id:
-            query = query.filter(Conversation.user_id == user_id)
+            query = query.where(Conversation.user_id == user_id)
         
-        results = query.group_by(
-            func.date(Conversation.created_at)
-        ).order_by(
-            func.date(Conversation.created_at)
-        ).all()
+        results = (await self.db.execute(
+            query.group_by(
+                func.date(Conversation.created_at)
+            ).order_by(
+                func.date(Conversation.created_at)
+            )
+        )).all()
         
         return [
             {
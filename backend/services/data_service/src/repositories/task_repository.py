@@ -1,6 +1,6 @@
 """任务数据访问层"""
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, case, select
 from uuid import UUID
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
@@ -9,32 +9,30 @@ from shared.models.db_models import Task
 class TaskRepository:
     """任务数据访问"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def get_task_stats(
+    async def get_task_stats(
         self,
         user_id: Optional[UUID] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None
     ) -> Dict[str, Any]:
         """获取任务统计数据（优化：使用聚合查询）"""
-        from sqlalchemy import case
-        
         # 构建基础查询条件
-        base_query = self.db.query(Task)
+        conditions = []
         
         if user_id:
-            base_query = base_query.filter(Task.user_id == user_id)
+            conditions.append(Task.user_id == user_id)
         
         if start_date:
-            base_query = base_query.filter(Task.created_at >= start_date)
+            conditions.append(Task.created_at >= start_date)
         
         if end_date:
-            base_query = base_query.filter(Task.created_at <= end_date)
+            conditions.append(Task.created_at <= end_date)
         
         # 使用单次聚合查询获取所有统计信息
-        stats_query = base_query.with_entities(
+        stats_query = select(
             func.count(Task.id).label("total_count"),
             func.sum(case((Task.status == "pending", 1), else_=0)).label("pending_count"),
             func.sum(case((Task.status == "processing", 1), else_=0)).label("processing_count"),
@@ -44,9 +42,9 @@ class TaskRepository:
             func.sum(case((Task.type == "screenplay", 1), else_=0)).label("screenplay_count"),
             func.sum(case((Task.type == "image", 1), else_=0)).label("image_count"),
             func.sum(case((Task.type == "video", 1), else_=0)).label("video_count"),
-        )
+        ).where(*conditions)
         
-        stats = stats_query.first()
+        stats = (await self.db.execute(stats_query)).first()
         
         total_count = stats.total_count or 0
         
@@ -65,19 +63,20 @@ class TaskRepository:
         }
         
         # 平均处理时间（仅已完成的任务）- 使用聚合查询
-        avg_duration_query = base_query.filter(
+        avg_duration_query = select(
+            func.avg(
+                func.extract('epoch', Task.completed_at - Task.created_at)
+            ).label("avg_duration")
+        ).where(
+            *conditions,
             and_(
                 Task.status == "completed",
                 Task.completed_at.isnot(None),
                 Task.created_at.isnot(None)
             )
-        ).with_entities(
-            func.avg(
-                func.extract('epoch', Task.completed_at - Task.created_at)
-            ).label("avg_duration")
         )
         
-        avg_duration_result = avg_duration_query.scalar()
+        avg_duration_result = await self.db.scalar(avg_duration_query)
         avg_duration = round(avg_duration_result, 2) if avg_duration_result else None
         
         # 成功率
@@ -94,7 +93,7 @@ class TaskRepository:
             "success_rate": success_rate
         }
     
-    def get_task_trend(
+    async def get_task_trend(
         self,
         user_id: Optional[UUID] = None,
         days: int = 30
@@ -102,24 +101,26 @@ class TaskRepository:
         """获取任务趋势数据"""
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        query = self.db.query(
+        query = select(
             func.date(Task.created_at).label("date"),
             func.count(Task.id).label("count"),
             func.sum(
                 case((Task.status == "completed", 1), else_=0)
             ).label("completed_count")
-        ).filter(
+        ).where(
             Task.created_at >= start_date
         )
         
         if user_id:
-            query = query.filter(Task.user_id == user_id)
+            query = query.where(Task.user_id == user_id)
         
-        results = query.group_by(
-            func.date(Task.created_at)
-        ).order_by(
-            func.date(Task.created_at)
-        ).all()
+        results = (await self.db.execute(
+            query.group_by(
+                func.date(Task.created_at)
+            ).order_by(
+                func.date(Task.created_at)
+            )
+        )).all()
         
         return [
             {
@@ -1,6 +1,6 @@
 """用户数据访问层"""
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, case, select, update
 from uuid import UUID
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
@@ -9,63 +9,69 @@ from shared.models.db_models import User, Conversation, Task, Message
 class UserRepository:
     """用户数据访问"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def get_user_by_id(self, user_id: UUID) -> Optional[User]:
+    async def get_user_by_id(self, user_id: UUID) -> Optional[User]:
         """根据ID获取用户"""
-        return self.db.query(User).filter(User.id == user_id).first()
+        return await self.db.get(User, user_id)
     
-    def update_user(self, user_id: UUID, **kwargs) -> Optional[User]:
-        """更新用户信息"""
-        user = self.get_user_by_id(user_id)
+    async def update_user(self, user_id: UUID, **kwargs) -> Optional[User]:
+        """更新用户信息（UPDATE ... RETURNING，一次往返）"""
+        values = {
+            key: value for key, value in kwargs.items()
+            if hasattr(User, key) and value is not None
+        }
+        user = await self.db.scalar(
+            update(User).where(User.id == user_id).values(
+                **values, updated_at=datetime.utcnow()
+            ).returning(User)
+        )
         if not user:
             return None
         
-        for key, value in kwargs.items():
-            if hasattr(user, key) and value is not None:
-                setattr(user, key, value)
-        
-        user.updated_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(user)
+        await self.db.commit()
         return user
     
-    def get_user_stats(self, user_id: UUID) -> Dict[str, Any]:
+    async def get_user_stats(self, user_id: UUID) -> Dict[str, Any]:
         """获取用户统计数据（优化：使用聚合查询减少查询次数）"""
-        from sqlalchemy import case
-        
-        user = self.get_user_by_id(user_id)
+        user = await self.get_user_by_id(user_id)
         if not user:
             return {}
         
         # 对话统计
-        conversation_count = self.db.query(func.count(Conversation.id)).filter(
-            Conversation.user_id == user_id
-        ).scalar() or 0
+        conversation_count = await self.db.scalar(
+            select(func.count(Conversation.id)).where(Conversation.user_id == user_id)
+        ) or 0
         
         # 消息统计（通过JOIN优化）
-        message_count = self.db.query(func.count(Message.id)).join(
-            Conversation, Message.conversation_id == Conversation.id
-        ).filter(Conversation.user_id == user_id).scalar() or 0
+        message_count = await self.db.scalar(
+            select(func.count(Message.id)).join(
+                Conversation, Message.conversation_id == Conversation.id
+            ).where(Conversation.user_id == user_id)
+        ) or 0
         
         # 任务统计（使用聚合查询一次性获取）
-        task_stats = self.db.query(
-            func.count(Task.id).label("task_count"),
-            func.sum(case((Task.status == "completed", 1), else_=0)).label("completed_task_count"),
-        ).filter(Task.user_id == user_id).first()
+        task_stats = (await self.db.execute(
+            select(
+                func.count(Task.id).label("task_count"),
+                func.sum(case((Task.status == "completed", 1), else_=0)).label("completed_task_count"),
+            ).where(Task.user_id == user_id)
+        )).first()
         
         task_count = task_stats.task_count or 0
         completed_task_count = task_stats.completed_task_count or 0
         
         # 最近7天活跃度
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        recent_conversations = self.db.query(func.count(Conversation.id)).filter(
-            and_(
-                Conversation.user_id == user_id,
-                Conversation.last_accessed_at >= seven_days_ago
+        recent_conversations = await self.db.scalar(
+            select(func.count(Conversation.id)).where(
+                and_(
+                    Conversation.user_id == user_id,
+                    Conversation.last_accessed_at >= seven_days_ago
+                )
             )
-        ).scalar() or 0
+        ) or 0
         
         return {
             "conversation_count": conversation_count,
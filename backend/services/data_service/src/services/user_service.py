@@ -1,5 +1,5 @@
 """用户数据服务"""
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import Optional, Dict, Any
 from shared.models.db_models import User
@@ -8,15 +8,15 @@ from services.data_service.src.repositories.user_repository import UserRepositor
 class UserService:
     """用户数据服务"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.user_repo = UserRepository(db)
     
-    def get_user(self, user_id: UUID) -> Optional[User]:
+    async def get_user(self, user_id: UUID) -> Optional[User]:
         """获取用户信息"""
-        return self.user_repo.get_user_by_id(user_id)
+        return await self.user_repo.get_user_by_id(user_id)
     
-    def update_user(
+    async def update_user(
         self,
         user_id: UUID,
         username: Optional[str] = None,
@@ -29,9 +29,9 @@ class UserService:
         if avatar_url is not None:
             update_data["avatar_url"] = avatar_url
         
-        return self.user_repo.update_user(user_id, **update_data)
+        return await self.user_repo.update_user(user_id, **update_data)
     
-    def update_user_api_keys(
+    async def update_user_api_keys(
         self,
         user_id: UUID,
         glm_api_key: Optional[str] = None,
@@ -51,11 +51,11 @@ class UserService:
         if gemini_api_key is not None:
             update_data["gemini_api_key"] = gemini_api_key if gemini_api_key else None
         
-        return self.user_repo.update_user(user_id, **update_data)
+        return await self.user_repo.update_user(user_id, **update_data)
     
-    def get_user_api_key(self, user_id: UUID, key_type: str) -> Optional[str]:
+    async def get_user_api_key(self, user_id: UUID, key_type: str) -> Optional[str]:
         """获取用户API密钥"""
-        user = self.user_repo.get_user_by_id(user_id)
+        user = await self.user_repo.get_user_by_id(user_id)
         if not user:
             return None
         
@@ -68,6 +68,6 @@ class UserService:
         
         return None
     
-    def get_user_stats(self, user_id: UUID) -> Dict[str, Any]:
+    async def get_user_stats(self, user_id: UUID) -> Dict[str, Any]:
         """获取用户统计数据"""
-        return self.user_repo.get_user_stats(user_id)
+        return await self.user_repo.get_user_stats(user_id)
@@ -14,10 +14,12 @@ from shared.config.database import get_db
 from shared.models.media import ImageGenerateRequest
 from services.media_service.src.services.image_service import ImageService
 from shared.utils.auth import get_current_user
+from shared.utils.metrics_registry import track_background_task
 
 router = APIRouter(prefix="/media/images", tags=["图片"])
 
 
+@track_background_task("image_generation")
 async def process_image_generation(task_id: UUID):
     """处理图片生成的后台任务"""
     from shared.config.database import SessionLocal
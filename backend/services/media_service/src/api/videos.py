@@ -14,10 +14,12 @@ from shared.config.database import get_db
 from shared.models.media import VideoGenerateRequest
 from services.media_service.src.services.video_service import VideoService
 from shared.utils.auth import get_current_user
+from shared.utils.metrics_registry import track_background_task
 
 router = APIRouter(prefix="/media/videos", tags=["视频"])
 
 
+@track_background_task("video_generation")
 async def process_video_generation(task_id: UUID):
     """处理视频生成的后台任务"""
     from shared.config.database import SessionLocal
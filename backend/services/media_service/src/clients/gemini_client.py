@@ -1,6 +1,8 @@
 import httpx
 from typing import Dict, Any, Optional, List
 
+from shared.utils.tracing import tracer
+
 class GeminiClient:
     """Gemini API 客户端（图片生成）"""
     
@@ -44,12 +46,14 @@ class GeminiClient:
         if reference_images:
             payload["image"] = reference_images
         
-        response = await self.client.post(
-            "/v1/images/generations",
-            json=payload
-        )
-        response.raise_for_status()
-        return response.json()
+        with tracer.span("gemini.generate_image", kind="client", attributes={"llm.model": model}) as span:
+            response = await self.client.post(
+                "/v1/images/generations",
+                json=payload
+            )
+            span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+            return response.json()
     
     async def close(self):
         """关闭客户端"""
@@ -2,6 +2,8 @@ import httpx
 from typing import Dict, Any, Optional
 import asyncio
 
+from shared.utils.tracing import traced, tracer
+
 class TuziClient:
     """Tuzi API 客户端（视频生成）"""
     
@@ -48,20 +50,25 @@ class TuziClient:
             for i, img_url in enumerate(reference_images):
                 data[f"input_reference_{i}"] = img_url
         
-        response = await self.client.post(
-            "/v1/videos",
-            data=data,
-            files=files
-        )
-        response.raise_for_status()
-        return response.json()
+        with tracer.span("tuzi.generate_video", kind="client", attributes={"llm.model": model}) as span:
+            response = await self.client.post(
+                "/v1/videos",
+                data=data,
+                files=files
+            )
+            span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+            return response.json()
     
     async def get_video_status(self, task_id: str) -> Dict[str, Any]:
         """获取视频生成状态"""
-        response = await self.client.get(f"/v1/videos/{task_id}")
-        response.raise_for_status()
-        return response.json()
+        with tracer.span("tuzi.get_video_status", kind="client") as span:
+            response = await self.client.get(f"/v1/videos/{task_id}")
+            span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+            return response.json()
     
+    @traced("tuzi.wait_for_video")
     async def wait_for_video(
         self,
         task_id: str,
@@ -15,6 +15,8 @@ sys.path.insert(0, str(backend_path))
 from shared.models.db_models import Task, MediaFile, User
 from shared.models.task import TaskStatus, TaskType
 from services.media_service.src.clients.gemini_client import GeminiClient
+from shared.utils.counts import count_cache, TASKS
+from shared.utils.task_timeline import TaskTimeline, KEY_LOOKUP, PROVIDER_REQUEST, DB_PERSIST
 
 
 class ImageService:
@@ -47,7 +49,8 @@ class ImageService:
         
         self.db.add(task)
         self.db.commit()
-        self.db.refresh(task)
+        
+        count_cache.invalidate(TASKS, user_id)
         
         return task
     
@@ -57,6 +60,9 @@ class ImageService:
         if not task:
             return None
         
+        timeline = TaskTimeline(task_id)
+        timeline.record_queue_wait(task.created_at)
+        
         try:
             # 更新任务状态
             task.status = TaskStatus.PROCESSING.value
@@ -69,26 +75,28 @@ class ImageService:
             size = params.get("size", "1024x1024")
             reference_images = params.get("reference_images", [])
             
-            # 获取用户的Gemini API密钥（直接从数据库查询，避免跨服务导入）
-            user = self.db.query(User).filter(User.id == task.user_id).first()
-            if not user:
-                raise ValueError("用户不存在")
-            
-            gemini_api_key = user.gemini_api_key
-            if not gemini_api_key:
-                raise ValueError("用户未配置Gemini API密钥，请先在设置中配置")
+            with timeline.stage(KEY_LOOKUP, provider="gemini"):
+                # 获取用户的Gemini API密钥（直接从数据库查询，避免跨服务导入）
+                user = self.db.query(User).filter(User.id == task.user_id).first()
+                if not user:
+                    raise ValueError("用户不存在")
+                
+                gemini_api_key = user.gemini_api_key
+                if not gemini_api_key:
+                    raise ValueError("用户未配置Gemini API密钥，请先在设置中配置")
             
             # 使用用户密钥创建客户端
             gemini_client = GeminiClient(api_key=gemini_api_key)
             
             try:
                 # 调用 Gemini 客户端生成图片
-                response = await gemini_client.generate_image(
-                    prompt=prompt,
-                    model=model,
-                    size=size,
-                    reference_images=reference_images
-                )
+                with timeline.stage(PROVIDER_REQUEST, provider="gemini", model=model):
+                    response = await gemini_client.generate_image(
+                        prompt=prompt,
+                        model=model,
+                        size=size,
+                        reference_images=reference_images
+                    )
             finally:
                 await gemini_client.close()
             
@@ -103,33 +111,33 @@ class ImageService:
             if not image_url:
                 raise ValueError("图片生成失败：响应中没有URL")
             
-            # 创建媒体文件记录
-            media_file = MediaFile(
-                user_id=task.user_id,
-                type="image",
-                storage_path=image_url,  # 暂时使用URL作为路径
-                url=image_url,
-                metadata={
-                    "prompt": prompt,
-                    "model": model,
-                    "size": size,
-                    "task_id": str(task_id)
+            with timeline.stage(DB_PERSIST):
+                # 创建媒体文件记录
+                media_file = MediaFile(
+                    user_id=task.user_id,
+                    type="image",
+                    storage_path=image_url,  # 暂时使用URL作为路径
+                    url=image_url,
+                    metadata={
+                        "prompt": prompt,
+                        "model": model,
+                        "size": size,
+                        "task_id": str(task_id)
+                    }
+                )
+                
+                self.db.add(media_file)
+                
+                # 更新任务状态
+                task.status = TaskStatus.COMPLETED.value
+                task.progress = 100
+                task.result = {
+                    "media_file_id": str(media_file.id),
+                    "url": image_url
                 }
-            )
-            
-            self.db.add(media_file)
-            
-            # 更新任务状态
-            task.status = TaskStatus.COMPLETED.value
-            task.progress = 100
-            task.result = {
-                "media_file_id": str(media_file.id),
-                "url": image_url
-            }
-            task.completed_at = datetime.utcnow()
-            
-            self.db.commit()
-            self.db.refresh(media_file)
+                task.completed_at = datetime.utcnow()
+                
+                self.db.commit()
             
             return media_file
             
@@ -15,6 +15,8 @@ sys.path.insert(0, str(backend_path))
 from shared.models.db_models import Task, MediaFile, User
 from shared.models.task import TaskStatus, TaskType
 from services.media_service.src.clients.tuzi_client import TuziClient
+from shared.utils.counts import count_cache, TASKS
+from shared.utils.task_timeline import TaskTimeline, KEY_LOOKUP, PROVIDER_REQUEST, PROVIDER_POLLING, DB_PERSIST
 
 
 class VideoService:
@@ -51,7 +53,8 @@ class VideoService:
         
         self.db.add(task)
         self.db.commit()
-        self.db.refresh(task)
+        
+        count_cache.invalidate(TASKS, user_id)
         
         return task
     
@@ -61,6 +64,9 @@ class VideoService:
         if not task:
             return None
         
+        timeline = TaskTimeline(task_id)
+        timeline.record_queue_wait(task.created_at)
+        
         try:
             # 更新任务状态
             task.status = TaskStatus.PROCESSING.value
@@ -84,27 +90,29 @@ class VideoService:
                 if media_file:
                     image_url = media_file.url
             
-            # 获取用户的Tuzi API密钥（直接从数据库查询，避免跨服务导入）
-            user = self.db.query(User).filter(User.id == task.user_id).first()
-            if not user:
-                raise ValueError("用户不存在")
-            
-            tuzi_api_key = user.tuzi_api_key
-            if not tuzi_api_key:
-                raise ValueError("用户未配置Tuzi API密钥，请先在设置中配置")
+            with timeline.stage(KEY_LOOKUP, provider="tuzi"):
+                # 获取用户的Tuzi API密钥（直接从数据库查询，避免跨服务导入）
+                user = self.db.query(User).filter(User.id == task.user_id).first()
+                if not user:
+                    raise ValueError("用户不存在")
+                
+                tuzi_api_key = user.tuzi_api_key
+                if not tuzi_api_key:
+                    raise ValueError("用户未配置Tuzi API密钥，请先在设置中配置")
             
             # 使用用户密钥创建客户端
             tuzi_client = TuziClient(api_key=tuzi_api_key)
             
             try:
                 # 调用 Tuzi 客户端生成视频
-                response = await tuzi_client.generate_video(
-                    prompt=prompt,
-                    image_url=image_url,
-                    seconds=seconds,
-                    model=model,
-                    reference_images=reference_images
-                )
+                with timeline.stage(PROVIDER_REQUEST, provider="tuzi", model=model):
+                    response = await tuzi_client.generate_video(
+                        prompt=prompt,
+                        image_url=image_url,
+                        seconds=seconds,
+                        model=model,
+                        reference_images=reference_images
+                    )
                 
                 # 解析响应
                 video_task_id = response.get("task_id") or response.get("id")
@@ -112,11 +120,12 @@ class VideoService:
                     raise ValueError("视频生成失败：响应中没有任务ID")
                 
                 # 轮询视频生成状态
-                video_result = await tuzi_client.wait_for_video(
-                    video_task_id,
-                    max_wait_time=300,
-                    poll_interval=5
-                )
+                with timeline.stage(PROVIDER_POLLING, provider="tuzi", video_task_id=video_task_id):
+                    video_result = await tuzi_client.wait_for_video(
+                        video_task_id,
+                        max_wait_time=300,
+                        poll_interval=5
+                    )
             finally:
                 await tuzi_client.close()
             
@@ -124,35 +133,35 @@ class VideoService:
             if not video_url:
                 raise ValueError("视频生成失败：响应中没有URL")
             
-            # 创建媒体文件记录
-            media_file = MediaFile(
-                user_id=task.user_id,
-                type="video",
-                storage_path=video_url,  # 暂时使用URL作为路径
-                url=video_url,
-                duration=int(seconds),
-                metadata={
-                    "prompt": prompt,
-                    "model": model,
-                    "seconds": seconds,
-                    "task_id": str(task_id),
-                    "video_task_id": video_task_id
+            with timeline.stage(DB_PERSIST):
+                # 创建媒体文件记录
+                media_file = MediaFile(
+                    user_id=task.user_id,
+                    type="video",
+                    storage_path=video_url,  # 暂时使用URL作为路径
+                    url=video_url,
+                    duration=int(seconds),
+                    metadata={
+                        "prompt": prompt,
+                        "model": model,
+                        "seconds": seconds,
+                        "task_id": str(task_id),
+                        "video_task_id": video_task_id
+                    }
+                )
+                
+                self.db.add(media_file)
+                
+                # 更新任务状态
+                task.status = TaskStatus.COMPLETED.value
+                task.progress = 100
+                task.result = {
+                    "media_file_id": str(media_file.id),
+                    "url": video_url
                 }
-            )
-            
-            self.db.add(media_file)
-            
-            # 更新任务状态
-            task.status = TaskStatus.COMPLETED.value
-            task.progress = 100
-            task.result = {
-                "media_file_id": str(media_file.id),
-                "url": video_url
-            }
-            task.completed_at = datetime.utcnow()
-            
-            self.db.commit()
-            self.db.refresh(media_file)
+                task.completed_at = datetime.utcnow()
+                
+                self.db.commit()
             
             return media_file
             
@@ -0,0 +1 @@
+"""共享API路由"""
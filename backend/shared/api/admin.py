@@ -0,0 +1,221 @@
+"""管理员运维 API（各服务共用）"""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from shared.utils.cache import cache_manager
+from shared.utils.exceptions import NotFoundError, ValidationError
+from shared.utils.log_sampling import access_log_sampler
+from shared.utils.logger import get_logging_stats
+from shared.utils.memory_profiler import memory_profiler
+from shared.utils.monitoring import metrics_collector
+from shared.utils.permissions import require_admin
+from shared.utils.profiler import sampling_profiler
+from shared.utils.tracing import InMemoryExporter, tracer
+
+router = APIRouter(prefix="/admin", tags=["运维管理"])
+
+
+@router.get("/cache/stats", response_model=dict)
+async def get_cache_stats(
+    scope: str = Query("local", pattern="^(local|cluster)$", description="local: 当前进程；cluster: 所有进程汇总"),
+    current_user = Depends(require_admin)
+):
+    """获取按前缀统计的缓存命中率、耗时和值大小"""
+    if scope == "cluster":
+        # 汇总需要读写Redis，放到线程中执行，避免阻塞事件循环
+        await asyncio.to_thread(cache_manager.export_stats)
+        data = {"prefixes": await asyncio.to_thread(cache_manager.get_cluster_stats)}
+    else:
+        data = cache_manager.get_stats()
+    
+    return {
+        "code": 200,
+        "data": data
+    }
+
+
+@router.get("/cache/memory", response_model=dict)
+async def get_cache_memory(
+    sample: int = Query(200, ge=1, le=2000, description="抽样键数量"),
+    match: str = Query("*", description="键匹配模式"),
+    maxScan: int = Query(10000, ge=1, le=200000, description="最多遍历的键数量"),
+    current_user = Depends(require_admin)
+):
+    """抽样统计Redis键的内存占用（MEMORY USAGE），按前缀汇总"""
+    report = await asyncio.to_thread(
+        cache_manager.memory_report,
+        sample_size=sample,
+        match=match,
+        max_scan=maxScan
+    )
+    
+    return {
+        "code": 200,
+        "data": report
+    }
+
+
+@router.get("/metrics/series", response_model=dict)
+async def get_metrics_series(
+    name: str = Query(..., description="序列名，如 requests:total、errors:total、status:5xx、requests:/api/v1/tasks"),
+    start: Optional[float] = Query(None, description="起始时间戳（秒），默认一小时前"),
+    end: Optional[float] = Query(None, description="结束时间戳（秒），默认当前时间"),
+    tier: Optional[str] = Query(None, pattern="^(10s|1m|1h)$", description="精度层级，默认自动选择"),
+    current_user = Depends(require_admin)
+):
+    """查询请求/错误计数的时间序列（用于仪表盘）"""
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - 3600
+    if end < start:
+        raise ValidationError("结束时间不能早于起始时间", field="end")
+    
+    return {
+        "code": 200,
+        "data": await asyncio.to_thread(metrics_collector.get_series, name, start, end, tier)
+    }
+
+
+@router.get("/traces/{trace_id}", response_model=dict)
+async def get_trace(
+    trace_id: str,
+    current_user = Depends(require_admin)
+):
+    """获取本进程内存导出器中的追踪（仅 TRACE_EXPORTER=memory 时可用）"""
+    if not isinstance(tracer.exporter, InMemoryExporter):
+        raise NotFoundError("追踪", resource_id=trace_id)
+    
+    return {
+        "code": 200,
+        "data": {
+            "traceId": trace_id,
+            "spans": tracer.exporter.get_trace(trace_id)
+        }
+    }
+
+
+@router.post("/profile/cpu", response_model=dict)
+async def profile_cpu(
+    seconds: float = Query(10, gt=0, le=60, description="分析时长（秒）"),
+    intervalMs: float = Query(10, ge=1, le=1000, description="采样间隔（毫秒）"),
+    includeIdle: bool = Query(False, description="是否保留空闲样本（事件循环等待IO、工作线程等待任务）"),
+    format: str = Query("json", pattern="^(json|collapsed)$", description="collapsed: 直接返回折叠栈文本"),
+    current_user = Depends(require_admin)
+):
+    """在当前worker中运行采样分析器，返回可生成火焰图的折叠栈"""
+    # 采样在独立线程中进行，事件循环线程本身也会被采样，用于发现阻塞事件循环的同步调用
+    result = await asyncio.to_thread(
+        sampling_profiler.profile,
+        seconds,
+        intervalMs / 1000,
+        threading.get_ident(),
+        includeIdle
+    )
+    
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"])
+    return {
+        "code": 200,
+        "data": result
+    }
+
+
+@router.get("/memory", response_model=dict)
+async def get_memory_status(
+    current_user = Depends(require_admin)
+):
+    """tracemalloc状态、已保留的快照和进程内数据结构的对象数量"""
+    data = memory_profiler.status()
+    data["structures"] = memory_profiler.structure_summary()
+    
+    return {
+        "code": 200,
+        "data": data
+    }
+
+
+@router.post("/memory/tracemalloc/start", response_model=dict)
+async def start_tracemalloc(
+    frames: int = Query(10, ge=1, le=100, description="每次分配记录的调用栈深度"),
+    current_user = Depends(require_admin)
+):
+    """在当前worker中启动tracemalloc（会增加内存和CPU开销，用完后应停止）"""
+    return {
+        "code": 200,
+        "data": memory_profiler.start(frames)
+    }
+
+
+@router.post("/memory/tracemalloc/stop", response_model=dict)
+async def stop_tracemalloc(
+    current_user = Depends(require_admin)
+):
+    """停止tracemalloc并丢弃快照"""
+    return {
+        "code": 200,
+        "data": memory_profiler.stop()
+    }
+
+
+@router.post("/memory/snapshots", response_model=dict)
+async def take_memory_snapshot(
+    label: Optional[str] = Query(None, max_length=100, description="快照标签"),
+    current_user = Depends(require_admin)
+):
+    """拍摄内存快照"""
+    return {
+        "code": 200,
+        "data": await asyncio.to_thread(memory_profiler.take_snapshot, label)
+    }
+
+
+@router.get("/memory/diff", response_model=dict)
+async def get_memory_diff(
+    base: Optional[int] = Query(None, description="基准快照ID，默认为目标快照的前一个"),
+    target: Optional[int] = Query(None, description="目标快照ID，默认为最新快照"),
+    groupBy: str = Query("lineno", pattern="^(lineno|filename|traceback)$", description="按分配位置分组的方式"),
+    limit: int = Query(20, ge=1, le=200, description="返回的条目数"),
+    current_user = Depends(require_admin)
+):
+    """比较两个快照，返回内存增长最多的分配位置和数据结构对象数量的变化"""
+    return {
+        "code": 200,
+        "data": await asyncio.to_thread(memory_profiler.diff, base, target, groupBy, limit)
+    }
+
+
+@router.get("/logging", response_model=dict)
+async def get_logging_config(
+    current_user = Depends(require_admin)
+):
+    """访问日志采样配置和日志队列状态"""
+    return {
+        "code": 200,
+        "data": {
+            "sampling": access_log_sampler.get_config(),
+            "queue": get_logging_stats()
+        }
+    }
+
+
+@router.put("/logging/sampling", response_model=dict)
+async def update_log_sampling(
+    rate: Optional[float] = Query(None, ge=0, le=1, description="采样比例；指定route时只作用于该路由"),
+    slowMs: Optional[float] = Query(None, ge=0, description="慢请求阈值（毫秒），超过时始终记录"),
+    route: Optional[str] = Query(None, description="路由模板，如 /api/v1/tasks/{task_id}；不传rate时删除该路由的单独设置"),
+    current_user = Depends(require_admin)
+):
+    """修改成功请求访问日志的采样比例（所有进程在10秒内生效）"""
+    if route is None:
+        config = await asyncio.to_thread(access_log_sampler.update, rate, slowMs)
+    else:
+        config = await asyncio.to_thread(access_log_sampler.update, None, slowMs, route, rate)
+    
+    return {
+        "code": 200,
+        "data": config
+    }
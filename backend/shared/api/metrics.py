@@ -0,0 +1,19 @@
+"""Prometheus指标端点（各服务共用）"""
+from fastapi import APIRouter, Query
+from fastapi.responses import Response
+
+from shared.utils.metrics_registry import CONTENT_TYPE, metrics_registry
+
+router = APIRouter(tags=["监控"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(
+    scope: str = Query("cluster", pattern="^(local|cluster)$", description="local: 当前进程；cluster: 同一服务所有worker汇总")
+):
+    """以Prometheus文本格式输出指标"""
+    if scope == "local":
+        body = metrics_registry.render()
+    else:
+        body = metrics_registry.render_cluster()
+    return Response(content=body, headers={"Content-Type": CONTENT_TYPE})
@@ -1,10 +1,64 @@
 import redis
 import os
+import time
+from redis.client import Pipeline
+
+from shared.utils.metrics_registry import metrics_registry
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+redis_command_duration = metrics_registry.histogram(
+    "redis_command_duration_seconds", "Redis命令耗时（秒），管道按一次往返计", ("command",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+redis_command_errors = metrics_registry.counter(
+    "redis_command_errors_total", "Redis命令失败次数", ("command",)
+)
+
+
+class InstrumentedPipeline(Pipeline):
+    """记录往返耗时的管道"""
+
+    def execute(self, raise_on_error=True):
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        except Exception:
+            redis_command_errors.inc(command="PIPELINE")
+            raise
+        finally:
+            redis_command_duration.observe(time.perf_counter() - start, command="PIPELINE")
+
+
+class InstrumentedRedis(redis.Redis):
+    """记录命令耗时的Redis客户端"""
+
+    def execute_command(self, *args, **options):
+        command = str(args[0]).split(" ", 1)[0].upper() if args else "UNKNOWN"
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        except Exception:
+            redis_command_errors.inc(command=command)
+            raise
+        finally:
+            redis_command_duration.observe(time.perf_counter() - start, command=command)
+
+    def pipeline(self, transaction=True, shard_hint=None) -> Pipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+redis_client = InstrumentedRedis.from_url(REDIS_URL, decode_responses=True)
+
+# 二进制客户端：缓存值使用带标记头的二进制编码，不能按UTF-8解码
+binary_redis_client = InstrumentedRedis.from_url(REDIS_URL, decode_responses=False)
 
 def get_redis():
     """获取Redis客户端"""
     return redis_client
+
+def get_binary_redis():
+    """获取二进制Redis客户端（不解码响应）"""
+    return binary_redis_client
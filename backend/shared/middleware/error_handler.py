@@ -8,17 +8,81 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from typing import Callable
 
 from shared.utils.exceptions import DirectorAIException
+from shared.utils.log_sampling import access_log_sampler
 from shared.utils.logger import setup_logger, log_error
+from shared.utils.metrics_registry import metrics_registry
 from shared.utils.monitoring import metrics_collector
+from shared.utils.request_context import (
+    REQUEST_ID_HEADER,
+    bind_request_context,
+    get_request_context,
+    reset_request_context,
+    update_request_context,
+)
+from shared.utils.routes import normalize_path, route_label
+from shared.utils.tracing import TRACEPARENT_HEADER, tracer
 
 logger = setup_logger(__name__)
 
+http_request_duration = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP请求耗时（秒）", ("method", "route", "status")
+)
+http_requests_in_flight = metrics_registry.gauge(
+    "http_requests_in_flight", "正在处理的HTTP请求数"
+)
+
 async def error_handler_middleware(request: Request, call_next: Callable):
     """
     统一错误处理中间件
     
-    捕获所有异常并返回统一的错误响应格式
+    捕获所有异常并返回统一的错误响应格式，同时记录进行中请求数和请求耗时指标。
+    请求带有traceparent时延续上游追踪，否则（如网关入口）创建新的追踪。
+    请求上下文（request_id、user_id、route）在整个请求期间对所有日志记录可见。
     """
+    start_time = time.perf_counter()
+    http_requests_in_flight.inc()
+    context_token = bind_request_context(
+        request_id=request.headers.get(REQUEST_ID_HEADER),
+        route=normalize_path(request.url.path),
+        method=request.method
+    )
+    try:
+        return await _observe_request(request, call_next, start_time)
+    finally:
+        reset_request_context(context_token)
+
+async def _observe_request(request: Request, call_next: Callable, start_time: float):
+    """在追踪span中执行请求并记录耗时指标"""
+    context = get_request_context()
+    with tracer.span(
+        f"{request.method} {request.url.path}",
+        kind="server",
+        attributes={"http.method": request.method},
+        parent=tracer.extract(request.headers)
+    ) as span:
+        request.state.trace_id = span.trace_id
+        try:
+            response = await _handle_request(request, call_next)
+        finally:
+            http_requests_in_flight.dec()
+        route = route_label(request)
+        span.name = f"{request.method} {route}"
+        span.set_attribute("http.route", route)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.status = "error"
+        response.headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+        response.headers[REQUEST_ID_HEADER] = context.request_id
+    http_request_duration.observe(
+        time.perf_counter() - start_time,
+        method=request.method,
+        route=route,
+        status=str(response.status_code)
+    )
+    return response
+
+async def _handle_request(request: Request, call_next: Callable):
+    """执行请求并把异常转换为统一的错误响应"""
     start_time = time.time()
     error_id = str(uuid.uuid4())
     
@@ -29,11 +93,13 @@ async def error_handler_middleware(request: Request, call_next: Callable):
         duration_ms = (time.time() - start_time) * 1000
         user_id = getattr(request.state, "user_id", None) if hasattr(request.state, "user") else None
         user_id_str = str(user_id) if user_id else None
+        route = route_label(request)
+        update_request_context(route=route)
         
-        # 记录指标
+        # 记录指标（端点维度使用路由模板）
         try:
             metrics_collector.record_request(
-                endpoint=str(request.url.path),
+                endpoint=route,
                 method=request.method,
                 status_code=response.status_code,
                 duration_ms=duration_ms,
@@ -42,24 +108,29 @@ async def error_handler_middleware(request: Request, call_next: Callable):
         except Exception as e:
             logger.warning(f"Failed to record metrics: {e}")
         
-        logger.info(
-            f"{request.method} {request.url.path} - {response.status_code} - {duration_ms:.2f}ms",
-            extra={
-                "extra_data": {
-                    "method": request.method,
-                    "path": str(request.url.path),
-                    "status_code": response.status_code,
-                    "duration_ms": duration_ms,
-                    "user_id": user_id_str,
-                    "client_ip": request.client.host if request.client else None,
+        # 访问日志：错误和慢请求全部记录，成功请求按比例采样（request_id、user_id、route来自请求上下文）
+        should_log, reason, sample_rate = access_log_sampler.decide(route, response.status_code, duration_ms)
+        if should_log:
+            logger.info(
+                f"{request.method} {request.url.path} - {response.status_code} - {duration_ms:.2f}ms",
+                extra={
+                    "extra_data": {
+                        "method": request.method,
+                        "path": str(request.url.path),
+                        "status_code": response.status_code,
+                        "duration_ms": duration_ms,
+                        "client_ip": request.client.host if request.client else None,
+                        "sample_reason": reason,
+                        "sample_rate": sample_rate,
+                    }
                 }
-            }
-        )
+            )
         
         return response
         
     except DirectorAIException as e:
         # 自定义异常
+        update_request_context(route=route_label(request))
         duration_ms = (time.time() - start_time) * 1000
         user_id_str = str(getattr(request.state, "user_id", None)) if hasattr(request.state, "user") else None
         
@@ -67,9 +138,10 @@ async def error_handler_middleware(request: Request, call_next: Callable):
         try:
             metrics_collector.record_error(
                 error_type=type(e).__name__,
-                endpoint=str(request.url.path),
+                endpoint=route_label(request),
                 error_message=e.detail,
-                user_id=user_id_str
+                user_id=user_id_str,
+                status_code=e.status_code
             )
         except Exception as metric_error:
             logger.warning(f"Failed to record error metrics: {metric_error}")
@@ -100,6 +172,7 @@ async def error_handler_middleware(request: Request, call_next: Callable):
         
     except RequestValidationError as e:
         # 请求验证错误
+        update_request_context(route=route_label(request))
         duration_ms = (time.time() - start_time) * 1000
         logger.warning(
             f"Validation error: {e.errors()}",
@@ -129,6 +202,7 @@ async def error_handler_middleware(request: Request, call_next: Callable):
         
     except StarletteHTTPException as e:
         # FastAPI HTTP异常
+        update_request_context(route=route_label(request))
         duration_ms = (time.time() - start_time) * 1000
         log_error(
             logger,
@@ -155,6 +229,7 @@ async def error_handler_middleware(request: Request, call_next: Callable):
         
     except Exception as e:
         # 未预期的异常
+        update_request_context(route=route_label(request))
         duration_ms = (time.time() - start_time) * 1000
         user_id_str = str(getattr(request.state, "user_id", None)) if hasattr(request.state, "user") else None
         
@@ -162,7 +237,7 @@ async def error_handler_middleware(request: Request, call_next: Callable):
         try:
             metrics_collector.record_error(
                 error_type=type(e).__name__,
-                endpoint=str(request.url.path),
+                endpoint=route_label(request),
                 error_message=str(e),
                 user_id=user_id_str
             )
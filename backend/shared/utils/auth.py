@@ -1,7 +1,8 @@
 """认证工具函数（可在所有服务中使用）"""
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from typing import Optional
 from datetime import datetime, timedelta
@@ -9,7 +10,8 @@ import os
 
 from shared.models.db_models import User
 from shared.utils.exceptions import AuthenticationError
-from shared.config.database import get_db
+from shared.utils.request_context import update_request_context
+from shared.config.database import get_async_db
 
 # JWT配置
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -19,14 +21,27 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
-def get_user_by_id(db: Session, user_id: str) -> Optional[User]:
+async def get_user_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
     """根据ID获取用户（可在所有服务中使用）"""
     from uuid import UUID
     try:
         uuid_id = UUID(user_id)
-        return db.query(User).filter(User.id == uuid_id).first()
     except (ValueError, TypeError):
         return None
+    result = await db.execute(select(User).where(User.id == uuid_id))
+    return result.scalar_one_or_none()
+
+
+def user_token_claims(user: User) -> dict:
+    """
+    用户令牌中的声明
+
+    管理员令牌带 admin 声明：没有数据库的网关据此校验运维端点的权限（各服务仍以数据库中的is_admin为准）
+    """
+    claims = {"sub": str(user.id)}
+    if getattr(user, "is_admin", False) is True:
+        claims["admin"] = True
+    return claims
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -43,12 +58,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """
     获取当前用户（可在所有服务中使用）
     
     这是一个通用的认证依赖函数，所有服务都可以使用它来验证JWT token并获取当前用户。
+    用户查询走异步会话，不阻塞事件循环；端点同样依赖 get_async_db 时共用同一个会话和连接。
     """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -58,7 +74,8 @@ async def get_current_user(
     except JWTError:
         raise AuthenticationError("Token 无效")
     
-    user = get_user_by_id(db, user_id)
+    user = await get_user_by_id(db, user_id)
     if user is None:
         raise AuthenticationError("用户不存在")
+    update_request_context(user_id=user.id)
     return user
@@ -1,26 +1,157 @@
 """缓存工具类"""
+import asyncio
+import inspect
 import json
 import hashlib
-from typing import Optional, Any, Callable
+import os
+import queue
+import random
+import threading
+import time
+from typing import Optional, Any, Callable, List, Dict
 from functools import wraps
-from shared.config.redis import get_redis
+from shared.config.redis import get_binary_redis
+from shared.utils.codecs import (
+    Codec,
+    DEFAULT_COMPRESS_THRESHOLD,
+    FLAG_ZLIB,
+    decode_value,
+    default_codec,
+    encode_value,
+    get_codec,
+)
 from shared.utils.logger import setup_logger
+from shared.utils.memory_profiler import memory_profiler
 
 logger = setup_logger(__name__)
 
+# 代数计数器键前缀与过期时间：代数键的TTL必须远大于任何缓存项的TTL，
+# 这样代数键过期归零后，旧代数下的缓存项早已自然过期，不会被误命中
+GENERATION_KEY_PREFIX = "cache:gen:"
+GENERATION_TTL = 30 * 24 * 3600
+
+
+def user_tag(user_id: Any) -> str:
+    """用户维度的缓存标签"""
+    return f"user:{user_id}"
+
+
+# 缓存统计导出到Redis的键前缀
+STATS_KEY_PREFIX = "metrics:cache:"
+STATS_PREFIXES_KEY = f"{STATS_KEY_PREFIX}prefixes"
+
+
+def _derive_stats(counters: Dict[str, float]) -> Dict[str, Any]:
+    """根据累计计数计算命中率、平均耗时、平均大小等派生指标"""
+    hits = counters.get("hits", 0)
+    misses = counters.get("misses", 0)
+    sets = counters.get("sets", 0)
+    lookups = hits + misses
+    stats = {field: counters.get(field, 0) for field in CacheStats.ADDITIVE_FIELDS}
+    if "max_stored_bytes" in counters:
+        stats["max_stored_bytes"] = counters["max_stored_bytes"]
+    stats["hit_ratio"] = round(hits / lookups, 4) if lookups else None
+    stats["avg_get_ms"] = round(counters.get("get_seconds", 0) / lookups * 1000, 3) if lookups else None
+    stats["avg_decode_ms"] = round(counters.get("decode_seconds", 0) / hits * 1000, 3) if hits else None
+    stats["avg_encode_ms"] = round(counters.get("encode_seconds", 0) / sets * 1000, 3) if sets else None
+    stats["avg_set_ms"] = round(counters.get("set_seconds", 0) / sets * 1000, 3) if sets else None
+    stats["avg_stored_bytes"] = round(counters.get("stored_bytes", 0) / sets, 2) if sets else None
+    return stats
+
+
+class CacheStats:
+    """按键前缀统计的缓存计数（进程内）"""
+    
+    ADDITIVE_FIELDS = (
+        "hits",
+        "misses",
+        "errors",
+        "sets",
+        "compressed_sets",
+        "stored_bytes",
+        "get_seconds",
+        "decode_seconds",
+        "encode_seconds",
+        "set_seconds",
+    )
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._exported: Dict[str, Dict[str, float]] = {}
+    
+    def record(self, prefix: str, max_stored_bytes: int = 0, **deltas: float):
+        """累加某个前缀的计数"""
+        with self._lock:
+            counters = self._counters.get(prefix)
+            if counters is None:
+                counters = {field: 0 for field in self.ADDITIVE_FIELDS}
+                counters["max_stored_bytes"] = 0
+                self._counters[prefix] = counters
+            for field, delta in deltas.items():
+                counters[field] += delta
+            if max_stored_bytes > counters["max_stored_bytes"]:
+                counters["max_stored_bytes"] = max_stored_bytes
+    
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """获取所有前缀的计数副本"""
+        with self._lock:
+            return {prefix: dict(counters) for prefix, counters in self._counters.items()}
+    
+    def drain_deltas(self) -> Dict[str, Dict[str, float]]:
+        """获取自上次导出以来的增量（仅可累加字段）"""
+        deltas = {}
+        with self._lock:
+            for prefix, counters in self._counters.items():
+                exported = self._exported.setdefault(prefix, {})
+                changed = {}
+                for field in self.ADDITIVE_FIELDS:
+                    delta = counters[field] - exported.get(field, 0)
+                    if delta:
+                        changed[field] = delta
+                        exported[field] = counters[field]
+                if changed:
+                    deltas[prefix] = changed
+        return deltas
+    
+    def reset(self):
+        """清空计数"""
+        with self._lock:
+            self._counters.clear()
+            self._exported.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._counters)
+
+
 class CacheManager:
     """缓存管理器"""
     
-    def __init__(self, redis_client=None, default_ttl: int = 300):
+    def __init__(
+        self,
+        redis_client=None,
+        default_ttl: int = 300,
+        codec: Optional[Codec] = None,
+        compress_threshold: Optional[int] = DEFAULT_COMPRESS_THRESHOLD
+    ):
         """
         初始化缓存管理器
         
         Args:
-            redis_client: Redis客户端（可选，默认使用共享客户端）
+            redis_client: Redis客户端（可选，默认使用共享的二进制客户端，
+                自定义客户端需设置decode_responses=False）
             default_ttl: 默认过期时间（秒），默认5分钟
+            codec: 写入时使用的编解码器（默认msgpack，不可用时为JSON）
+            compress_threshold: 压缩阈值（字节），None表示不压缩
         """
-        self.redis = redis_client or get_redis()
+        self.redis = redis_client or get_binary_redis()
         self.default_ttl = default_ttl
+        self.codec = codec or default_codec()
+        self.compress_threshold = compress_threshold
+        self.stats = CacheStats()
+        self._exporter: Optional[threading.Thread] = None
+        self._exporter_stop = threading.Event()
     
     def _make_key(self, prefix: str, *args, **kwargs) -> str:
         """生成缓存键"""
@@ -43,27 +174,236 @@ class CacheManager:
         
         return key_string
     
-    def get(self, key: str) -> Optional[Any]:
+    @staticmethod
+    def _key_prefix(key: str) -> str:
+        """从缓存键中取出统计用的前缀"""
+        return key.split(":", 1)[0]
+    
+    def get(self, key: str, prefix: Optional[str] = None) -> Optional[Any]:
         """获取缓存值"""
+        prefix = prefix or self._key_prefix(key)
+        start = time.perf_counter()
         try:
             value = self.redis.get(key)
+            fetched = time.perf_counter()
             if value is None:
+                self.stats.record(prefix, misses=1, get_seconds=fetched - start)
                 return None
-            return json.loads(value)
+            result = decode_value(value)
+            self.stats.record(
+                prefix,
+                hits=1,
+                get_seconds=fetched - start,
+                decode_seconds=time.perf_counter() - fetched
+            )
+            return result
         except Exception as e:
+            self.stats.record(prefix, errors=1)
             logger.warning(f"Cache get error for key {key}: {e}")
             return None
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+    def _encode(self, prefix: str, value: Any) -> bytes:
+        """编码缓存值并记录序列化耗时与大小"""
+        start = time.perf_counter()
+        serialized = encode_value(value, self.codec, self.compress_threshold)
+        size = len(serialized)
+        self.stats.record(
+            prefix,
+            max_stored_bytes=size,
+            sets=1,
+            stored_bytes=size,
+            compressed_sets=1 if serialized[1] & FLAG_ZLIB else 0,
+            encode_seconds=time.perf_counter() - start
+        )
+        return serialized
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, prefix: Optional[str] = None) -> bool:
         """设置缓存值"""
+        prefix = prefix or self._key_prefix(key)
         try:
             ttl = ttl or self.default_ttl
-            serialized = json.dumps(value, ensure_ascii=False, default=str)
-            return self.redis.setex(key, ttl, serialized)
+            serialized = self._encode(prefix, value)
+            start = time.perf_counter()
+            result = self.redis.setex(key, ttl, serialized)
+            self.stats.record(prefix, set_seconds=time.perf_counter() - start)
+            return result
         except Exception as e:
+            self.stats.record(prefix, errors=1)
             logger.warning(f"Cache set error for key {key}: {e}")
             return False
     
+    def get_stats(self) -> Dict[str, Any]:
+        """获取本进程的缓存统计（按前缀的命中率、耗时、值大小）"""
+        snapshot = self.stats.snapshot()
+        totals: Dict[str, float] = {field: 0 for field in CacheStats.ADDITIVE_FIELDS}
+        totals["max_stored_bytes"] = 0
+        for counters in snapshot.values():
+            for field in CacheStats.ADDITIVE_FIELDS:
+                totals[field] += counters[field]
+            totals["max_stored_bytes"] = max(totals["max_stored_bytes"], counters["max_stored_bytes"])
+        return {
+            "codec": self.codec.name,
+            "compress_threshold": self.compress_threshold,
+            "totals": _derive_stats(totals),
+            "prefixes": {
+                prefix: _derive_stats(counters)
+                for prefix, counters in sorted(snapshot.items())
+            },
+        }
+    
+    def export_stats(self) -> bool:
+        """
+        把自上次导出以来的统计增量写入Redis哈希（一次管道往返）
+        
+        各进程写入同一组哈希，按前缀汇总后即为全局统计。
+        """
+        deltas = self.stats.drain_deltas()
+        if not deltas:
+            return True
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for prefix, changed in deltas.items():
+                key = f"{STATS_KEY_PREFIX}{prefix}"
+                for field, delta in changed.items():
+                    if isinstance(delta, float):
+                        pipe.hincrbyfloat(key, field, delta)
+                    else:
+                        pipe.hincrby(key, field, delta)
+                pipe.sadd(STATS_PREFIXES_KEY, prefix)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Cache export_stats error: {e}")
+            return False
+    
+    def get_cluster_stats(self) -> Dict[str, Any]:
+        """获取所有进程导出到Redis的汇总统计"""
+        try:
+            prefixes = sorted(
+                prefix.decode() if isinstance(prefix, bytes) else prefix
+                for prefix in self.redis.smembers(STATS_PREFIXES_KEY)
+            )
+            pipe = self.redis.pipeline(transaction=False)
+            for prefix in prefixes:
+                pipe.hgetall(f"{STATS_KEY_PREFIX}{prefix}")
+            rows = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Cache get_cluster_stats error: {e}")
+            return {}
+        
+        result = {}
+        for prefix, row in zip(prefixes, rows):
+            counters = {
+                (field.decode() if isinstance(field, bytes) else field): float(value)
+                for field, value in row.items()
+            }
+            result[prefix] = _derive_stats(counters)
+        return result
+    
+    def start_stats_exporter(self, interval: float = 30.0):
+        """启动后台线程定期导出统计"""
+        if self._exporter is not None and self._exporter.is_alive():
+            return
+        self._exporter_stop.clear()
+        
+        def run():
+            while not self._exporter_stop.wait(interval):
+                self.export_stats()
+            self.export_stats()
+        
+        self._exporter = threading.Thread(target=run, name="cache-stats-exporter", daemon=True)
+        self._exporter.start()
+    
+    def stop_stats_exporter(self, timeout: Optional[float] = None):
+        """停止后台导出线程（退出前会再导出一次）"""
+        self._exporter_stop.set()
+        if self._exporter is not None:
+            self._exporter.join(timeout)
+            self._exporter = None
+    
+    def memory_report(
+        self,
+        sample_size: int = 200,
+        match: str = "*",
+        max_scan: int = 10000
+    ) -> Dict[str, Any]:
+        """
+        抽样统计键的内存占用（MEMORY USAGE），按前缀汇总
+        
+        最多SCAN max_scan个键，用蓄水池抽样选出sample_size个键，
+        再在一次管道中获取其MEMORY USAGE和TTL。
+        
+        Args:
+            sample_size: 抽样键数量
+            match: 键匹配模式
+            max_scan: 最多遍历的键数量
+        """
+        sample: List[Any] = []
+        scanned_by_prefix: Dict[str, int] = {}
+        scanned = 0
+        try:
+            for key in self.redis.scan_iter(match=match, count=500):
+                name = key.decode() if isinstance(key, bytes) else key
+                prefix = self._key_prefix(name)
+                scanned_by_prefix[prefix] = scanned_by_prefix.get(prefix, 0) + 1
+                scanned += 1
+                if len(sample) < sample_size:
+                    sample.append(key)
+                else:
+                    index = random.randrange(scanned)
+                    if index < sample_size:
+                        sample[index] = key
+                if scanned >= max_scan:
+                    break
+            
+            pipe = self.redis.pipeline(transaction=False)
+            for key in sample:
+                pipe.memory_usage(key, samples=0)
+                pipe.ttl(key)
+            values = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Cache memory_report error: {e}")
+            return {"error": str(e)}
+        
+        prefixes: Dict[str, Dict[str, Any]] = {}
+        for i, key in enumerate(sample):
+            memory, ttl = values[2 * i], values[2 * i + 1]
+            if memory is None:
+                continue
+            name = key.decode() if isinstance(key, bytes) else key
+            row = prefixes.setdefault(self._key_prefix(name), {
+                "sampled_keys": 0,
+                "sampled_bytes": 0,
+                "max_bytes": 0,
+                "ttl_total": 0,
+                "no_ttl_keys": 0,
+            })
+            row["sampled_keys"] += 1
+            row["sampled_bytes"] += memory
+            row["max_bytes"] = max(row["max_bytes"], memory)
+            if ttl is not None and ttl >= 0:
+                row["ttl_total"] += ttl
+            else:
+                row["no_ttl_keys"] += 1
+        
+        for prefix, row in prefixes.items():
+            with_ttl = row["sampled_keys"] - row["no_ttl_keys"]
+            row["avg_bytes"] = round(row["sampled_bytes"] / row["sampled_keys"], 2)
+            row["avg_ttl_seconds"] = round(row.pop("ttl_total") / with_ttl, 1) if with_ttl else None
+            row["scanned_keys"] = scanned_by_prefix.get(prefix, 0)
+            row["estimated_bytes"] = int(row["avg_bytes"] * row["scanned_keys"])
+        
+        return {
+            "scanned_keys": scanned,
+            "sampled_keys": len(sample),
+            "scan_complete": scanned < max_scan,
+            "prefixes": dict(sorted(
+                prefixes.items(),
+                key=lambda item: item[1]["estimated_bytes"],
+                reverse=True
+            )),
+        }
+    
     def delete(self, key: str) -> bool:
         """删除缓存值"""
         try:
@@ -72,37 +412,269 @@ class CacheManager:
             logger.warning(f"Cache delete error for key {key}: {e}")
             return False
     
-    def delete_pattern(self, pattern: str) -> int:
-        """删除匹配模式的所有键"""
+    def get_many(self, keys: List[str], prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        批量获取缓存值（单次MGET）
+        
+        Returns:
+            命中的键值字典，未命中或解码失败的键不包含在内
+        """
+        if not keys:
+            return {}
+        start = time.perf_counter()
         try:
-            keys = self.redis.keys(pattern)
-            if keys:
-                return self.redis.delete(*keys)
+            values = self.redis.mget(keys)
+        except Exception as e:
+            for key in keys:
+                self.stats.record(prefix or self._key_prefix(key), errors=1)
+            logger.warning(f"Cache get_many error for {len(keys)} keys: {e}")
+            return {}
+        # MGET的往返耗时平摊到每个键
+        per_key_seconds = (time.perf_counter() - start) / len(keys)
+        
+        result = {}
+        for key, value in zip(keys, values):
+            key_prefix = prefix or self._key_prefix(key)
+            if value is None:
+                self.stats.record(key_prefix, misses=1, get_seconds=per_key_seconds)
+                continue
+            decode_start = time.perf_counter()
+            try:
+                result[key] = decode_value(value)
+            except Exception as e:
+                self.stats.record(key_prefix, errors=1)
+                logger.warning(f"Cache decode error for key {key}: {e}")
+                continue
+            self.stats.record(
+                key_prefix,
+                hits=1,
+                get_seconds=per_key_seconds,
+                decode_seconds=time.perf_counter() - decode_start
+            )
+        return result
+    
+    def set_many(
+        self,
+        mapping: Dict[str, Any],
+        ttl: Optional[int] = None,
+        prefix: Optional[str] = None
+    ) -> bool:
+        """批量设置缓存值（管道内SETEX，一次往返）"""
+        if not mapping:
+            return True
+        try:
+            ttl = ttl or self.default_ttl
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.setex(key, ttl, self._encode(prefix or self._key_prefix(key), value))
+            pipe.execute()
+            return True
+        except Exception as e:
+            self.stats.record(prefix or self._key_prefix(next(iter(mapping))), errors=1)
+            logger.warning(f"Cache set_many error for {len(mapping)} keys: {e}")
+            return False
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存值"""
+        if not keys:
             return 0
+        try:
+            return self.redis.unlink(*keys)
         except Exception as e:
-            logger.warning(f"Cache delete_pattern error for pattern {pattern}: {e}")
+            logger.warning(f"Cache delete_many error for {len(keys)} keys: {e}")
             return 0
     
-    def clear_user_cache(self, user_id: str):
-        """清除用户相关的所有缓存"""
-        patterns = [
-            f"user:{user_id}:*",
-            f"stats:user:{user_id}:*",
-            f"conversations:user:{user_id}:*",
-            f"tasks:user:{user_id}:*",
-        ]
+    def delete_pattern(
+        self,
+        pattern: str,
+        batch_size: int = 500,
+        pause_seconds: float = 0
+    ) -> int:
+        """
+        删除匹配模式的所有键
+        
+        使用SCAN增量遍历并按批UNLINK，避免KEYS阻塞Redis。
+        遍历整个键空间仍然较慢，请求路径上应优先使用invalidate_tags，
+        必须显式清除时交给cache_sweeper在后台执行。
+        
+        Args:
+            pattern: 匹配模式
+            batch_size: 每批SCAN/UNLINK的键数量
+            pause_seconds: 每批之间的休眠时间（秒），用于后台限速
+        """
         total_deleted = 0
-        for pattern in patterns:
-            total_deleted += self.delete_pattern(pattern)
-        return total_deleted
+        batch = []
+        try:
+            for key in self.redis.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    total_deleted += self.redis.unlink(*batch)
+                    batch = []
+                    if pause_seconds:
+                        time.sleep(pause_seconds)
+            if batch:
+                total_deleted += self.redis.unlink(*batch)
+            return total_deleted
+        except Exception as e:
+            logger.warning(f"Cache delete_pattern error for pattern {pattern}: {e}")
+            return total_deleted
+    
+    def _generation_key(self, tag: str) -> str:
+        """生成标签代数计数器的键"""
+        return f"{GENERATION_KEY_PREFIX}{tag}"
+    
+    def get_generations(self, tags: List[str]) -> Optional[List[int]]:
+        """
+        批量获取标签的当前代数（单次MGET）
+        
+        Returns:
+            与tags顺序一致的代数列表；Redis不可用时返回None
+        """
+        if not tags:
+            return []
+        try:
+            values = self.redis.mget([self._generation_key(tag) for tag in tags])
+            return [int(value or 0) for value in values]
+        except Exception as e:
+            logger.warning(f"Cache get_generations error for tags {tags}: {e}")
+            return None
+    
+    def versioned_key(self, base_key: str, tags: List[str]) -> Optional[str]:
+        """
+        在缓存键中嵌入标签代数
+        
+        标签代数变化后旧键不再被访问，由TTL自然淘汰。
+        Redis不可用时返回None，调用方应跳过缓存。
+        """
+        suffix = self.version_suffix(tags)
+        if suffix is None:
+            return None
+        return f"{base_key}{suffix}"
+    
+    def version_suffix(self, tags: List[str]) -> Optional[str]:
+        """生成标签代数后缀（无标签时为空字符串，Redis不可用时返回None）"""
+        if not tags:
+            return ""
+        generations = self.get_generations(tags)
+        if generations is None:
+            return None
+        version = ".".join(str(generation) for generation in generations)
+        return f":g{version}"
+    
+    def make_tagged_key(self, prefix: str, tags: List[str], *args, **kwargs) -> Optional[str]:
+        """生成嵌入标签代数的缓存键"""
+        return self.versioned_key(self._make_key(prefix, *args, **kwargs), tags)
+    
+    def invalidate_tags(self, *tags: str) -> bool:
+        """
+        使标签下的所有缓存失效（每个标签一次INCR，同一管道内完成）
+        """
+        if not tags:
+            return True
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for tag in tags:
+                key = self._generation_key(tag)
+                pipe.incr(key)
+                pipe.expire(key, GENERATION_TTL)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Cache invalidate_tags error for tags {tags}: {e}")
+            return False
+    
+    def clear_user_cache(self, user_id: str) -> bool:
+        """
+        清除用户相关的所有缓存
+        
+        只递增用户标签的代数（一次INCR），旧缓存项由TTL自然淘汰。
+        """
+        return self.invalidate_tags(user_tag(user_id))
 
-# 全局缓存管理器实例
-cache_manager = CacheManager()
+
+class CacheSweeper:
+    """
+    后台缓存清理器
+    
+    在独立线程中按SCAN批次执行显式的模式清除，不占用请求路径。
+    """
+    
+    def __init__(
+        self,
+        cache: CacheManager,
+        batch_size: int = 500,
+        pause_seconds: float = 0.01
+    ):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def submit(self, pattern: str):
+        """提交一个待清除的键模式"""
+        self._ensure_started()
+        self._queue.put(pattern)
+    
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="cache-sweeper",
+                    daemon=True
+                )
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            pattern = self._queue.get()
+            try:
+                if pattern is None:
+                    return
+                deleted = self.cache.delete_pattern(
+                    pattern,
+                    batch_size=self.batch_size,
+                    pause_seconds=self.pause_seconds
+                )
+                logger.debug(f"Cache sweeper purged {deleted} keys for pattern {pattern}")
+            except Exception as e:
+                logger.warning(f"Cache sweeper error for pattern {pattern}: {e}")
+            finally:
+                self._queue.task_done()
+    
+    def join(self):
+        """等待已提交的清除任务全部完成"""
+        self._queue.join()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台线程"""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+# 全局缓存管理器实例（CACHE_CODEC可选json/msgpack，用于灰度切换编码格式）
+cache_manager = CacheManager(
+    default_ttl=int(os.getenv("CACHE_DEFAULT_TTL", "300")),
+    codec=get_codec(os.environ["CACHE_CODEC"]) if os.getenv("CACHE_CODEC") else None,
+    compress_threshold=int(os.getenv("CACHE_COMPRESS_THRESHOLD", str(DEFAULT_COMPRESS_THRESHOLD))),
+)
+# 全局后台清理器实例
+cache_sweeper = CacheSweeper(cache_manager)
+# 缓存值都在Redis中，进程内没有L1缓存；只统计按前缀的计数和待清理队列
+memory_profiler.register_structure("cache", lambda: {
+    "stats_prefixes": len(cache_manager.stats),
+    "sweeper_pending": cache_sweeper._queue.qsize(),
+})
 
 def cached(
     prefix: str,
     ttl: Optional[int] = None,
-    key_func: Optional[Callable] = None
+    key_func: Optional[Callable] = None,
+    tags_func: Optional[Callable[..., List[str]]] = None
 ):
     """
     缓存装饰器
@@ -111,18 +683,28 @@ def cached(
         prefix: 缓存键前缀
         ttl: 过期时间（秒）
         key_func: 自定义键生成函数
+        tags_func: 根据调用参数返回缓存标签列表，键中会嵌入这些标签的代数，
+            通过cache_manager.invalidate_tags使其失效
     """
+    def build_key(*args, **kwargs) -> Optional[str]:
+        if key_func:
+            cache_key = key_func(*args, **kwargs)
+        else:
+            cache_key = cache_manager._make_key(prefix, *args, **kwargs)
+        if not tags_func:
+            return cache_key
+        return cache_manager.versioned_key(cache_key, tags_func(*args, **kwargs))
+    
     def decorator(func: Callable):
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
             # 生成缓存键
-            if key_func:
-                cache_key = key_func(*args, **kwargs)
-            else:
-                cache_key = cache_manager._make_key(prefix, *args, **kwargs)
+            cache_key = build_key(*args, **kwargs)
+            if cache_key is None:
+                return await func(*args, **kwargs)
             
             # 尝试从缓存获取
-            cached_value = cache_manager.get(cache_key)
+            cached_value = cache_manager.get(cache_key, prefix=prefix)
             if cached_value is not None:
                 logger.debug(f"Cache hit: {cache_key}")
                 return cached_value
@@ -132,20 +714,19 @@ def cached(
             result = await func(*args, **kwargs)
             
             # 存入缓存
-            cache_manager.set(cache_key, result, ttl)
+            cache_manager.set(cache_key, result, ttl, prefix=prefix)
             
             return result
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
             # 生成缓存键
-            if key_func:
-                cache_key = key_func(*args, **kwargs)
-            else:
-                cache_key = cache_manager._make_key(prefix, *args, **kwargs)
+            cache_key = build_key(*args, **kwargs)
+            if cache_key is None:
+                return func(*args, **kwargs)
             
             # 尝试从缓存获取
-            cached_value = cache_manager.get(cache_key)
+            cached_value = cache_manager.get(cache_key, prefix=prefix)
             if cached_value is not None:
                 logger.debug(f"Cache hit: {cache_key}")
                 return cached_value
@@ -155,12 +736,97 @@ def cached(
             result = func(*args, **kwargs)
             
             # 存入缓存
-            cache_manager.set(cache_key, result, ttl)
+            cache_manager.set(cache_key, result, ttl, prefix=prefix)
             
             return result
         
         # 判断是否是协程函数
-        import asyncio
+        if asyncio.iscoroutinefunction(func):
+            return async_wrapper
+        else:
+            return sync_wrapper
+    
+    return decorator
+
+
+def cached_items(
+    prefix: str,
+    ids_arg: str = "ids",
+    id_func: Callable[[Any], Any] = lambda item: item["id"],
+    ttl: Optional[int] = None,
+    tags_func: Optional[Callable[..., List[str]]] = None
+):
+    """
+    按条目缓存的批量加载装饰器
+    
+    被装饰函数根据ID列表批量加载条目并返回列表。调用时先用MGET取回已缓存的条目，
+    只把缺失的ID传给被装饰函数，再用管道写回缓存，最后按传入ID的顺序重组结果。
+    不存在的ID不会出现在结果中。
+    
+    Args:
+        prefix: 缓存键前缀，条目键为 "{prefix}:{id}"
+        ids_arg: 被装饰函数中ID列表参数的名称
+        id_func: 从加载结果中取出条目ID的函数
+        ttl: 过期时间（秒）
+        tags_func: 根据调用参数返回缓存标签列表（同cached）
+    """
+    def decorator(func: Callable):
+        signature = inspect.signature(func)
+        
+        def prepare(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            ids = list(bound.arguments[ids_arg])
+            suffix = cache_manager.version_suffix(tags_func(*args, **kwargs) if tags_func else [])
+            if suffix is None:
+                return bound, ids, None, {}
+            keys = [f"{cache_manager._make_key(prefix, item_id)}{suffix}" for item_id in ids]
+            hits = cache_manager.get_many(keys, prefix=prefix)
+            return bound, ids, keys, hits
+        
+        def missing_call_args(bound, ids, keys, hits):
+            missing_ids = [
+                item_id for item_id, key in zip(ids, keys) if key not in hits
+            ]
+            bound.arguments[ids_arg] = missing_ids
+            return missing_ids, bound.args, bound.kwargs
+        
+        def assemble(ids, keys, hits, loaded):
+            loaded_by_id = {str(id_func(item)): item for item in loaded}
+            to_cache = {}
+            result = []
+            for item_id, key in zip(ids, keys):
+                if key in hits:
+                    result.append(hits[key])
+                    continue
+                item = loaded_by_id.get(str(item_id))
+                if item is not None:
+                    to_cache[key] = item
+                    result.append(item)
+            cache_manager.set_many(to_cache, ttl, prefix=prefix)
+            logger.debug(
+                f"Cache items {prefix}: {len(hits)} hits, {len(ids) - len(hits)} misses"
+            )
+            return result
+        
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            bound, ids, keys, hits = prepare(args, kwargs)
+            if keys is None:
+                return await func(*args, **kwargs)
+            missing_ids, call_args, call_kwargs = missing_call_args(bound, ids, keys, hits)
+            loaded = await func(*call_args, **call_kwargs) if missing_ids else []
+            return assemble(ids, keys, hits, loaded)
+        
+        @wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            bound, ids, keys, hits = prepare(args, kwargs)
+            if keys is None:
+                return func(*args, **kwargs)
+            missing_ids, call_args, call_kwargs = missing_call_args(bound, ids, keys, hits)
+            loaded = func(*call_args, **call_kwargs) if missing_ids else []
+            return assemble(ids, keys, hits, loaded)
+        
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
         else:
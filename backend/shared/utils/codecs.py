@@ -0,0 +1,170 @@
+"""缓存值编解码器
+
+存储格式：1字节编解码器标记 + 1字节标志位 + 负载。
+没有标记头的值按旧版JSON格式解析，便于新旧格式在灰度期间共存。
+"""
+import json
+import uuid
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:  # pragma: no cover - 依赖缺失时退回JSON
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# 标志位
+FLAG_NONE = 0x00
+FLAG_ZLIB = 0x01
+
+# 默认压缩阈值（字节），序列化结果超过该大小时压缩
+DEFAULT_COMPRESS_THRESHOLD = 1024
+
+# msgpack扩展类型编号
+EXT_UUID = 1
+EXT_DATETIME = 2
+EXT_DATE = 3
+EXT_DECIMAL = 4
+
+
+class Codec:
+    """编解码器基类"""
+
+    tag: int = 0
+    name: str = ""
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JSONCodec(Codec):
+    """JSON编解码器（与旧格式兼容，非JSON类型转为字符串）"""
+
+    tag = 0x01
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """msgpack扩展类型编码"""
+    if isinstance(obj, uuid.UUID):
+        return msgpack.ExtType(EXT_UUID, obj.bytes)
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode("ascii"))
+    if isinstance(obj, date):
+        return msgpack.ExtType(EXT_DATE, obj.isoformat().encode("ascii"))
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(obj).encode("ascii"))
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    # 与JSON编解码器行为一致：未知类型转为字符串
+    return str(obj)
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    """msgpack扩展类型解码"""
+    if code == EXT_UUID:
+        return uuid.UUID(bytes=data)
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode("ascii"))
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode("ascii"))
+    if code == EXT_DECIMAL:
+        return Decimal(data.decode("ascii"))
+    return msgpack.ExtType(code, data)
+
+
+class MsgpackCodec(Codec):
+    """msgpack二进制编解码器，保留UUID、datetime、date、Decimal类型"""
+
+    tag = 0x02
+    name = "msgpack"
+
+    def __init__(self):
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack未安装，无法使用MsgpackCodec")
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, raw=False)
+
+
+_codecs_by_tag: Dict[int, Codec] = {}
+_codecs_by_name: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec):
+    """注册编解码器"""
+    _codecs_by_tag[codec.tag] = codec
+    _codecs_by_name[codec.name] = codec
+
+
+def get_codec(name: str) -> Codec:
+    """根据名称获取编解码器"""
+    codec = _codecs_by_name.get(name)
+    if codec is None:
+        raise ValueError(f"未知的编解码器: {name}")
+    return codec
+
+
+def default_codec() -> Codec:
+    """默认编解码器：msgpack可用时使用msgpack，否则使用JSON"""
+    return _codecs_by_name.get("msgpack") or _codecs_by_name["json"]
+
+
+register_codec(JSONCodec())
+if MSGPACK_AVAILABLE:
+    register_codec(MsgpackCodec())
+
+
+def encode_value(
+    value: Any,
+    codec: Codec,
+    compress_threshold: Optional[int] = DEFAULT_COMPRESS_THRESHOLD
+) -> bytes:
+    """
+    编码缓存值
+
+    Args:
+        value: 待编码的值
+        codec: 编解码器
+        compress_threshold: 压缩阈值（字节），None表示不压缩
+    """
+    payload = codec.dumps(value)
+    flags = FLAG_NONE
+    if compress_threshold is not None and len(payload) > compress_threshold:
+        compressed = zlib.compress(payload, 1)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= FLAG_ZLIB
+    return bytes((codec.tag, flags)) + payload
+
+
+def decode_value(data: Any) -> Any:
+    """
+    解码缓存值，兼容没有标记头的旧版JSON值
+    """
+    if isinstance(data, str):
+        return json.loads(data)
+    if len(data) >= 2 and data[0] in _codecs_by_tag:
+        codec = _codecs_by_tag[data[0]]
+        flags = data[1]
+        payload = data[2:]
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        return codec.loads(payload)
+    return json.loads(data)
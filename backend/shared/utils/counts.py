@@ -0,0 +1,139 @@
+"""列表总数
+
+列表接口不再每页对用户的全部数据执行 COUNT(*)：
+
+- 已维护计数的直接读取计数列（如 Conversation.message_count）
+- 按用户的总数（任务数、对话数）缓存在Redis中，写入时失效
+- 带筛选条件的查询使用PostgreSQL查询计划的估计行数（其他数据库退回精确统计）
+
+只有调用方明确要求精确值时才执行 COUNT(*)。
+"""
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
+
+from shared.utils.cache import CacheManager, cache_manager
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 计数类型
+TASKS = "tasks"
+CONVERSATIONS = "conversations"
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) <查询>，参数按原查询的类型绑定"""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+class CountCache:
+    """按用户缓存的列表总数"""
+
+    def __init__(self, cache: Optional[CacheManager] = None, ttl: int = 300):
+        """
+        初始化总数缓存
+
+        Args:
+            cache: 缓存管理器（可选，默认使用全局实例）
+            ttl: 过期时间（秒），写入路径漏掉失效时最多偏差这么久
+        """
+        self.cache = cache or cache_manager
+        self.ttl = ttl
+
+    def _key(self, kind: str, scope_id: Any) -> str:
+        return f"count:{kind}:{scope_id}"
+
+    async def get_count(
+        self,
+        kind: str,
+        scope_id: Any,
+        loader: Callable[[], Awaitable[Optional[int]]]
+    ) -> int:
+        """
+        获取总数，未缓存时用loader精确统计并写入缓存
+
+        Args:
+            kind: 计数类型
+            scope_id: 计数范围（如用户ID）
+            loader: 精确统计的协程函数
+        """
+        # 缓存读写是同步Redis调用，放到线程中执行，避免阻塞事件循环
+        key = self._key(kind, scope_id)
+        cached = await asyncio.to_thread(self.cache.get, key, prefix="count")
+        if cached is not None:
+            return cached
+
+        count = await loader() or 0
+        await asyncio.to_thread(self.cache.set, key, count, self.ttl, prefix="count")
+        return count
+
+    def invalidate(self, kind: str, scope_id: Any):
+        """数据增删后使总数失效（同步代码中使用）"""
+        self.cache.delete(self._key(kind, scope_id))
+
+    async def invalidate_async(self, kind: str, scope_id: Any):
+        """invalidate 的异步版本（异步服务中使用）"""
+        await asyncio.to_thread(self.invalidate, kind, scope_id)
+
+
+async def exact_count(db, query) -> int:
+    """对查询结果执行 COUNT(*)"""
+    return await db.scalar(
+        select(func.count()).select_from(query.order_by(None).subquery())
+    ) or 0
+
+
+async def estimate_count(db, query) -> Optional[int]:
+    """
+    查询计划估计的结果行数
+
+    只支持PostgreSQL（EXPLAIN不执行查询，代价与数据量无关），其他数据库或失败时返回None。
+    估计值依赖表统计信息，可能与实际行数有偏差。
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    try:
+        result = await db.execute(_Explain(query.order_by(None)))
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"Failed to estimate row count: {e}")
+        return None
+
+
+async def count_rows(db, query, exact: bool = False) -> int:
+    """
+    带筛选条件的查询总数：默认优先使用查询计划估计值，exact时精确统计
+
+    Args:
+        db: 数据库会话
+        query: 返回数据行的select（排序会被忽略）
+        exact: 是否需要精确值
+    """
+    if not exact:
+        estimate = await estimate_count(db, query)
+        if estimate is not None:
+            return estimate
+    return await exact_count(db, query)
+
+
+# 全局总数缓存实例
+count_cache = CountCache(ttl=int(os.getenv("COUNT_CACHE_TTL", "300")))
@@ -0,0 +1,132 @@
+"""对数线性分桶的延迟直方图
+
+每个2的幂区间再线性细分为16个子桶（相对误差不超过1/16），
+桶计数可以直接相加，因此多个进程、多个时间片的直方图可以合并后再计算分位数。
+Redis中以哈希存储：字段为桶编号，另有 n（样本数）和 sum（总耗时，毫秒）两个字段。
+"""
+import math
+from typing import Dict, Iterable, Mapping, Optional
+
+# 每个2的幂区间的线性子桶数量 = 2 ** SUB_BUCKET_BITS
+SUB_BUCKET_BITS = 4
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+# 记录单位：微秒
+_UNITS_PER_MS = 1000
+
+COUNT_FIELD = "n"
+SUM_FIELD = "sum"
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def bucket_index(value_us: int) -> int:
+    """计算值（微秒）所在的桶编号"""
+    if value_us < SUB_BUCKET_COUNT:
+        return max(value_us, 0)
+    shift = value_us.bit_length() - 1 - SUB_BUCKET_BITS
+    sub_bucket = (value_us >> shift) - SUB_BUCKET_COUNT
+    return (shift + 1) * SUB_BUCKET_COUNT + sub_bucket
+
+
+def bucket_lower_bound(index: int) -> int:
+    """桶的下界（微秒，包含）"""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_COUNT - 1
+    sub_bucket = index % SUB_BUCKET_COUNT
+    return (SUB_BUCKET_COUNT + sub_bucket) << shift
+
+
+def bucket_upper_bound(index: int) -> int:
+    """桶的上界（微秒，不包含）"""
+    return bucket_lower_bound(index + 1)
+
+
+class LatencyHistogram:
+    """延迟直方图（毫秒）"""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_ms = 0.0
+
+    def record(self, duration_ms: float, count: int = 1):
+        """记录一个耗时样本"""
+        index = bucket_index(int(duration_ms * _UNITS_PER_MS))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total_ms += duration_ms * count
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """合并另一个直方图"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_ms += other.total_ms
+        return self
+
+    @property
+    def mean_ms(self) -> Optional[float]:
+        """平均耗时"""
+        if not self.count:
+            return None
+        return self.total_ms / self.count
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        计算分位数（毫秒）
+
+        返回目标样本所在桶的中点，误差不超过桶宽的一半。
+        """
+        if not self.count:
+            return None
+        # 先舍入再取整，避免浮点误差导致排名多算一位
+        rank = max(1, math.ceil(round(percent / 100.0 * self.count, 6)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                lower = bucket_lower_bound(index)
+                upper = bucket_upper_bound(index)
+                return (lower + upper) / 2.0 / _UNITS_PER_MS
+        return bucket_upper_bound(max(self.counts)) / _UNITS_PER_MS
+
+    def percentiles(self, percents: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, Optional[float]]:
+        """批量计算分位数，键形如 p50、p99.9"""
+        result = {}
+        for percent in percents:
+            label = f"p{percent:g}"
+            value = self.percentile(percent)
+            result[label] = round(value, 3) if value is not None else None
+        return result
+
+    def summary(self, percents: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, Optional[float]]:
+        """样本数、平均值与分位数"""
+        mean = self.mean_ms
+        return {
+            "count": self.count,
+            "avg_ms": round(mean, 3) if mean is not None else None,
+            **self.percentiles(percents),
+        }
+
+    def to_fields(self) -> Dict[str, float]:
+        """转换为Redis哈希字段"""
+        fields: Dict[str, float] = {str(index): count for index, count in self.counts.items()}
+        fields[COUNT_FIELD] = self.count
+        fields[SUM_FIELD] = self.total_ms
+        return fields
+
+    @classmethod
+    def from_fields(cls, fields: Mapping) -> "LatencyHistogram":
+        """从Redis哈希字段还原"""
+        histogram = cls()
+        for field, value in fields.items():
+            name = field.decode() if isinstance(field, bytes) else field
+            if name == COUNT_FIELD:
+                histogram.count += int(value)
+            elif name == SUM_FIELD:
+                histogram.total_ms += float(value)
+            else:
+                histogram.counts[int(name)] = histogram.counts.get(int(name), 0) + int(value)
+        return histogram
@@ -0,0 +1,162 @@
+"""访问日志采样
+
+成功请求的访问日志按比例采样（可按路由单独设置），错误响应（状态码>=400）和
+超过慢请求阈值的请求始终记录。采样配置保存在Redis中，管理员修改后
+各进程的后台线程定期拉取，无需重启即可生效。
+
+配置（环境变量，作为Redis中没有配置时的默认值）：
+    ACCESS_LOG_SAMPLE_RATE: 成功请求的采样比例（默认1.0，即全部记录）
+    ACCESS_LOG_SLOW_MS: 慢请求阈值（毫秒，默认1000）
+"""
+import json
+import os
+import random
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SAMPLING_CONFIG_KEY = "logging:sampling"
+
+# 采样原因
+REASON_ERROR = "error"
+REASON_SLOW = "slow"
+REASON_SAMPLED = "sampled"
+
+
+class AccessLogSampler:
+    """访问日志采样器"""
+
+    def __init__(
+        self,
+        redis_client=None,
+        default_rate: float = 1.0,
+        slow_ms: float = 1000.0
+    ):
+        """
+        初始化采样器
+
+        Args:
+            redis_client: Redis客户端（可选，默认使用共享客户端）
+            default_rate: 成功请求的默认采样比例（0~1）
+            slow_ms: 慢请求阈值（毫秒），超过时始终记录
+        """
+        self._redis = redis_client
+        self.default_rate = default_rate
+        self.slow_ms = slow_ms
+        self.route_rates: Dict[str, float] = {}
+        self._refresher: Optional[threading.Thread] = None
+        self._refresher_stop = threading.Event()
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from shared.config.redis import get_redis
+            self._redis = get_redis()
+        return self._redis
+
+    def decide(self, route: str, status_code: int, duration_ms: float) -> Tuple[bool, str, float]:
+        """
+        判断是否记录访问日志
+
+        Returns:
+            (是否记录, 原因, 采样比例)
+        """
+        if status_code >= 400:
+            return True, REASON_ERROR, 1.0
+        if duration_ms >= self.slow_ms:
+            return True, REASON_SLOW, 1.0
+        rate = self.route_rates.get(route, self.default_rate)
+        if rate >= 1.0 or (rate > 0 and random.random() < rate):
+            return True, REASON_SAMPLED, rate
+        return False, REASON_SAMPLED, rate
+
+    def get_config(self) -> Dict[str, Any]:
+        """当前生效的采样配置"""
+        return {
+            "defaultRate": self.default_rate,
+            "slowMs": self.slow_ms,
+            "routes": dict(self.route_rates),
+        }
+
+    def _apply(self, config: Dict[str, Any]):
+        # 先构造完整的新路由表再替换，请求路径上不会读到一半的配置
+        routes = {str(route): float(rate) for route, rate in (config.get("routes") or {}).items()}
+        self.default_rate = float(config.get("defaultRate", self.default_rate))
+        self.slow_ms = float(config.get("slowMs", self.slow_ms))
+        self.route_rates = routes
+
+    def update(
+        self,
+        default_rate: Optional[float] = None,
+        slow_ms: Optional[float] = None,
+        route: Optional[str] = None,
+        route_rate: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        修改采样配置并写入Redis（其他进程在下次刷新时生效）
+
+        Args:
+            default_rate: 默认采样比例
+            slow_ms: 慢请求阈值（毫秒）
+            route: 要单独设置的路由模板
+            route_rate: 该路由的采样比例，为None时删除该路由的单独设置
+        """
+        config = self.get_config()
+        if default_rate is not None:
+            config["defaultRate"] = default_rate
+        if slow_ms is not None:
+            config["slowMs"] = slow_ms
+        if route is not None:
+            if route_rate is None:
+                config["routes"].pop(route, None)
+            else:
+                config["routes"][route] = route_rate
+        self._apply(config)
+        try:
+            self.redis.set(SAMPLING_CONFIG_KEY, json.dumps(config, ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f"Failed to save access log sampling config: {e}")
+        return self.get_config()
+
+    def refresh(self) -> bool:
+        """从Redis拉取采样配置"""
+        try:
+            raw = self.redis.get(SAMPLING_CONFIG_KEY)
+            if raw is None:
+                return False
+            self._apply(json.loads(raw))
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to load access log sampling config: {e}")
+            return False
+
+    def start_refresher(self, interval: float = 10.0):
+        """启动后台线程定期拉取采样配置"""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._refresher_stop.clear()
+
+        def run():
+            self.refresh()
+            while not self._refresher_stop.wait(interval):
+                self.refresh()
+
+        self._refresher = threading.Thread(target=run, name="log-sampling-refresher", daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self, timeout: Optional[float] = None):
+        """停止后台刷新线程"""
+        self._refresher_stop.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout)
+            self._refresher = None
+
+
+# 全局采样器实例
+access_log_sampler = AccessLogSampler(
+    default_rate=float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0")),
+    slow_ms=float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+)
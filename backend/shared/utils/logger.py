@@ -1,16 +1,104 @@
+"""日志工具
+
+所有日志记录器共用一个进程内队列：业务代码（包括事件循环中的请求处理）只把日志记录放入队列，
+格式化和写入由后台线程（QueueListener）完成，不阻塞调用方。
+每条日志记录在创建时自动带上当前请求上下文（request_id、user_id、route）。
+
+配置（环境变量）：
+    LOG_FORMAT: text | json（默认text）
+    LOG_FILE: 日志文件名（默认不写文件），写入 LOG_DIR 目录（默认logs）
+    LOG_MAX_BYTES: 单个日志文件的最大字节数，超过后轮转（默认100MB，0表示不按大小轮转）
+    LOG_ROTATE_INTERVAL: 按时间轮转的间隔（秒，默认86400，0表示不按时间轮转）
+    LOG_BACKUP_COUNT: 保留的历史文件数量（默认14）
+    LOG_COMPRESS: 是否gzip压缩轮转后的文件（默认true）
+    LOG_QUEUE_SIZE: 队列容量（默认10000）
+    LOG_QUEUE_OVERFLOW: 队列满时的策略（默认keep_errors）
+        drop: 丢弃新的日志记录
+        block: 等待最多 LOG_QUEUE_BLOCK_TIMEOUT 秒，仍然满时丢弃
+        keep_errors: WARNING以下直接丢弃，WARNING及以上按block处理
+    LOG_QUEUE_BLOCK_TIMEOUT: 队列满时最长等待时间（秒，默认0.1）
+"""
+import atexit
+import copy
+import glob
+import gzip
+import json
 import logging
-import sys
+import logging.handlers
 import os
-import json
+import queue
+import shutil
+import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - 依赖缺失时退回标准库json
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+from shared.utils.request_context import get_request_context
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s [%(module)s:%(funcName)s:%(lineno)d]%(request_tag)s'
+TEXT_DATEFMT = '%Y-%m-%d %H:%M:%S'
+
+CONTEXT_FIELDS = ("request_id", "user_id", "route")
+
+OVERFLOW_POLICIES = ("drop", "block", "keep_errors")
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+_base_record_factory = logging.getLogRecordFactory()
+
+
+def _context_record_factory(*args, **kwargs) -> logging.LogRecord:
+    """创建日志记录时写入当前请求上下文（在调用方线程中执行）"""
+    record = _base_record_factory(*args, **kwargs)
+    context = get_request_context()
+    if context is None:
+        record.request_id = record.user_id = record.route = None
+        record.request_tag = ""
+    else:
+        record.request_id = context.request_id
+        record.user_id = context.user_id
+        record.route = context.route
+        record.request_tag = f" [request_id={context.request_id}" + (
+            f" user_id={context.user_id}]" if context.user_id else "]"
+        )
+    return record
+
+
+logging.setLogRecordFactory(_context_record_factory)
+
+
+def json_dumps(data: Any) -> str:
+    """序列化日志数据（优先使用orjson，无法序列化的值转为字符串）"""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # 超出orjson支持范围（如超过64位的整数）时退回标准库
+            pass
+    # 与orjson输出一致（紧凑分隔符），日志采集端不受是否安装orjson影响
+    return json.dumps(data, ensure_ascii=False, default=str, separators=(",", ":"))
+
 
 class JSONFormatter(logging.Formatter):
     """JSON格式的日志格式化器"""
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat(),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -18,78 +106,342 @@ class JSONFormatter(logging.Formatter):
             "function": record.funcName,
             "line": record.lineno,
         }
-        
-        # 添加异常信息
+
+        # 添加请求上下文
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                log_data[field] = value
+
+        # 添加异常信息（经过队列的记录中异常已提前格式化为exc_text）
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
-        
+        elif record.exc_text:
+            log_data["exception"] = record.exc_text
+
         # 添加额外字段
         if hasattr(record, "extra_data"):
             log_data["extra"] = record.extra_data
-        
-        return json.dumps(log_data, ensure_ascii=False)
+
+        return json_dumps(log_data)
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式的日志格式化器（行尾附带请求ID）"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT, datefmt=TEXT_DATEFMT, defaults={"request_tag": ""})
+
+
+class RotatingCompressedFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    按大小和时间轮转的文件处理器
+
+    轮转后的文件命名为 <文件名>.<时间戳>[.序号].gz，超过保留数量的旧文件被删除。
+    只在日志后台线程中使用，压缩不会阻塞业务代码。
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 100 * 1024 * 1024,
+        interval: int = 86400,
+        backup_count: int = 14,
+        compress: bool = True,
+        encoding: str = "utf-8"
+    ):
+        """
+        Args:
+            filename: 日志文件路径
+            max_bytes: 单个文件的最大字节数（0表示不按大小轮转）
+            interval: 按时间轮转的间隔（秒，0表示不按时间轮转），按UTC整点对齐
+            backup_count: 保留的历史文件数量（0表示全部保留）
+            compress: 是否gzip压缩历史文件
+            encoding: 文件编码
+        """
+        super().__init__(filename, "a", encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self.rollover_at = self._next_rollover(time.time())
+
+    def _next_rollover(self, now: float) -> Optional[float]:
+        if not self.interval:
+            return None
+        return now - now % self.interval + self.interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            # 只在文件已有内容时按大小轮转，避免单条超大记录反复轮转
+            position = self.stream.tell()
+            if position and position + len(self.format(record)) + 1 >= self.max_bytes:
+                return True
+        return False
+
+    def doRollover(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+            destination = f"{self.baseFilename}.{stamp}"
+            index = 1
+            while any(os.path.exists(path) for path in (destination, destination + ".gz")):
+                destination = f"{self.baseFilename}.{stamp}.{index}"
+                index += 1
+            os.rename(self.baseFilename, destination)
+            if self.compress:
+                self._compress(destination)
+            self._remove_old_files()
+
+        self.rollover_at = self._next_rollover(time.time())
+        self.stream = self._open()
+
+    def _compress(self, path: str):
+        try:
+            with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+        except OSError as e:
+            sys.stderr.write(f"Failed to compress rotated log {path}: {e}\n")
+
+    def _remove_old_files(self):
+        if self.backup_count <= 0:
+            return
+        rotated = sorted(glob.glob(glob.escape(self.baseFilename) + ".*"), key=os.path.getmtime)
+        for path in rotated[:-self.backup_count]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    把日志记录放入共享队列的处理器
+
+    放入队列前只计算消息文本和异常文本（参数可能在之后被修改），
+    其余格式化由后台线程完成。记录带上目标输出的键，由后台线程分发到对应输出。
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        sinks_key: Tuple,
+        overflow: str = "keep_errors",
+        block_timeout: float = 0.1
+    ):
+        super().__init__(log_queue)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的队列溢出策略: {overflow}")
+        self.sinks_key = sinks_key
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        record = copy.copy(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            # 不在队列中持有异常和栈帧的引用
+            record.exc_info = None
+        record.log_sinks = self.sinks_key
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        _pipeline.ensure_started()
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == "block" or (self.overflow == "keep_errors" and record.levelno >= logging.WARNING):
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+        _pipeline.record_drop(record)
+
+
+class _SinkRouter(logging.Handler):
+    """后台线程中把记录分发到对应的输出处理器"""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        for handler in _pipeline.get_sinks(getattr(record, "log_sinks", None)):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord):  # pragma: no cover - handle已分发
+        pass
+
+
+class _LogPipeline:
+    """进程内的日志队列、后台线程和输出处理器"""
+
+    def __init__(self):
+        self.queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+        self.overflow = os.getenv("LOG_QUEUE_OVERFLOW", "keep_errors")
+        self.block_timeout = float(os.getenv("LOG_QUEUE_BLOCK_TIMEOUT", "0.1"))
+        self.queue: queue.Queue = queue.Queue(self.queue_size)
+        self._lock = threading.Lock()
+        self._sinks: Dict[Tuple, Tuple[logging.Handler, ...]] = {}
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._pid: Optional[int] = None
+        self._dropped: Dict[str, int] = {}
+        self._dropped_reported = 0
+
+    def get_sinks(self, key: Optional[Tuple]) -> Tuple[logging.Handler, ...]:
+        return self._sinks.get(key, ()) if key is not None else ()
+
+    def sinks_for(self, use_json: bool, file_path: Optional[str]) -> Tuple:
+        """获取（必要时创建）某种输出组合的键；相同组合的记录器共用输出处理器"""
+        key = (use_json, file_path)
+        with self._lock:
+            if key in self._sinks:
+                return key
+            formatter = JSONFormatter() if use_json else TextFormatter()
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(formatter)
+            handlers = [console_handler]
+            if file_path:
+                Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+                file_handler = RotatingCompressedFileHandler(
+                    file_path,
+                    max_bytes=int(os.getenv("LOG_MAX_BYTES", str(100 * 1024 * 1024))),
+                    interval=int(os.getenv("LOG_ROTATE_INTERVAL", "86400")),
+                    backup_count=int(os.getenv("LOG_BACKUP_COUNT", "14")),
+                    compress=_env_bool("LOG_COMPRESS", True)
+                )
+                file_handler.setFormatter(formatter)
+                handlers.append(file_handler)
+            self._sinks[key] = tuple(handlers)
+        return key
+
+    def ensure_started(self):
+        """启动后台线程（fork出的子进程中重新启动）"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._listener is not None:
+                # 从父进程继承的队列可能处于不一致状态，子进程使用新队列
+                self.queue = queue.Queue(self.queue_size)
+                for handler in _queue_handlers:
+                    handler.queue = self.queue
+            self._listener = logging.handlers.QueueListener(self.queue, _SinkRouter())
+            self._listener.start()
+            self._listener._thread.name = "log-listener"
+            self._pid = pid
+
+    def stop(self):
+        """写完队列中的剩余记录并停止后台线程"""
+        with self._lock:
+            listener = self._listener
+            if listener is None or self._pid != os.getpid():
+                return
+            self._listener = None
+            self._pid = None
+        listener.stop()
+        for handlers in self._sinks.values():
+            for handler in handlers:
+                try:
+                    handler.flush()
+                except (OSError, ValueError):
+                    # 退出时标准输出可能已被关闭
+                    pass
+
+    def record_drop(self, record: logging.LogRecord):
+        with self._lock:
+            self._dropped[record.levelname] = self._dropped.get(record.levelname, 0) + 1
+            total = sum(self._dropped.values())
+            # 丢弃数量按2的幂增长时直接写stderr提示，避免刷屏
+            should_report = total & (total - 1) == 0 and total > self._dropped_reported
+            if should_report:
+                self._dropped_reported = total
+        if should_report:
+            sys.stderr.write(f"Log queue full ({self.queue_size}), {total} log records dropped\n")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            dropped = dict(self._dropped)
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue_size,
+            "overflow": self.overflow,
+            "dropped": dropped,
+        }
+
+
+_exception_formatter = logging.Formatter()
+_pipeline = _LogPipeline()
+_queue_handlers = []
+atexit.register(_pipeline.stop)
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    """日志队列长度和按级别统计的丢弃数量"""
+    return _pipeline.get_stats()
+
+
+def shutdown_logging():
+    """写完队列中的日志并停止后台线程"""
+    _pipeline.stop()
+
 
 def setup_logger(
-    name: str, 
+    name: str,
     level: int = logging.INFO,
     log_file: Optional[str] = None,
-    use_json: bool = False,
-    log_dir: str = "logs"
+    use_json: Optional[bool] = None,
+    log_dir: Optional[str] = None
 ) -> logging.Logger:
     """
     设置日志记录器
-    
+
     Args:
         name: 日志记录器名称
         level: 日志级别
-        log_file: 日志文件路径（可选）
-        use_json: 是否使用JSON格式
-        log_dir: 日志目录（默认logs）
+        log_file: 日志文件名（可选，默认使用环境变量LOG_FILE）
+        use_json: 是否使用JSON格式（默认根据环境变量LOG_FORMAT）
+        log_dir: 日志目录（默认使用环境变量LOG_DIR，未设置时为logs）
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # 避免重复添加handler
     if logger.handlers:
         return logger
-    
-    # 控制台输出
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    
-    if use_json:
-        console_formatter = JSONFormatter()
-    else:
-        console_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s [%(module)s:%(funcName)s:%(lineno)d]',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-    
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-    
-    # 文件输出（如果指定）
-    if log_file:
-        # 确保日志目录存在
-        log_path = Path(log_dir)
-        log_path.mkdir(parents=True, exist_ok=True)
-        
-        file_path = log_path / log_file
-        
-        file_handler = logging.FileHandler(file_path, encoding='utf-8')
-        file_handler.setLevel(level)
-        
-        if use_json:
-            file_formatter = JSONFormatter()
-        else:
-            file_formatter = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s [%(module)s:%(funcName)s:%(lineno)d]',
-                datefmt='%Y-%m-%d %H:%M:%S'
-            )
-        
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
-    
+
+    if use_json is None:
+        use_json = os.getenv("LOG_FORMAT", "text").lower() == "json"
+    log_file = log_file or os.getenv("LOG_FILE") or None
+    file_path = str(Path(log_dir or os.getenv("LOG_DIR", "logs")) / log_file) if log_file else None
+
+    handler = NonBlockingQueueHandler(
+        _pipeline.queue,
+        _pipeline.sinks_for(use_json, file_path),
+        overflow=_pipeline.overflow,
+        block_timeout=_pipeline.block_timeout
+    )
+    handler.setLevel(level)
+    _queue_handlers.append(handler)
+    logger.addHandler(handler)
+
     return logger
 
 def get_log_level(level_name: str) -> int:
@@ -0,0 +1,204 @@
+"""事件循环延迟与阻塞调用检测
+
+`async def` 端点中的同步SQLAlchemy/Redis调用会阻塞事件循环，负载升高时所有请求一起变慢。
+
+- 心跳协程每隔 interval 睡眠一次，实际醒来时间与预期的差值即调度延迟，
+  导出为 `event_loop_lag_seconds` 直方图；超过阈值计入 `event_loop_stalls_total`
+- 看门狗线程检查心跳是否按时更新，事件循环阻塞超过阈值时抓取事件循环线程的调用栈
+  （即正在执行的协程中阻塞的那一行），按调用位置限流记录到日志
+
+配置（环境变量）：
+    LOOP_LAG_INTERVAL: 心跳间隔（秒，默认0.1）
+    LOOP_STALL_THRESHOLD: 阻塞阈值（秒，默认0.25）
+    LOOP_STALL_LOG_INTERVAL: 同一调用位置两次记录日志的最小间隔（秒，默认60）
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional, Tuple
+
+from shared.utils.logger import setup_logger
+from shared.utils.metrics_registry import metrics_registry
+
+logger = setup_logger(__name__)
+
+# 日志中保留的最大栈深度（最内层的帧）
+MAX_STACK_FRAMES = 30
+
+_LIBRARY_PATHS = (os.path.dirname(os.__file__), "site-packages")
+
+loop_lag_seconds = metrics_registry.histogram(
+    "event_loop_lag_seconds", "事件循环调度延迟（秒）",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+loop_stalls_total = metrics_registry.counter(
+    "event_loop_stalls_total", "事件循环阻塞超过阈值的次数"
+)
+
+
+def _blocking_site(stack: traceback.StackSummary) -> Tuple[str, int]:
+    """阻塞位置：最内层的项目代码帧（阻塞在Redis/SQLAlchemy内部时定位到调用方）"""
+    for entry in reversed(stack):
+        if not any(path in entry.filename for path in _LIBRARY_PATHS):
+            return entry.filename, entry.lineno
+    return stack[-1].filename, stack[-1].lineno
+
+
+class EventLoopMonitor:
+    """事件循环延迟监控"""
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        stall_threshold: float = 0.25,
+        log_interval: float = 60.0,
+        max_tracked_sites: int = 1000
+    ):
+        """
+        初始化监控器
+
+        Args:
+            interval: 心跳间隔（秒）
+            stall_threshold: 阻塞阈值（秒）
+            log_interval: 同一调用位置两次记录日志的最小间隔（秒）
+            max_tracked_sites: 限流时最多记录的调用位置数量
+        """
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.log_interval = log_interval
+        self.max_tracked_sites = max_tracked_sites
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        self._last_beat = time.perf_counter()
+        self._captured_beat: Optional[float] = None
+        self._last_logged: Dict[Tuple[str, int], float] = {}
+        self._suppressed: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"stalls": 0, "captured": 0, "logged": 0, "max_lag": 0.0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动监控（需在事件循环中调用，如startup事件）"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop_event.clear()
+        self._task = self._loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watchdog, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止监控"""
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._last_beat = time.perf_counter()
+            expected = self._last_beat + self.interval
+            await asyncio.sleep(self.interval)
+            self.observe_lag(max(time.perf_counter() - expected, 0.0))
+
+    def observe_lag(self, lag: float):
+        """记录一次调度延迟"""
+        loop_lag_seconds.observe(lag)
+        with self._lock:
+            if lag > self._stats["max_lag"]:
+                self._stats["max_lag"] = lag
+            if lag >= self.stall_threshold:
+                self._stats["stalls"] += 1
+                stalled = True
+            else:
+                stalled = False
+        if stalled:
+            loop_stalls_total.inc()
+
+    def _watchdog(self):
+        check_interval = min(self.interval, self.stall_threshold / 2)
+        while not self._stop_event.wait(check_interval):
+            beat = self._last_beat
+            blocked = time.perf_counter() - beat - self.interval
+            # 每次阻塞只抓取一次调用栈
+            if blocked >= self.stall_threshold and self._captured_beat != beat:
+                self._captured_beat = beat
+                self.capture_stall(blocked)
+
+    def capture_stall(self, blocked: float) -> Optional[Dict[str, Any]]:
+        """抓取事件循环线程当前的调用栈，按调用位置限流记录日志"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        try:
+            stack = traceback.extract_stack(frame)[-MAX_STACK_FRAMES:]
+        finally:
+            frame = None  # 不持有事件循环线程的帧引用
+        if not stack:
+            return None
+
+        task = self._current_task_name()
+        site = _blocking_site(stack)
+        now = time.monotonic()
+        with self._lock:
+            self._stats["captured"] += 1
+            last = self._last_logged.get(site)
+            if last is not None and now - last < self.log_interval:
+                self._suppressed[site] = self._suppressed.get(site, 0) + 1
+                return None
+            if last is None and len(self._last_logged) >= self.max_tracked_sites:
+                self._last_logged.clear()
+                self._suppressed.clear()
+            self._last_logged[site] = now
+            suppressed = self._suppressed.pop(site, 0)
+            self._stats["logged"] += 1
+
+        formatted = "".join(traceback.format_list(stack))
+        note = f" ({suppressed} similar stalls suppressed)" if suppressed else ""
+        logger.warning(
+            f"Event loop blocked for {blocked:.3f}s in task {task}{note}, "
+            f"at {site[0]}:{site[1]}\n{formatted}"
+        )
+        return {"task": task, "blocked": blocked, "site": site, "stack": formatted}
+
+    def _current_task_name(self) -> str:
+        # 只读访问asyncio记录的当前任务，不在其他线程中调用事件循环的方法
+        current_tasks = getattr(asyncio.tasks, "_current_tasks", {})
+        task = current_tasks.get(self._loop) if self._loop is not None else None
+        if task is None:
+            return "<no task>"
+        coro = task.get_coro()
+        name = getattr(coro, "__qualname__", None) or repr(coro)
+        return f"{task.get_name()} ({name})"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """阻塞次数、抓取/记录的调用栈数量和最大延迟"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_lag"] = round(stats["max_lag"], 6)
+        return stats
+
+
+# 全局监控器实例
+loop_monitor = EventLoopMonitor(
+    interval=float(os.getenv("LOOP_LAG_INTERVAL", "0.1")),
+    stall_threshold=float(os.getenv("LOOP_STALL_THRESHOLD", "0.25")),
+    log_interval=float(os.getenv("LOOP_STALL_LOG_INTERVAL", "60"))
+)
@@ -0,0 +1,202 @@
+"""内存分析
+
+- 按需启动 tracemalloc，拍摄快照并比较两次快照之间按分配位置的内存增长
+- 进程内常驻数据结构（限流器记录、WebSocket连接表、缓存统计等）通过
+  register_structure 注册统计函数，与快照一起返回对象数量，便于定位缓慢增长的来源
+"""
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from shared.utils.exceptions import ConflictError, NotFoundError, ValidationError
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# 快照中排除分析工具自身的分配
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryProfiler:
+    """tracemalloc快照管理"""
+
+    def __init__(self, max_snapshots: int = 5, frames: int = 10):
+        """
+        Args:
+            max_snapshots: 最多保留的快照数量（超出时丢弃最早的）
+            frames: 默认记录的调用栈深度
+        """
+        self.max_snapshots = max_snapshots
+        self.frames = frames
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 1
+        self._structures: Dict[str, Callable[[], Dict[str, int]]] = {}
+
+    def register_structure(self, name: str, func: Callable[[], Dict[str, int]]):
+        """注册进程内数据结构的统计函数（返回 名称 -> 数量）"""
+        with self._lock:
+            self._structures[name] = func
+
+    def structure_summary(self) -> Dict[str, Any]:
+        """调用所有已注册的统计函数"""
+        with self._lock:
+            structures = dict(self._structures)
+        summary: Dict[str, Any] = {}
+        for name, func in structures.items():
+            try:
+                summary[name] = func()
+            except Exception as e:
+                summary[name] = {"error": str(e)}
+        return summary
+
+    def status(self) -> Dict[str, Any]:
+        """tracemalloc状态和已保留的快照"""
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [
+                {key: value for key, value in snapshot.items() if key != "snapshot"}
+                for snapshot in self._snapshots.values()
+            ]
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else None,
+            "tracedBytes": current,
+            "peakBytes": peak,
+            "overheadBytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            "snapshots": snapshots,
+        }
+
+    def start(self, frames: Optional[int] = None) -> Dict[str, Any]:
+        """启动tracemalloc（已启动时不变）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or self.frames)
+            logger.info(f"tracemalloc started with {tracemalloc.get_traceback_limit()} frames")
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        """停止tracemalloc并丢弃已保留的快照"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+        with self._lock:
+            self._snapshots.clear()
+        return self.status()
+
+    def take_snapshot(self, label: Optional[str] = None) -> Dict[str, Any]:
+        """拍摄快照，同时记录数据结构的对象数量"""
+        if not tracemalloc.is_tracing():
+            raise ConflictError("tracemalloc未启动", resource="tracemalloc")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        structures = self.structure_summary()
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            entry = {
+                "id": snapshot_id,
+                "label": label,
+                "takenAt": time.time(),
+                "tracedBytes": current,
+                "peakBytes": peak,
+                "structures": structures,
+                "snapshot": snapshot,
+            }
+            self._snapshots[snapshot_id] = entry
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return {key: value for key, value in entry.items() if key != "snapshot"}
+
+    def _get(self, snapshot_id: int) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        if entry is None:
+            raise NotFoundError("内存快照", resource_id=str(snapshot_id))
+        return entry
+
+    def diff(
+        self,
+        base_id: Optional[int] = None,
+        target_id: Optional[int] = None,
+        group_by: str = "lineno",
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        比较两个快照，按分配位置返回内存增长最多的条目
+
+        Args:
+            base_id: 基准快照（默认倒数第二个）
+            target_id: 目标快照（默认最新一个）
+            group_by: 分组方式（lineno、filename、traceback）
+            limit: 返回的条目数
+        """
+        if group_by not in GROUP_BY:
+            raise ValidationError(f"不支持的分组方式: {group_by}", field="groupBy")
+        with self._lock:
+            ids = list(self._snapshots)
+        if target_id is None:
+            if not ids:
+                raise ConflictError("至少需要两个快照才能比较", resource="tracemalloc")
+            target_id = ids[-1]
+        target = self._get(target_id)
+        if base_id is None:
+            # 默认与目标快照的前一个快照比较
+            earlier = [snapshot_id for snapshot_id in ids if snapshot_id < target_id]
+            if not earlier:
+                raise ConflictError("至少需要两个快照才能比较", resource="tracemalloc")
+            base_id = earlier[-1]
+        base = self._get(base_id)
+
+        stats = target["snapshot"].compare_to(base["snapshot"], group_by)
+        top: List[Dict[str, Any]] = []
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            item = {
+                "site": f"{frame.filename}:{frame.lineno}",
+                "sizeDiff": stat.size_diff,
+                "size": stat.size,
+                "countDiff": stat.count_diff,
+                "count": stat.count,
+            }
+            if group_by == "traceback":
+                item["traceback"] = [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+            top.append(item)
+
+        return {
+            "base": base_id,
+            "target": target_id,
+            "groupBy": group_by,
+            "elapsedSeconds": round(target["takenAt"] - base["takenAt"], 3),
+            "tracedBytesDiff": target["tracedBytes"] - base["tracedBytes"],
+            "totalSizeDiff": sum(stat.size_diff for stat in stats),
+            "top": top,
+            "structures": _diff_structures(base["structures"], target["structures"]),
+        }
+
+
+def _diff_structures(base: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+    """数据结构对象数量：目标值和相对基准的变化"""
+    result: Dict[str, Any] = {}
+    for name, counts in target.items():
+        previous = base.get(name) or {}
+        result[name] = {
+            key: {"count": value, "diff": value - previous.get(key, 0)}
+            if isinstance(value, (int, float)) and isinstance(previous.get(key, 0), (int, float))
+            else {"count": value}
+            for key, value in counts.items()
+        }
+    return result
+
+
+# 全局内存分析器实例
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,586 @@
+"""进程内指标注册表（Prometheus文本格式）
+
+计数器、仪表盘和直方图在进程内累加，/metrics 端点以Prometheus文本格式输出。
+多worker部署时每个进程定期把快照写入Redis哈希（字段为worker标识），
+抓取时合并同一服务所有存活worker的快照：计数器和直方图相加，
+仪表盘按注册时指定的方式（sum/max/all）合并。
+
+worker退出（快照过期或正常停止）时，其计数器和直方图的最终值累加到
+退役哈希（metrics:prom:{service}:retired）中继续计入汇总，
+避免汇总后的计数器下降被Prometheus误判为重置；仪表盘随worker一起移除。
+"""
+import functools
+import inspect
+import json
+import math
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认直方图桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 仪表盘在多worker间的合并方式
+GAUGE_MODES = ("sum", "max", "all")
+
+LabelKey = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+class _Metric:
+    """指标基类"""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_key(self, labels: Dict[str, Any]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels_dict(self, key: LabelKey) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Tuple[Dict[str, str], Any]]:
+        raise NotImplementedError
+
+    def family(self) -> Dict[str, Any]:
+        """导出为可序列化的指标族"""
+        return {
+            "name": self.name,
+            "type": self.type,
+            "help": self.documentation,
+            "samples": self.samples(),
+        }
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("计数器只能递增")
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self._labels_dict(key), value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """可增可减的仪表盘，也可以在采集时通过回调函数取值"""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        multiprocess_mode: str = "sum"
+    ):
+        super().__init__(name, documentation, labelnames)
+        if multiprocess_mode not in GAUGE_MODES:
+            raise ValueError(f"未知的合并方式: {multiprocess_mode}")
+        self.multiprocess_mode = multiprocess_mode
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, func: Callable[[], float], **labels):
+        """采集时调用 func 获取当前值"""
+        key = self._label_key(labels)
+        with self._lock:
+            self._functions[key] = func
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """进入时加一，退出时减一"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, func in functions.items():
+            try:
+                values[key] = float(func())
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+        return [(self._labels_dict(key), value) for key, value in values.items()]
+
+    def family(self):
+        family = super().family()
+        family["mode"] = self.multiprocess_mode
+        return family
+
+
+class Histogram(_Metric):
+    """固定分桶直方图"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # 每个标签组合：[各桶计数（非累计，最后一个为+Inf）, 总和]
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._label_key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            return [
+                (self._labels_dict(key), {"counts": list(counts), "sum": total[0]})
+                for key, (counts, total) in self._values.items()
+            ]
+
+    def family(self):
+        family = super().family()
+        family["buckets"] = list(self.buckets)
+        return family
+
+
+def _merge_families(snapshots: List[Tuple[str, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """合并多个worker的指标族快照"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for worker, families in snapshots:
+        for family in families:
+            target = merged.get(family["name"])
+            if target is None:
+                target = {key: value for key, value in family.items() if key != "samples"}
+                target["_samples"] = {}
+                merged[family["name"]] = target
+            mode = family.get("mode", "sum")
+            samples = target["_samples"]
+            for labels, value in family["samples"]:
+                if family["type"] == "gauge" and mode == "all":
+                    labels = {**labels, "worker": worker}
+                key = tuple(sorted(labels.items()))
+                if key not in samples:
+                    samples[key] = (labels, value if not isinstance(value, dict) else {
+                        "counts": list(value["counts"]), "sum": value["sum"]
+                    })
+                    continue
+                current = samples[key][1]
+                if family["type"] == "histogram":
+                    if len(current["counts"]) == len(value["counts"]):
+                        current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                        current["sum"] += value["sum"]
+                elif family["type"] == "gauge" and mode == "max":
+                    samples[key] = (labels, max(current, value))
+                else:
+                    samples[key] = (labels, current + value)
+
+    result = []
+    for family in merged.values():
+        family["samples"] = list(family.pop("_samples").values())
+        result.append(family)
+    return result
+
+
+def _retired_field(kind: str, name: str, labels: Dict[str, str], index: Optional[int] = None) -> str:
+    """退役哈希的字段名：[类型, 指标名, 标签(, 桶序号)]"""
+    parts: List[Any] = [kind, name, sorted(labels.items())]
+    if index is not None:
+        parts.append(index)
+    return json.dumps(parts, ensure_ascii=False)
+
+
+def render_families(families: List[Dict[str, Any]]) -> str:
+    """按Prometheus文本格式输出指标族"""
+    lines: List[str] = []
+    for family in sorted(families, key=lambda f: f["name"]):
+        name = family["name"]
+        lines.append(f"# HELP {name} {_escape(family['help'])}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels, value in family["samples"]:
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            bounds = list(family["buckets"]) + [math.inf]
+            for bound, count in zip(bounds, value["counts"]):
+                cumulative += count
+                bucket_labels = {**labels, "le": _format_value(bound)}
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(
+        self,
+        redis_client=None,
+        service: Optional[str] = None,
+        stale_after: float = 60.0
+    ):
+        """
+        初始化指标注册表
+
+        Args:
+            redis_client: Redis客户端（可选，默认在首次导出时使用共享客户端）
+            service: 服务名，同一服务的worker快照写入同一个Redis哈希
+            stale_after: worker快照超过该时间（秒）未更新视为已退出
+        """
+        self._redis = redis_client
+        self.service = service or os.getenv("SERVICE_NAME", "default")
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stale_after = stale_after
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._exporter: Optional[threading.Thread] = None
+        self._exporter_stop = threading.Event()
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            # 延迟导入：Redis客户端本身也会向注册表上报命令耗时
+            from shared.config.redis import get_redis
+            self._redis = get_redis()
+        return self._redis
+
+    def configure(self, service: str):
+        """设置服务名（在服务入口调用）"""
+        self.service = service
+
+    @property
+    def cluster_key(self) -> str:
+        return f"metrics:prom:{self.service}"
+
+    @property
+    def retired_key(self) -> str:
+        return f"metrics:prom:{self.service}:retired"
+
+    def _register(self, cls, name: str, *args, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is not None:
+                if not isinstance(metric, cls):
+                    raise ValueError(f"指标 {name} 已注册为 {metric.type}")
+                return metric
+            metric = cls(name, *args, **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """获取或注册计数器"""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        multiprocess_mode: str = "sum"
+    ) -> Gauge:
+        """获取或注册仪表盘"""
+        return self._register(Gauge, name, documentation, labelnames, multiprocess_mode)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """获取或注册直方图"""
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """当前进程的指标族快照"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.family() for metric in metrics]
+
+    def render(self) -> str:
+        """当前进程的指标（Prometheus文本格式）"""
+        return render_families(self.collect())
+
+    def export(self):
+        """把当前进程的快照写入Redis，供其他worker合并"""
+        payload = json.dumps({"ts": time.time(), "metrics": self.collect()})
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(self.cluster_key, self.worker_id, payload)
+            pipe.expire(self.cluster_key, int(self.stale_after * 10))
+            pipe.expire(self.retired_key, int(self.stale_after * 10))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to export metrics snapshot: {e}")
+
+    def collect_cluster(self) -> List[Dict[str, Any]]:
+        """合并同一服务所有存活worker的快照（本进程使用实时数据）"""
+        snapshots = [(self.worker_id, self.collect())]
+        raw = self.redis.hgetall(self.cluster_key)
+        now = time.time()
+        stale = []
+        for worker, payload in raw.items():
+            worker = worker.decode() if isinstance(worker, bytes) else worker
+            if worker == self.worker_id:
+                continue
+            try:
+                snapshot = json.loads(payload)
+            except (TypeError, ValueError):
+                stale.append(worker)
+                continue
+            if now - snapshot.get("ts", 0) > self.stale_after:
+                # 只有成功删除快照的进程负责累加，并发抓取时不会重复计入
+                if self.redis.hdel(self.cluster_key, worker):
+                    self._retire(snapshot.get("metrics", []))
+                continue
+            snapshots.append((worker, snapshot.get("metrics", [])))
+        if stale:
+            self.redis.hdel(self.cluster_key, *stale)
+        retired = self._load_retired()
+        if retired:
+            snapshots.append(("retired", retired))
+        return _merge_families(snapshots)
+
+    def _retire(self, families: List[Dict[str, Any]]):
+        """把已退出worker的计数器和直方图累加到退役哈希（HINCRBYFLOAT，多进程并发安全）"""
+        pipe = self.redis.pipeline(transaction=False)
+        for family in families:
+            name = family["name"]
+            if family["type"] == "counter":
+                for labels, value in family["samples"]:
+                    pipe.hincrbyfloat(self.retired_key, _retired_field("v", name, labels), value)
+            elif family["type"] == "histogram":
+                for labels, value in family["samples"]:
+                    for index, count in enumerate(value["counts"]):
+                        if count:
+                            pipe.hincrbyfloat(self.retired_key, _retired_field("b", name, labels, index), count)
+                    pipe.hincrbyfloat(self.retired_key, _retired_field("s", name, labels), value["sum"])
+            else:
+                continue
+            meta = {key: family[key] for key in ("name", "type", "help", "buckets") if key in family}
+            pipe.hset(self.retired_key, json.dumps(["m", name]), json.dumps(meta))
+        pipe.expire(self.retired_key, int(self.stale_after * 10))
+        pipe.execute()
+
+    def _load_retired(self) -> List[Dict[str, Any]]:
+        """读取退役哈希，还原为指标族"""
+        raw = self.redis.hgetall(self.retired_key)
+        if not raw:
+            return []
+        metas: Dict[str, Dict[str, Any]] = {}
+        entries = []
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            value = value.decode() if isinstance(value, bytes) else value
+            try:
+                parts = json.loads(field)
+                if parts[0] == "m":
+                    metas[parts[1]] = json.loads(value)
+                else:
+                    entries.append((parts, float(value)))
+            except (TypeError, ValueError, IndexError):
+                continue
+
+        families: Dict[str, Dict[str, Any]] = {}
+        for parts, value in entries:
+            kind, name, labels = parts[0], parts[1], dict(parts[2])
+            meta = metas.get(name)
+            if meta is None:
+                continue
+            family = families.get(name)
+            if family is None:
+                family = {**meta, "_samples": {}}
+                families[name] = family
+            key = tuple(sorted(labels.items()))
+            if meta["type"] == "counter":
+                family["_samples"][key] = (labels, value)
+                continue
+            sample = family["_samples"].get(key)
+            if sample is None:
+                sample = (labels, {"counts": [0] * (len(meta["buckets"]) + 1), "sum": 0.0})
+                family["_samples"][key] = sample
+            if kind == "b":
+                sample[1]["counts"][parts[3]] = int(round(value))
+            else:
+                sample[1]["sum"] = value
+
+        result = []
+        for family in families.values():
+            family["samples"] = list(family.pop("_samples").values())
+            result.append(family)
+        return result
+
+    def render_cluster(self) -> str:
+        """所有worker汇总后的指标，Redis不可用时只返回本进程数据"""
+        try:
+            return render_families(self.collect_cluster())
+        except Exception as e:
+            logger.warning(f"Failed to aggregate worker metrics, serving local only: {e}")
+            return self.render()
+
+    def start_exporter(self, interval: float = 15.0):
+        """启动后台线程定期导出快照"""
+        if self._exporter is not None and self._exporter.is_alive():
+            return
+        self._exporter_stop.clear()
+
+        def run():
+            self.export()
+            while not self._exporter_stop.wait(interval):
+                self.export()
+
+        self._exporter = threading.Thread(target=run, name="metrics-registry-exporter", daemon=True)
+        self._exporter.start()
+
+    def stop_exporter(self, timeout: Optional[float] = None):
+        """停止后台导出线程并移除本进程的快照"""
+        self._exporter_stop.set()
+        if self._exporter is not None:
+            self._exporter.join(timeout)
+            self._exporter = None
+        try:
+            # 计数器的最终值转入退役哈希，汇总值不会因本进程退出而下降
+            if self.redis.hdel(self.cluster_key, self.worker_id):
+                self._retire(self.collect())
+        except Exception as e:
+            logger.warning(f"Failed to remove metrics snapshot: {e}")
+
+
+# 全局指标注册表实例
+metrics_registry = MetricsRegistry()
+
+# 后台任务指标
+background_tasks_in_progress = metrics_registry.gauge(
+    "background_tasks_in_progress", "正在执行的后台任务数", ("task",)
+)
+background_tasks_total = metrics_registry.counter(
+    "background_tasks_total", "已结束的后台任务数", ("task", "status")
+)
+background_task_duration = metrics_registry.histogram(
+    "background_task_duration_seconds", "后台任务耗时（秒）", ("task",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+
+
+def track_background_task(task: str):
+    """
+    后台任务装饰器：统计进行中数量、结束状态和耗时
+
+    同时支持同步和异步函数。
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                status = "error"
+                with background_tasks_in_progress.track_inprogress(task=task):
+                    try:
+                        result = await func(*args, **kwargs)
+                        status = "success"
+                        return result
+                    finally:
+                        background_tasks_total.inc(task=task, status=status)
+                        background_task_duration.observe(time.perf_counter() - start, task=task)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = "error"
+            with background_tasks_in_progress.track_inprogress(task=task):
+                try:
+                    result = func(*args, **kwargs)
+                    status = "success"
+                    return result
+                finally:
+                    background_tasks_total.inc(task=task, status=status)
+                    background_task_duration.observe(time.perf_counter() - start, task=task)
+        return sync_wrapper
+    return decorator
@@ -1,19 +1,239 @@
 """监控和告警工具"""
+import os
+import threading
 import time
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Optional, List, Tuple
+from datetime import datetime
 from collections import defaultdict
 from shared.config.redis import get_redis
+from shared.utils.histogram import LatencyHistogram, SUM_FIELD
 from shared.utils.logger import setup_logger
+from shared.utils.timeseries import TimeSeriesStore
 
 logger = setup_logger(__name__)
 
 class MetricsCollector:
-    """指标收集器"""
+    """
+    指标收集器
     
-    def __init__(self, redis_client=None):
+    请求路径上只在进程内累加计数，后台线程按时间间隔或缓冲区大小阈值
+    把累计结果通过一次管道批量写入Redis。Redis变慢时缓冲区有上限，
+    超出的事件会被丢弃并计入丢弃计数。
+    """
+    
+    def __init__(
+        self,
+        redis_client=None,
+        flush_interval: float = 1.0,
+        flush_threshold: int = 500,
+        max_buffer_events: int = 10000,
+        latency_slice_seconds: int = 60,
+        latency_slice_ttl: int = 2 * 86400,
+        latency_day_ttl: int = 35 * 86400,
+        window_slice_seconds: int = 60,
+        window_ttl: int = 2 * 3600,
+        daily_ttl: int = 35 * 86400,
+        timeseries: Optional[TimeSeriesStore] = None
+    ):
+        """
+        初始化指标收集器
+        
+        Args:
+            redis_client: Redis客户端（可选，默认使用共享客户端）
+            flush_interval: 定时刷新间隔（秒）
+            flush_threshold: 缓冲事件数达到该值时立即触发刷新
+            max_buffer_events: 缓冲区最多容纳的事件数，超出后丢弃
+            latency_slice_seconds: 延迟直方图的时间片长度（秒）
+            latency_slice_ttl: 时间片直方图的过期时间（秒）
+            latency_day_ttl: 按天直方图的过期时间（秒）
+            window_slice_seconds: 告警窗口计数器的时间片长度（秒）
+            window_ttl: 告警窗口计数器的过期时间（秒）
+            daily_ttl: 按天计数器的过期时间（秒）
+            timeseries: 多分辨率时间序列存储（可选，默认使用同一Redis客户端）
+        """
         self.redis = redis_client or get_redis()
         self.metrics_prefix = "metrics:"
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_buffer_events = max_buffer_events
+        self.latency_slice_seconds = latency_slice_seconds
+        self.latency_slice_ttl = latency_slice_ttl
+        self.latency_day_ttl = latency_day_ttl
+        self.window_slice_seconds = window_slice_seconds
+        self.window_ttl = window_ttl
+        self.daily_ttl = daily_ttl
+        self.timeseries = timeseries or TimeSeriesStore(redis_client=self.redis)
+        
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+        # 需要设置过期时间的计数器键 -> 过期时间
+        self._counter_ttls: Dict[str, int] = {}
+        # (序列名, 最高精度时间点) -> 增量
+        self._series: Dict[Tuple[str, int], int] = defaultdict(int)
+        # (Redis键, 过期时间) -> 本地直方图
+        self._latency: Dict[Tuple[str, int], LatencyHistogram] = {}
+        self._pending_events = 0
+        self._buffer_stats = {
+            "dropped_events": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "last_flush_ms": 0.0,
+        }
+        
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """启动后台刷新线程"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="metrics-flusher",
+                daemon=True
+            )
+            self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台刷新线程，并刷新剩余的缓冲数据"""
+        self._stop_event.set()
+        self._flush_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+        self.flush()
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            if self._stop_event.is_set():
+                break
+            self.flush()
+    
+    def _latency_slice_key(self, endpoint: str, slice_start: int) -> str:
+        """时间片延迟直方图的键"""
+        return f"{self.metrics_prefix}latency:{endpoint}:m:{slice_start}"
+    
+    def _latency_day_key(self, endpoint: str, date_key: str) -> str:
+        """按天延迟直方图的键"""
+        return f"{self.metrics_prefix}latency:{endpoint}:d:{date_key}"
+    
+    def _window_key(self, kind: str, slice_start: int) -> str:
+        """告警窗口计数器的键（kind为requests或errors）"""
+        return f"{self.metrics_prefix}window:{kind}:{slice_start}"
+    
+    def _window_keys(self, *kinds: str) -> List[str]:
+        """当前时间片的告警窗口计数器键"""
+        now = int(time.time())
+        slice_start = now - now % self.window_slice_seconds
+        return [self._window_key(kind, slice_start) for kind in kinds]
+    
+    def _buffer(
+        self,
+        counters: List[str],
+        response_time: Optional[tuple] = None,
+        expiring: Optional[List[Tuple[str, int]]] = None,
+        series: Optional[List[str]] = None
+    ) -> bool:
+        """
+        把一个事件写入缓冲区，缓冲区已满时丢弃
+        
+        Args:
+            counters: 按天计数器键（过期时间为daily_ttl）
+            response_time: (端点, 耗时毫秒)
+            expiring: 使用其他过期时间的计数器 (键, 过期时间)
+            series: 时间序列名
+        """
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            if self._pending_events >= self.max_buffer_events:
+                self._buffer_stats["dropped_events"] += 1
+                return False
+            for key in counters:
+                self._counters[key] += 1
+                self._counter_ttls[key] = self.daily_ttl
+            if series:
+                point = self.timeseries.tiers[0].bucket(time.time())
+                for name in series:
+                    self._series[(name, point)] += 1
+            for key, ttl in expiring or ():
+                self._counters[key] += 1
+                self._counter_ttls[key] = ttl
+            if response_time is not None:
+                endpoint, duration_ms = response_time
+                now = time.time()
+                slice_start = int(now) - int(now) % self.latency_slice_seconds
+                date_key = datetime.utcfromtimestamp(now).strftime("%Y-%m-%d")
+                for histogram_key in (
+                    (self._latency_slice_key(endpoint, slice_start), self.latency_slice_ttl),
+                    (self._latency_day_key(endpoint, date_key), self.latency_day_ttl),
+                ):
+                    histogram = self._latency.get(histogram_key)
+                    if histogram is None:
+                        histogram = self._latency[histogram_key] = LatencyHistogram()
+                    histogram.record(duration_ms)
+            self._pending_events += 1
+            should_flush = self._pending_events >= self.flush_threshold
+        if should_flush:
+            self._flush_event.set()
+        return True
+    
+    def flush(self) -> bool:
+        """把缓冲区中的指标通过一次管道写入Redis"""
+        with self._lock:
+            if not self._pending_events:
+                return True
+            counters = self._counters
+            counter_ttls = self._counter_ttls
+            series = self._series
+            latency = self._latency
+            pending = self._pending_events
+            self._counters = defaultdict(int)
+            self._counter_ttls = {}
+            self._series = defaultdict(int)
+            self._latency = {}
+            self._pending_events = 0
+        
+        start = time.perf_counter()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, delta in counters.items():
+                pipe.incrby(key, delta)
+            for key, ttl in counter_ttls.items():
+                pipe.expire(key, ttl)
+            self.timeseries.add_to_pipeline(pipe, series)
+            for (key, ttl), histogram in latency.items():
+                for field, value in histogram.to_fields().items():
+                    if field == SUM_FIELD:
+                        pipe.hincrbyfloat(key, field, value)
+                    else:
+                        pipe.hincrby(key, field, value)
+                pipe.expire(key, ttl)
+            pipe.execute()
+        except Exception as e:
+            with self._lock:
+                self._buffer_stats["flush_failures"] += 1
+                self._buffer_stats["dropped_events"] += pending
+            logger.warning(f"Failed to flush metrics ({pending} events dropped): {e}")
+            return False
+        
+        with self._lock:
+            self._buffer_stats["flushes"] += 1
+            self._buffer_stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return True
+    
+    def get_buffer_stats(self) -> Dict[str, Any]:
+        """获取缓冲区状态（待刷新事件数、丢弃数、刷新次数等）"""
+        with self._lock:
+            stats = dict(self._buffer_stats)
+            stats["pending_events"] = self._pending_events
+        return stats
     
     def record_request(
         self,
@@ -23,39 +243,56 @@ class MetricsCollector:
         duration_ms: float,
         user_id: Optional[str] = None
     ):
-        """记录请求指标"""
-        timestamp = int(time.time())
-        date_key = datetime.utcnow().strftime("%Y-%m-%d")
+        """
+        记录请求指标（只写入进程内缓冲区）
         
-        # 记录请求计数
-        self.redis.incr(f"{self.metrics_prefix}requests:total:{date_key}")
-        self.redis.incr(f"{self.metrics_prefix}requests:endpoint:{endpoint}:{date_key}")
-        self.redis.incr(f"{self.metrics_prefix}requests:status:{status_code}:{date_key}")
-        
-        # 记录响应时间
-        self.redis.lpush(f"{self.metrics_prefix}response_time:{endpoint}", duration_ms)
-        self.redis.ltrim(f"{self.metrics_prefix}response_time:{endpoint}", 0, 999)  # 保留最近1000条
+        同时写入告警窗口的分钟计数器，5xx响应计为错误。
+        """
+        date_key = datetime.utcnow().strftime("%Y-%m-%d")
         
+        counters = [
+            f"{self.metrics_prefix}requests:total:{date_key}",
+            f"{self.metrics_prefix}requests:endpoint:{endpoint}:{date_key}",
+            f"{self.metrics_prefix}requests:status:{status_code}:{date_key}",
+        ]
         # 记录用户请求（如果提供）
         if user_id:
-            self.redis.incr(f"{self.metrics_prefix}requests:user:{user_id}:{date_key}")
+            counters.append(f"{self.metrics_prefix}requests:user:{user_id}:{date_key}")
+        
+        window_kinds = ("requests", "errors") if status_code >= 500 else ("requests",)
+        expiring = [(key, self.window_ttl) for key in self._window_keys(*window_kinds)]
+        series = [f"{kind}:{name}" for kind in window_kinds for name in ("total", endpoint)]
+        series.append(f"status:{status_code // 100}xx")
+        self._buffer(counters, (endpoint, duration_ms), expiring, series)
     
     def record_error(
         self,
         error_type: str,
         endpoint: str,
         error_message: str,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        status_code: int = 500
     ):
-        """记录错误指标"""
-        date_key = datetime.utcnow().strftime("%Y-%m-%d")
+        """
+        记录错误指标（只写入进程内缓冲区）
         
-        self.redis.incr(f"{self.metrics_prefix}errors:total:{date_key}")
-        self.redis.incr(f"{self.metrics_prefix}errors:type:{error_type}:{date_key}")
-        self.redis.incr(f"{self.metrics_prefix}errors:endpoint:{endpoint}:{date_key}")
+        抛出异常的请求不会再调用record_request，因此告警窗口中计入一次请求；与record_request
+        一致，只有状态码>=500的异常计为告警窗口中的错误（参数错误、未认证、404等不触发错误率告警）。
+        """
+        date_key = datetime.utcnow().strftime("%Y-%m-%d")
         
+        counters = [
+            f"{self.metrics_prefix}errors:total:{date_key}",
+            f"{self.metrics_prefix}errors:type:{error_type}:{date_key}",
+            f"{self.metrics_prefix}errors:endpoint:{endpoint}:{date_key}",
+        ]
         if user_id:
-            self.redis.incr(f"{self.metrics_prefix}errors:user:{user_id}:{date_key}")
+            counters.append(f"{self.metrics_prefix}errors:user:{user_id}:{date_key}")
+        
+        window_kinds = ("requests", "errors") if status_code >= 500 else ("requests",)
+        expiring = [(key, self.window_ttl) for key in self._window_keys(*window_kinds)]
+        series = [f"{kind}:{name}" for kind in window_kinds for name in ("total", endpoint)]
+        self._buffer(counters, expiring=expiring, series=series)
     
     def get_metrics(
         self,
@@ -81,68 +318,235 @@ class MetricsCollector:
                 self.redis.get(f"{self.metrics_prefix}errors:endpoint:{endpoint}:{date}") or 0
             )
             
-            # 获取平均响应时间
-            response_times = self.redis.lrange(
-                f"{self.metrics_prefix}response_time:{endpoint}", 0, -1
-            )
-            if response_times:
-                avg_time = sum(float(t) for t in response_times) / len(response_times)
-                metrics["avg_response_time_ms"] = round(avg_time, 2)
+            # 响应时间（按天直方图，含分位数）
+            latency = self.get_latency(endpoint, date=date)
+            if latency.count:
+                metrics["avg_response_time_ms"] = round(latency.mean_ms, 2)
+                metrics["latency"] = latency.summary()
         
         return metrics
+    
+    def get_latency(
+        self,
+        endpoint: str,
+        window_minutes: Optional[int] = None,
+        date: Optional[str] = None
+    ) -> LatencyHistogram:
+        """
+        获取端点的延迟直方图（各进程写入的桶计数已在Redis中合并）
+        
+        Args:
+            endpoint: 端点
+            window_minutes: 最近N分钟（按时间片合并）
+            date: 指定日期（YYYY-MM-DD），与window_minutes二选一
+        """
+        if window_minutes is None:
+            date = date or datetime.utcnow().strftime("%Y-%m-%d")
+            keys = [self._latency_day_key(endpoint, date)]
+        else:
+            now = int(time.time())
+            current_slice = now - now % self.latency_slice_seconds
+            slice_count = max(1, -(-window_minutes * 60 // self.latency_slice_seconds))
+            keys = [
+                self._latency_slice_key(endpoint, current_slice - i * self.latency_slice_seconds)
+                for i in range(slice_count)
+            ]
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        histogram = LatencyHistogram()
+        for fields in pipe.execute():
+            if fields:
+                histogram.merge(LatencyHistogram.from_fields(fields))
+        return histogram
+    
+    def get_series(
+        self,
+        series: str,
+        start: float,
+        end: Optional[float] = None,
+        tier: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        查询时间序列（如 requests:total、errors:/api/v1/tasks/{task_id}、status:5xx）
+        
+        未指定层级时自动选择覆盖该时间范围的最高精度层级。
+        """
+        return self.timeseries.range(series, start, end, tier)
+    
+    def get_window_counts(self, window_minutes: int = 5) -> Dict[str, int]:
+        """
+        获取最近N分钟的请求数和错误数
+        
+        窗口内所有时间片的计数器通过一次MGET读取。
+        """
+        now = int(time.time())
+        current_slice = now - now % self.window_slice_seconds
+        slice_count = max(1, -(-window_minutes * 60 // self.window_slice_seconds))
+        slices = [current_slice - i * self.window_slice_seconds for i in range(slice_count)]
+        keys = [self._window_key("requests", start) for start in slices]
+        keys += [self._window_key("errors", start) for start in slices]
+        values = self.redis.mget(keys)
+        return {
+            "requests": sum(int(value or 0) for value in values[:slice_count]),
+            "errors": sum(int(value or 0) for value in values[slice_count:]),
+        }
+
+class AlertRule:
+    """
+    告警规则
+    
+    check 返回告警消息表示触发，返回None表示正常。
+    同一规则触发后在 cooldown 秒内不会重复发送（跨进程去重）。
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        check: Callable[[], Optional[str]],
+        severity: str = "warning",
+        cooldown: int = 300
+    ):
+        self.name = name
+        self.check = check
+        self.severity = severity
+        self.cooldown = cooldown
 
 class AlertManager:
     """告警管理器"""
     
-    def __init__(self, redis_client=None):
+    def __init__(self, redis_client=None, metrics: Optional[MetricsCollector] = None):
         self.redis = redis_client or get_redis()
+        self.metrics = metrics or MetricsCollector(redis_client=self.redis)
         self.alert_prefix = "alerts:"
+        self.rules: List[AlertRule] = []
+        self._evaluator: Optional[threading.Thread] = None
+        self._evaluator_stop = threading.Event()
+    
+    def get_error_rate(self, window_minutes: int = 5) -> Dict[str, Any]:
+        """获取最近N分钟的请求数、错误数和错误率（一次MGET）"""
+        counts = self.metrics.get_window_counts(window_minutes)
+        requests = counts["requests"]
+        counts["error_rate"] = counts["errors"] / requests if requests else 0.0
+        return counts
     
     def check_error_rate(
         self,
         threshold: float = 0.1,
-        window_minutes: int = 5
+        window_minutes: int = 5,
+        min_requests: int = 1
     ) -> bool:
-        """检查错误率是否超过阈值"""
-        now = datetime.utcnow()
-        window_start = now - timedelta(minutes=window_minutes)
+        """
+        检查错误率是否超过阈值
         
-        # 获取窗口内的请求数和错误数
-        total_requests = 0
-        total_errors = 0
+        Args:
+            threshold: 错误率阈值
+            window_minutes: 检查窗口（分钟）
+            min_requests: 窗口内请求数少于该值时不告警，避免低流量时误报
+        """
+        counts = self.get_error_rate(window_minutes)
+        if counts["requests"] < max(min_requests, 1):
+            return False
+        return counts["error_rate"] > threshold
+    
+    def error_rate_rule(
+        self,
+        threshold: float = 0.1,
+        window_minutes: int = 5,
+        min_requests: int = 20,
+        severity: str = "critical",
+        cooldown: int = 300
+    ) -> AlertRule:
+        """构造错误率告警规则"""
+        def check() -> Optional[str]:
+            counts = self.get_error_rate(window_minutes)
+            if counts["requests"] < max(min_requests, 1) or counts["error_rate"] <= threshold:
+                return None
+            return (
+                f"最近{window_minutes}分钟错误率 {counts['error_rate']:.1%} 超过阈值 {threshold:.0%}"
+                f"（{counts['errors']}/{counts['requests']}）"
+            )
         
-        for i in range(window_minutes):
-            date_key = (now - timedelta(minutes=i)).strftime("%Y-%m-%d")
-            hour_minute = (now - timedelta(minutes=i)).strftime("%H:%M")
-            
-            requests = int(self.redis.get(f"{self.alert_prefix}requests:{date_key}:{hour_minute}") or 0)
-            errors = int(self.redis.get(f"{self.alert_prefix}errors:{date_key}:{hour_minute}") or 0)
-            
-            total_requests += requests
-            total_errors += errors
+        return AlertRule("high_error_rate", check, severity=severity, cooldown=cooldown)
+    
+    def add_rule(self, rule: AlertRule):
+        """注册告警规则（同名规则会被替换）"""
+        self.rules = [existing for existing in self.rules if existing.name != rule.name]
+        self.rules.append(rule)
+    
+    def _acquire_notification(self, rule: AlertRule) -> bool:
+        """告警去重：冷却期内只有第一个进程能发送"""
+        try:
+            return bool(self.redis.set(
+                f"{self.alert_prefix}active:{rule.name}", int(time.time()), nx=True, ex=rule.cooldown
+            ))
+        except Exception as e:
+            logger.warning(f"Failed to deduplicate alert {rule.name}: {e}")
+            return True
+    
+    def evaluate(self) -> List[str]:
+        """评估所有规则，返回本次发送的告警名称"""
+        fired = []
+        for rule in list(self.rules):
+            try:
+                message = rule.check()
+            except Exception as e:
+                logger.warning(f"Alert rule {rule.name} failed: {e}")
+                continue
+            if not message:
+                continue
+            # 通知失败（如Redis不可用）只跳过本条规则，不能让评估线程退出
+            try:
+                if self._acquire_notification(rule):
+                    self.send_alert(rule.name, message, severity=rule.severity)
+                    fired.append(rule.name)
+            except Exception as e:
+                logger.error(f"Failed to send alert {rule.name}: {e}")
+        return fired
+    
+    def start_evaluator(self, interval: float = 30.0):
+        """启动后台线程定期评估告警规则"""
+        if self._evaluator is not None and self._evaluator.is_alive():
+            return
+        self._evaluator_stop.clear()
         
-        if total_requests == 0:
-            return False
+        def run():
+            while not self._evaluator_stop.wait(interval):
+                self.evaluate()
         
-        error_rate = total_errors / total_requests
-        return error_rate > threshold
+        self._evaluator = threading.Thread(target=run, name="alert-evaluator", daemon=True)
+        self._evaluator.start()
+    
+    def stop_evaluator(self, timeout: Optional[float] = None):
+        """停止后台评估线程"""
+        self._evaluator_stop.set()
+        if self._evaluator is not None:
+            self._evaluator.join(timeout)
+            self._evaluator = None
     
     def check_response_time(
         self,
         endpoint: str,
         threshold_ms: float = 1000,
-        window_size: int = 100
+        window_minutes: int = 5,
+        percentile: Optional[float] = None
     ) -> bool:
-        """检查响应时间是否超过阈值"""
-        response_times = self.redis.lrange(
-            f"metrics:response_time:{endpoint}", 0, window_size - 1
-        )
+        """
+        检查响应时间是否超过阈值
         
-        if not response_times:
+        Args:
+            endpoint: 端点
+            threshold_ms: 阈值（毫秒）
+            window_minutes: 检查窗口（分钟）
+            percentile: 比较的分位数（如99），为None时比较平均值
+        """
+        latency = self.metrics.get_latency(endpoint, window_minutes=window_minutes)
+        if not latency.count:
             return False
         
-        avg_time = sum(float(t) for t in response_times) / len(response_times)
-        return avg_time > threshold_ms
+        value = latency.percentile(percentile) if percentile is not None else latency.mean_ms
+        return value > threshold_ms
     
     def send_alert(
         self,
@@ -172,4 +576,9 @@ class AlertManager:
 
 # 全局实例
 metrics_collector = MetricsCollector()
-alert_manager = AlertManager()
+alert_manager = AlertManager(metrics=metrics_collector)
+alert_manager.add_rule(alert_manager.error_rate_rule(
+    threshold=float(os.getenv("ALERT_ERROR_RATE_THRESHOLD", "0.1")),
+    window_minutes=int(os.getenv("ALERT_ERROR_RATE_WINDOW", "5")),
+    min_requests=int(os.getenv("ALERT_ERROR_RATE_MIN_REQUESTS", "20"))
+))
@@ -0,0 +1,155 @@
+"""资源归属缓存
+
+缓存 资源ID -> 所有者ID 的映射（如 conversation_id -> user_id、task_id -> user_id），
+包括“资源不存在”的负缓存，使无效或伪造的ID不必每次都查询数据库。
+
+缓存读写是同步Redis调用：同步代码使用 get_owner/peek/remember/invalidate，
+异步服务使用对应的 *_async 方法（在线程中访问Redis，不阻塞事件循环）。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from shared.utils.cache import CacheManager, cache_manager
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 资源类型
+CONVERSATION = "conversation"
+TASK = "task"
+
+# 负缓存标记：资源不存在
+_MISSING = ""
+
+
+class OwnershipCache:
+    """资源归属缓存"""
+
+    def __init__(
+        self,
+        cache: Optional[CacheManager] = None,
+        ttl: int = 300,
+        negative_ttl: int = 30
+    ):
+        """
+        初始化资源归属缓存
+
+        Args:
+            cache: 缓存管理器（可选，默认使用全局实例）
+            ttl: 归属记录的过期时间（秒）
+            negative_ttl: 负缓存（资源不存在）的过期时间（秒），应较短
+        """
+        self.cache = cache or cache_manager
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def _key(self, kind: str, resource_id: Any) -> str:
+        return f"owner:{kind}:{resource_id}"
+
+    def get_owner(
+        self,
+        kind: str,
+        resource_id: Any,
+        loader: Callable[[], Optional[Any]]
+    ) -> Optional[str]:
+        """
+        获取资源的所有者ID
+
+        Args:
+            kind: 资源类型
+            resource_id: 资源ID
+            loader: 缓存未命中时从数据库加载所有者ID的函数，资源不存在时返回None
+
+        Returns:
+            所有者ID字符串，资源不存在时返回None
+        """
+        key = self._key(kind, resource_id)
+        cached_owner = self.cache.get(key, prefix="owner")
+        if cached_owner is not None:
+            return cached_owner or None
+
+        owner_id = loader()
+        if owner_id is None:
+            self.cache.set(key, _MISSING, self.negative_ttl, prefix="owner")
+            return None
+
+        owner = str(owner_id)
+        self.cache.set(key, owner, self.ttl, prefix="owner")
+        return owner
+
+    def is_owner(
+        self,
+        kind: str,
+        resource_id: Any,
+        user_id: Any,
+        loader: Callable[[], Optional[Any]]
+    ) -> bool:
+        """检查资源是否存在且属于该用户"""
+        owner = self.get_owner(kind, resource_id, loader)
+        return owner is not None and owner == str(user_id)
+
+    async def get_owner_async(
+        self,
+        kind: str,
+        resource_id: Any,
+        loader: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[str]:
+        """get_owner 的异步版本，loader 为协程函数（AsyncSession查询）"""
+        key = self._key(kind, resource_id)
+        cached_owner = await asyncio.to_thread(self.cache.get, key, prefix="owner")
+        if cached_owner is not None:
+            return cached_owner or None
+
+        owner_id = await loader()
+        if owner_id is None:
+            await asyncio.to_thread(self.cache.set, key, _MISSING, self.negative_ttl, prefix="owner")
+            return None
+
+        owner = str(owner_id)
+        await asyncio.to_thread(self.cache.set, key, owner, self.ttl, prefix="owner")
+        return owner
+
+    async def is_owner_async(
+        self,
+        kind: str,
+        resource_id: Any,
+        user_id: Any,
+        loader: Callable[[], Awaitable[Optional[Any]]]
+    ) -> bool:
+        """is_owner 的异步版本"""
+        owner = await self.get_owner_async(kind, resource_id, loader)
+        return owner is not None and owner == str(user_id)
+
+    def peek(self, kind: str, resource_id: Any) -> Optional[str]:
+        """
+        只查缓存，不访问数据库
+
+        Returns:
+            所有者ID；资源已知不存在时返回空字符串；未缓存时返回None
+        """
+        return self.cache.get(self._key(kind, resource_id), prefix="owner")
+
+    def remember(self, kind: str, resource_id: Any, owner_id: Any):
+        """记录新创建资源的所有者（同时覆盖可能存在的负缓存）"""
+        self.cache.set(self._key(kind, resource_id), str(owner_id), self.ttl, prefix="owner")
+
+    def invalidate(self, kind: str, resource_id: Any):
+        """资源删除后使归属记录失效（直接写入负缓存）"""
+        self.cache.set(self._key(kind, resource_id), _MISSING, self.negative_ttl, prefix="owner")
+
+
+    async def peek_async(self, kind: str, resource_id: Any) -> Optional[str]:
+        """peek 的异步版本"""
+        return await asyncio.to_thread(self.peek, kind, resource_id)
+
+    async def remember_async(self, kind: str, resource_id: Any, owner_id: Any):
+        """remember 的异步版本"""
+        await asyncio.to_thread(self.remember, kind, resource_id, owner_id)
+
+    async def invalidate_async(self, kind: str, resource_id: Any):
+        """invalidate 的异步版本"""
+        await asyncio.to_thread(self.invalidate, kind, resource_id)
+
+
+# 全局资源归属缓存实例
+ownership_cache = OwnershipCache()
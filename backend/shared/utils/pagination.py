@@ -0,0 +1,94 @@
+"""游标（keyset）分页
+
+OFFSET分页需要数据库先扫描并丢弃前面的所有行，越往后翻越慢；keyset分页记住上一页
+最后一行的排序键，下一页直接用 WHERE (k1, k2, ...) < (v1, v2, ...) 从索引定位，
+耗时与页码无关。
+
+游标对客户端不透明：排序键的值序列化为JSON后做base64url编码，客户端只需原样回传。
+排序键必须以唯一列（主键）结尾，保证顺序稳定、不重不漏。
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, literal, or_, tuple_
+
+from shared.utils.exceptions import ValidationError
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    """把排序键的值编码为不透明游标"""
+    raw = json.dumps([_to_json(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> List[Any]:
+    """
+    解码游标
+
+    Args:
+        cursor: encode_cursor生成的游标
+        parsers: 每个排序键的解析函数（如 datetime.fromisoformat、UUID、bool）
+
+    Raises:
+        ValidationError: 游标格式错误或与排序键不匹配
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("cursor length mismatch")
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise ValidationError("无效的分页游标", field="cursor")
+
+
+def keyset_before(columns: Sequence[Any], values: Sequence[Any], row_value: bool = True):
+    """
+    降序排列时“排在游标之后”的条件：(c1, c2, ...) < (v1, v2, ...)
+
+    默认生成行值比较，PostgreSQL可以直接用 (…, c1, c2) 复合索引定位起点。
+    row_value=False 时展开为 c1 <= v1 AND (c1 < v1 OR (c1 = v1 AND c2 < v2) OR ...)，
+    用于无法写成单个行值比较的排序（如布尔列参与排序）；前置的 c1 <= v1 可走索引范围扫描，
+    OR 只在范围内的行上过滤。
+    """
+    # 显式绑定参数：SQLAlchemy不允许布尔常量直接参与 < 比较
+    bound = [literal(value, column.type) for column, value in zip(columns, values)]
+    if row_value:
+        return tuple_(*columns) < tuple_(*bound)
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == bound[j] for j in range(i)]
+        clauses.append(and_(*equal, column < bound[i]))
+    return and_(columns[0] <= bound[0], or_(*clauses))
+
+
+def split_page(rows: Sequence[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> Tuple[List[Any], Optional[str]]:
+    """
+    拆分多取一行（limit + 1）的查询结果
+
+    Returns:
+        (本页数据, 下一页游标)，多出的一行存在时才有下一页，否则游标为None
+    """
+    items = list(rows[:limit])
+    if len(rows) <= limit or not items:
+        return items, None
+    return items, encode_cursor(*key(items[-1]))
+
+
+def parse_bool(value: Any) -> bool:
+    """游标中的布尔值"""
+    if not isinstance(value, bool):
+        raise ValueError("expected bool")
+    return value
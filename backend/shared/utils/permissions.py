@@ -1,5 +1,9 @@
 """权限检查工具函数"""
+from fastapi import Depends
+
 from shared.models.db_models import User
+from shared.utils.auth import get_current_user
+from shared.utils.exceptions import AuthorizationError
 
 
 def is_admin(user: User) -> bool:
@@ -13,3 +17,15 @@ def is_admin(user: User) -> bool:
         如果是管理员返回True，否则返回False
     """
     return getattr(user, 'is_admin', False) is True
+
+
+async def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """
+    要求当前用户是管理员（FastAPI依赖）
+    
+    Raises:
+        AuthorizationError: 当前用户不是管理员
+    """
+    if not is_admin(current_user):
+        raise AuthorizationError("需要管理员权限", resource="admin")
+    return current_user
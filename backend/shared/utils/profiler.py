@@ -0,0 +1,159 @@
+"""运行时采样性能分析
+
+在运行中的worker里按固定间隔采样 sys._current_frames()，统计各线程的调用栈，
+输出折叠栈（collapsed stacks，每行 "线程;外层帧;...;内层帧 次数"），
+可直接交给 flamegraph.pl / speedscope 生成火焰图。
+
+- 事件循环线程单独标记为 "event-loop"：循环空闲时停在 selectors.select，
+  其余样本都是阻塞事件循环的代码（同步SQL/Redis调用等）
+- 线程池（run_in_threadpool、asyncio.to_thread）中的同步代码按线程名归类
+- 默认跳过空闲样本（事件循环等待IO、工作线程等待任务），只保留真正在执行的栈
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from shared.utils.exceptions import ConflictError
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+EVENT_LOOP_THREAD = "event-loop"
+
+# 线程空闲时栈顶所在的函数：(文件名, 函数名)
+_LOOP_IDLE_FRAMES = {("selectors.py", "select")}
+_WORKER_IDLE_FRAMES = _LOOP_IDLE_FRAMES | {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+}
+
+_THREAD_SUFFIX_RE = re.compile(r"(?:[-_]\d+)+$")
+
+
+def _frame_label(code) -> str:
+    """帧标签：函数名（所在目录/文件名:定义行号），按函数而不是按行聚合"""
+    parent, filename = os.path.split(code.co_filename)
+    return f"{code.co_name} ({os.path.basename(parent)}/{filename}:{code.co_firstlineno})"
+
+
+def _thread_label(name: str) -> str:
+    """同一线程池的线程合并为一个根节点（ThreadPoolExecutor-0_3 -> ThreadPoolExecutor）"""
+    return _THREAD_SUFFIX_RE.sub("", name) or name
+
+
+class SamplingProfiler:
+    """统计采样分析器（每个进程同时只运行一次分析）"""
+
+    def __init__(self, max_stack_depth: int = 128):
+        """
+        Args:
+            max_stack_depth: 每个样本保留的最大栈深度（超出时保留最内层的帧）
+        """
+        self.max_stack_depth = max_stack_depth
+        self._lock = threading.Lock()
+        self._running = False
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def stop(self):
+        """提前结束正在运行的分析"""
+        self._stop_event.set()
+
+    def _is_idle(self, frame, is_loop: bool) -> bool:
+        code = frame.f_code
+        key = (os.path.basename(code.co_filename), code.co_name)
+        return key in (_LOOP_IDLE_FRAMES if is_loop else _WORKER_IDLE_FRAMES)
+
+    def _collapse(self, frame) -> str:
+        labels = []
+        while frame is not None and len(labels) < self.max_stack_depth:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def profile(
+        self,
+        seconds: float,
+        interval: float = 0.01,
+        loop_thread_id: Optional[int] = None,
+        include_idle: bool = False
+    ) -> Dict[str, Any]:
+        """
+        在当前线程中采样所有其他线程，阻塞直到分析结束
+
+        Args:
+            seconds: 分析时长（秒）
+            interval: 采样间隔（秒）
+            loop_thread_id: 事件循环所在线程的ident，用于单独统计事件循环阻塞
+            include_idle: 是否保留空闲样本
+
+        Returns:
+            {"collapsed", "samples", "durationSeconds", "intervalMs", "threads", "eventLoop"}
+        """
+        with self._lock:
+            if self._running:
+                raise ConflictError("已有性能分析正在运行", resource="profiler")
+            self._running = True
+            self._stop_event.clear()
+
+        own_id = threading.get_ident()
+        stacks: Counter = Counter()
+        threads: Dict[str, Dict[str, int]] = {}
+        loop_stats = {"samples": 0, "busy": 0}
+        ticks = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        try:
+            while True:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    is_loop = thread_id == loop_thread_id
+                    name = EVENT_LOOP_THREAD if is_loop else _thread_label(names.get(thread_id, f"thread-{thread_id}"))
+                    stats = threads.setdefault(name, {"samples": 0, "idle": 0})
+                    stats["samples"] += 1
+                    idle = self._is_idle(frame, is_loop)
+                    if is_loop:
+                        loop_stats["samples"] += 1
+                        loop_stats["busy"] += 0 if idle else 1
+                    if idle:
+                        stats["idle"] += 1
+                        if not include_idle:
+                            continue
+                    stacks[f"{name};{self._collapse(frame)}"] += 1
+                frame = None  # 不持有其他线程的帧引用
+                ticks += 1
+
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or self._stop_event.wait(min(interval, remaining)):
+                    break
+        finally:
+            with self._lock:
+                self._running = False
+
+        duration = time.perf_counter() - started
+        if loop_thread_id is not None:
+            loop_stats["busyRatio"] = round(loop_stats["busy"] / loop_stats["samples"], 4) if loop_stats["samples"] else 0.0
+        logger.info(f"Sampling profile finished: {ticks} ticks in {duration:.1f}s, {len(stacks)} distinct stacks")
+        return {
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+            "samples": ticks,
+            "durationSeconds": round(duration, 3),
+            "intervalMs": round(interval * 1000, 3),
+            "threads": threads,
+            "eventLoop": loop_stats if loop_thread_id is not None else None,
+        }
+
+
+# 全局分析器实例
+sampling_profiler = SamplingProfiler()
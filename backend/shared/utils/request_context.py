@@ -0,0 +1,76 @@
+"""请求上下文
+
+中间件在请求开始时创建 RequestContext 并保存在contextvar中，同一请求内的协程、
+线程池任务（run_in_threadpool会复制上下文）都能取到。上下文对象本身是可变的：
+认证依赖在下游补充user_id、中间件在路由匹配后更新route，外层代码也能看到。
+
+日志模块通过LogRecord工厂把上下文字段（request_id、user_id、route）写入每条日志记录。
+"""
+import uuid
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Optional
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# 上游传入的请求ID最大长度，超出时重新生成
+MAX_REQUEST_ID_LENGTH = 128
+
+
+class RequestContext:
+    """单个请求的上下文字段"""
+
+    __slots__ = ("request_id", "user_id", "route", "method")
+
+    def __init__(
+        self,
+        request_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        route: Optional[str] = None,
+        method: Optional[str] = None
+    ):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.user_id = user_id
+        self.route = route
+        self.method = method
+
+    def to_dict(self) -> Dict[str, Any]:
+        """非空字段"""
+        return {
+            name: getattr(self, name)
+            for name in ("request_id", "user_id", "route")
+            if getattr(self, name) is not None
+        }
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """当前请求的上下文（不在请求中时为None）"""
+    return _request_context.get()
+
+
+def bind_request_context(
+    request_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    route: Optional[str] = None,
+    method: Optional[str] = None
+) -> Token:
+    """为当前请求创建上下文，返回用于恢复的token"""
+    if request_id and len(request_id) > MAX_REQUEST_ID_LENGTH:
+        request_id = None
+    return _request_context.set(RequestContext(request_id, user_id, route, method))
+
+
+def reset_request_context(token: Token):
+    """恢复进入请求前的上下文"""
+    _request_context.reset(token)
+
+
+def update_request_context(**fields):
+    """补充当前请求上下文的字段（不在请求中时忽略）"""
+    context = _request_context.get()
+    if context is None:
+        return
+    for name, value in fields.items():
+        setattr(context, name, str(value) if value is not None else None)
@@ -0,0 +1,92 @@
+"""路由模板解析
+
+指标的端点维度使用匹配到的路由模板（如 /api/v1/tasks/{task_id}），
+而不是原始请求路径，避免每个UUID都产生一组新的Redis键。
+"""
+import os
+import re
+import threading
+from typing import Optional, Set
+
+from starlette.requests import Request
+
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 未匹配任何路由的请求（404、扫描器等）
+UNMATCHED_ROUTE = "__unmatched__"
+# 超出端点数量上限后的统一标签
+OVERFLOW_ROUTE = "__other__"
+
+# 路径中看起来像ID的片段：UUID、纯数字、较长的十六进制串
+_ID_SEGMENT = re.compile(
+    r"^(?:[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}"
+    r"|\d+"
+    r"|[0-9a-fA-F]{16,})$"
+)
+
+
+def normalize_path(path: str) -> str:
+    """把路径中的ID片段替换为 {id}"""
+    segments = path.split("/")
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in segments)
+
+
+def resolve_route(request: Request) -> str:
+    """
+    解析请求匹配到的路由模板
+
+    必须在路由匹配之后调用（即 call_next 返回或抛出异常之后）。
+    网关的 /{path:path} 通配路由没有意义，此时退回到替换ID片段后的路径。
+    """
+    route = request.scope.get("route")
+    template: Optional[str] = getattr(route, "path", None)
+    if not template:
+        return UNMATCHED_ROUTE
+    if ":path}" in template:
+        return normalize_path(request.url.path)
+    return template
+
+
+class RouteLabelLimiter:
+    """限制端点标签数量，超出上限的新端点归入 OVERFLOW_ROUTE"""
+
+    def __init__(self, max_labels: int = 500):
+        self.max_labels = max_labels
+        self._labels: Set[str] = set()
+        self._lock = threading.Lock()
+        self._overflowed = False
+
+    def label(self, route: str) -> str:
+        """返回可用于指标的端点标签"""
+        if route in self._labels:
+            return route
+        with self._lock:
+            if route in self._labels:
+                return route
+            if len(self._labels) < self.max_labels:
+                self._labels.add(route)
+                return route
+            if not self._overflowed:
+                self._overflowed = True
+                logger.warning(
+                    f"Metrics route labels exceeded {self.max_labels}, "
+                    f"new routes are recorded as {OVERFLOW_ROUTE}"
+                )
+        return OVERFLOW_ROUTE
+
+    def reset(self):
+        """清空已记录的标签"""
+        with self._lock:
+            self._labels.clear()
+            self._overflowed = False
+
+
+# 全局端点标签限制器
+route_labels = RouteLabelLimiter(max_labels=int(os.getenv("METRICS_MAX_ROUTES", "500")))
+
+
+def route_label(request: Request) -> str:
+    """请求对应的指标端点标签"""
+    return route_labels.label(resolve_route(request))
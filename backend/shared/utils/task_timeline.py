@@ -0,0 +1,241 @@
+"""任务阶段耗时记录
+
+剧本、图片、视频任务的每个阶段（排队等待、密钥查询、调用服务商、轮询结果、写库、通知）
+作为结构化事件写入 task_logs 表。事件先进入进程内缓冲区，
+由后台线程批量插入（一次事务、一条多行INSERT），不占用任务本身的数据库往返。
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from sqlalchemy import insert
+
+from shared.models.db_models import TaskLog
+from shared.utils.logger import setup_logger
+from shared.utils.tracing import tracer
+
+logger = setup_logger(__name__)
+
+# 阶段
+QUEUE_WAIT = "queue_wait"
+KEY_LOOKUP = "key_lookup"
+PROVIDER_REQUEST = "provider_request"
+PROVIDER_POLLING = "provider_polling"
+DB_PERSIST = "db_persist"
+NOTIFY = "notify"
+
+STAGES = (QUEUE_WAIT, KEY_LOOKUP, PROVIDER_REQUEST, PROVIDER_POLLING, DB_PERSIST, NOTIFY)
+
+
+class TaskLogWriter:
+    """task_logs 批量写入器"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        flush_interval: float = 1.0,
+        batch_size: int = 200,
+        max_pending: int = 10000
+    ):
+        """
+        初始化批量写入器
+
+        Args:
+            session_factory: 创建数据库会话的函数（可选，默认使用共享的SessionLocal）
+            flush_interval: 定时写入间隔（秒）
+            batch_size: 缓冲事件数达到该值时立即写入
+            max_pending: 缓冲区最多容纳的事件数，超出后丢弃
+        """
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._stats = {"written": 0, "dropped": 0, "flush_failures": 0}
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.config.database import get_session_local
+            self._session_factory = get_session_local()
+        return self._session_factory
+
+    def start(self):
+        """启动后台写入线程"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="task-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台写入线程，并写入剩余事件"""
+        self._stop_event.set()
+        self._flush_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            if self._stop_event.is_set():
+                break
+            self.flush()
+
+    def record(
+        self,
+        task_id: UUID,
+        stage: str,
+        duration_ms: float,
+        started_at: Optional[datetime] = None,
+        level: str = "info",
+        details: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """记录一个阶段事件（只写入缓冲区）"""
+        if self._thread is None:
+            self.start()
+        row = {
+            "task_id": task_id,
+            "level": level,
+            "message": stage,
+            "details": {"stage": stage, "duration_ms": round(duration_ms, 3), **(details or {})},
+            "created_at": started_at or datetime.utcnow(),
+        }
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._stats["dropped"] += 1
+                return False
+            self._pending.append(row)
+            should_flush = len(self._pending) >= self.batch_size
+        if should_flush:
+            self._flush_event.set()
+        return True
+
+    def flush(self) -> bool:
+        """把缓冲区中的事件在一个事务中批量插入"""
+        with self._lock:
+            rows = self._pending
+            self._pending = []
+        if not rows:
+            return True
+
+        session_factory = self.session_factory
+        if session_factory is None:
+            with self._lock:
+                self._stats["dropped"] += len(rows)
+            return False
+
+        db = session_factory()
+        try:
+            db.execute(insert(TaskLog), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            with self._lock:
+                self._stats["flush_failures"] += 1
+                self._stats["dropped"] += len(rows)
+            logger.warning(f"Failed to write task logs ({len(rows)} events dropped): {e}")
+            return False
+        finally:
+            db.close()
+
+        with self._lock:
+            self._stats["written"] += len(rows)
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """已写入、丢弃、失败次数和待写入事件数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        return stats
+
+
+# 全局写入器实例
+task_log_writer = TaskLogWriter()
+
+
+class TaskTimeline:
+    """单个任务的阶段计时"""
+
+    def __init__(self, task_id: UUID, writer: Optional[TaskLogWriter] = None):
+        self.task_id = task_id
+        self.writer = writer or task_log_writer
+
+    def record(
+        self,
+        stage: str,
+        duration_ms: float,
+        started_at: Optional[datetime] = None,
+        **details
+    ):
+        """直接记录一个已知耗时的阶段（如排队等待）"""
+        self.writer.record(self.task_id, stage, duration_ms, started_at=started_at, details=details)
+
+    def record_queue_wait(self, created_at: Optional[datetime]):
+        """记录从任务创建到开始处理的排队时间"""
+        if created_at is None:
+            return
+        wait_ms = max((datetime.utcnow() - created_at).total_seconds() * 1000, 0.0)
+        self.record(QUEUE_WAIT, wait_ms, started_at=created_at)
+
+    @contextmanager
+    def stage(self, stage: str, **details) -> Iterator[Dict[str, Any]]:
+        """
+        记录代码块的耗时，失败时以error级别记录异常
+
+        代码块可以向返回的字典中补充详情。
+        """
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        extra: Dict[str, Any] = dict(details)
+        level = "info"
+        try:
+            with tracer.span(f"task.{stage}", attributes={"task.id": str(self.task_id)}):
+                yield extra
+        except Exception as e:
+            level = "error"
+            extra["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.writer.record(
+                self.task_id,
+                stage,
+                (time.perf_counter() - start) * 1000,
+                started_at=started_at,
+                level=level,
+                details=extra
+            )
+
+
+def build_timeline(logs: List[TaskLog]) -> Dict[str, Any]:
+    """把task_logs记录整理为时间线和按阶段汇总的耗时"""
+    events = []
+    totals: Dict[str, float] = {}
+    for log in logs:
+        details = dict(log.details or {})
+        stage = details.pop("stage", log.message)
+        duration_ms = details.pop("duration_ms", None)
+        events.append({
+            "stage": stage,
+            "level": log.level,
+            "startedAt": log.created_at.isoformat() if log.created_at else None,
+            "durationMs": duration_ms,
+            "details": details,
+        })
+        if duration_ms is not None:
+            totals[stage] = round(totals.get(stage, 0.0) + duration_ms, 3)
+    return {"events": events, "totals": totals}
@@ -0,0 +1,176 @@
+"""多分辨率时间序列
+
+在Redis哈希中保存计数型时间序列，分为10秒、1分钟、1小时三个精度层级。
+写入时同一增量在一次管道中累加到所有层级（计数求和可以直接降采样），
+每个层级有各自的保留时间。每个哈希保存一段时间（chunk）内的所有点，
+字段为点的起始时间戳，避免每个点一个键。
+"""
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class RollupTier:
+    """精度层级"""
+
+    def __init__(self, name: str, resolution: int, ttl: int, chunk_span: int):
+        """
+        Args:
+            name: 层级名称
+            resolution: 每个点的时间跨度（秒）
+            ttl: 保留时间（秒）
+            chunk_span: 每个哈希覆盖的时间跨度（秒），必须是resolution的整数倍
+        """
+        self.name = name
+        self.resolution = resolution
+        self.ttl = ttl
+        self.chunk_span = chunk_span
+
+    def bucket(self, timestamp: float) -> int:
+        """时间戳所在点的起始时间"""
+        ts = int(timestamp)
+        return ts - ts % self.resolution
+
+    def chunk(self, timestamp: float) -> int:
+        """时间戳所在哈希的起始时间"""
+        ts = int(timestamp)
+        return ts - ts % self.chunk_span
+
+
+DEFAULT_TIERS = (
+    RollupTier("10s", 10, 6 * 3600, 3600),
+    RollupTier("1m", 60, 3 * 86400, 86400),
+    RollupTier("1h", 3600, 90 * 86400, 30 * 86400),
+)
+
+
+class TimeSeriesStore:
+    """计数型时间序列存储"""
+
+    def __init__(
+        self,
+        redis_client=None,
+        tiers: Iterable[RollupTier] = DEFAULT_TIERS,
+        prefix: str = "ts:",
+        max_points: int = 1000
+    ):
+        """
+        初始化时间序列存储
+
+        Args:
+            redis_client: Redis客户端（可选，默认使用共享客户端）
+            tiers: 精度层级，按精度从高到低排列
+            prefix: 键前缀
+            max_points: 自动选择层级时单次查询最多返回的点数
+        """
+        if redis_client is None:
+            from shared.config.redis import get_redis
+            redis_client = get_redis()
+        self.redis = redis_client
+        self.tiers = sorted(tiers, key=lambda tier: tier.resolution)
+        self.prefix = prefix
+        self.max_points = max_points
+
+    def _key(self, series: str, tier: RollupTier, chunk_start: int) -> str:
+        return f"{self.prefix}{series}:{tier.name}:{chunk_start}"
+
+    def get_tier(self, name: str) -> RollupTier:
+        """根据名称获取层级"""
+        for tier in self.tiers:
+            if tier.name == name:
+                return tier
+        raise ValueError(f"未知的时间序列层级: {name}")
+
+    def add_to_pipeline(self, pipe, points: Dict[Tuple[str, int], float]):
+        """
+        把增量写入已有的管道（由调用方统一执行）
+
+        Args:
+            pipe: Redis管道
+            points: (序列名, 时间戳) -> 增量
+        """
+        # 同一个哈希只设置一次过期时间
+        expires: Dict[str, int] = {}
+        for (series, timestamp), delta in points.items():
+            for tier in self.tiers:
+                chunk_start = tier.chunk(timestamp)
+                key = self._key(series, tier, chunk_start)
+                field = tier.bucket(timestamp)
+                if isinstance(delta, float) and not delta.is_integer():
+                    pipe.hincrbyfloat(key, field, delta)
+                else:
+                    pipe.hincrby(key, field, int(delta))
+                # 哈希在其最后一个点超出保留时间后过期
+                expires[key] = chunk_start + tier.chunk_span + tier.ttl
+        for key, expire_at in expires.items():
+            pipe.expireat(key, expire_at)
+
+    def add(self, series: str, value: float = 1, timestamp: Optional[float] = None):
+        """直接写入一个增量"""
+        pipe = self.redis.pipeline(transaction=False)
+        self.add_to_pipeline(pipe, {(series, timestamp or time.time()): value})
+        pipe.execute()
+
+    def select_tier(self, start: float, end: float) -> RollupTier:
+        """选择保留时间覆盖起点、且点数不超过max_points的最高精度层级"""
+        now = time.time()
+        for tier in self.tiers:
+            if now - start > tier.ttl:
+                continue
+            if (end - start) / tier.resolution <= self.max_points:
+                return tier
+        return self.tiers[-1]
+
+    def range(
+        self,
+        series: str,
+        start: float,
+        end: Optional[float] = None,
+        tier: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        查询时间范围内的点（缺失的点补0）
+
+        Args:
+            series: 序列名
+            start: 起始时间戳（秒）
+            end: 结束时间戳（秒，默认当前时间）
+            tier: 层级名称（默认自动选择）
+
+        Returns:
+            {"series", "tier", "resolution", "points": [[时间戳, 值], ...]}
+        """
+        end = end if end is not None else time.time()
+        if end < start:
+            raise ValueError("结束时间不能早于起始时间")
+        selected = self.get_tier(tier) if tier else self.select_tier(start, end)
+
+        first = selected.bucket(start)
+        last = selected.bucket(end)
+        if (last - first) // selected.resolution + 1 > self.max_points:
+            first = last - (self.max_points - 1) * selected.resolution
+
+        chunks = list(range(selected.chunk(first), selected.chunk(last) + 1, selected.chunk_span))
+        pipe = self.redis.pipeline(transaction=False)
+        for chunk_start in chunks:
+            pipe.hgetall(self._key(series, selected, chunk_start))
+        values: Dict[int, float] = {}
+        for fields in pipe.execute():
+            for field, value in (fields or {}).items():
+                name = field.decode() if isinstance(field, bytes) else field
+                number = float(value)
+                values[int(name)] = int(number) if number.is_integer() else number
+
+        points: List[List[float]] = [
+            [bucket, values.get(bucket, 0)]
+            for bucket in range(first, last + 1, selected.resolution)
+        ]
+        return {
+            "series": series,
+            "tier": selected.name,
+            "resolution": selected.resolution,
+            "points": points,
+        }
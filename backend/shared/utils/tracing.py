@@ -0,0 +1,362 @@
+"""轻量级分布式追踪
+
+- 使用W3C traceparent请求头在网关和各服务之间传播追踪上下文
+- 当前span保存在contextvar中，协程和线程池（run_in_threadpool会复制上下文）都能取到
+- 结束的span交给可替换的导出器：内存导出器（开发/测试）、JSON Lines文件导出器
+- 根span按比例采样，子span跟随父span的采样决定
+
+配置（环境变量）：
+    TRACE_EXPORTER: none | memory | file（默认none，只传播上下文不导出）
+    TRACE_FILE: 文件导出器路径（默认 logs/traces.jsonl）
+    TRACE_SAMPLE_RATIO: 根span采样比例（默认1.0）
+"""
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Mapping, MutableMapping, Optional
+
+from shared.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# 记录到span属性中的SQL语句最大长度
+MAX_STATEMENT_LENGTH = 500
+
+
+class SpanContext:
+    """可传播的追踪上下文"""
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        """格式化为traceparent请求头"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        """解析traceparent请求头，格式无效时返回None"""
+        if not header:
+            return None
+        match = _TRACEPARENT_RE.match(header.strip().lower())
+        if not match:
+            return None
+        version, trace_id, span_id, flags = match.groups()
+        if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+            return None
+        return cls(trace_id, span_id, sampled=bool(int(flags, 16) & 0x01))
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class Span:
+    """一次操作的耗时记录"""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        context: SpanContext,
+        parent_id: Optional[str] = None,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.trace_id
+
+    @property
+    def span_id(self) -> str:
+        return self.context.span_id
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        """标记span失败"""
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        """结束span（重复调用无效）"""
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.tracer._on_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": self.tracer.service,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """span导出器基类"""
+
+    def export(self, spans: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """内存导出器：保留最近的span，用于开发和测试"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]):
+        with self._lock:
+            self.spans.extend(spans)
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """获取一个追踪的所有span（按开始时间排序）"""
+        with self._lock:
+            spans = [span for span in self.spans if span["trace_id"] == trace_id]
+        return sorted(spans, key=lambda span: span["start_time"])
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+class FileExporter(SpanExporter):
+    """文件导出器：每个span一行JSON"""
+
+    def __init__(self, path: str = "logs/traces.jsonl"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]):
+        lines = "".join(json.dumps(span, ensure_ascii=False, default=str) + "\n" for span in spans)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """追踪器"""
+
+    def __init__(
+        self,
+        service: Optional[str] = None,
+        exporter: Optional[SpanExporter] = None,
+        sample_ratio: float = 1.0
+    ):
+        """
+        初始化追踪器
+
+        Args:
+            service: 服务名
+            exporter: span导出器，为None时只传播上下文不导出
+            sample_ratio: 根span采样比例（0~1）
+        """
+        self.service = service or os.getenv("SERVICE_NAME", "default")
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+
+    def configure(
+        self,
+        service: Optional[str] = None,
+        exporter: Optional[SpanExporter] = None,
+        sample_ratio: Optional[float] = None
+    ):
+        """更新服务名、导出器或采样比例"""
+        if service is not None:
+            self.service = service
+        if exporter is not None:
+            self.exporter = exporter
+        if sample_ratio is not None:
+            self.sample_ratio = sample_ratio
+
+    def current_span(self) -> Optional[Span]:
+        """当前上下文中的span"""
+        return _current_span.get()
+
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None
+    ) -> Span:
+        """
+        创建span（不设置为当前span）
+
+        没有显式父上下文时使用当前span作为父span；都没有时创建新追踪并按比例采样。
+        """
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+        if parent is not None:
+            context = SpanContext(parent.trace_id, _new_span_id(), parent.sampled)
+            parent_id = parent.span_id
+        else:
+            sampled = self.sample_ratio >= 1.0 or random.random() < self.sample_ratio
+            context = SpanContext(_new_trace_id(), _new_span_id(), sampled)
+            parent_id = None
+        return Span(self, name, context, parent_id, kind, attributes)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None
+    ) -> Iterator[Span]:
+        """创建span并在代码块内设置为当前span"""
+        span = self.start_span(name, kind, attributes, parent)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def inject(self, headers: MutableMapping[str, str], span: Optional[Span] = None):
+        """把当前（或指定）span的上下文写入请求头"""
+        span = span or _current_span.get()
+        if span is not None:
+            headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+
+    def extract(self, headers: Mapping[str, str]) -> Optional[SpanContext]:
+        """从请求头中解析上游的追踪上下文"""
+        return SpanContext.from_traceparent(headers.get(TRACEPARENT_HEADER))
+
+    def _on_end(self, span: Span):
+        if self.exporter is None or not span.context.sampled:
+            return
+        try:
+            self.exporter.export([span.to_dict()])
+        except Exception as e:
+            logger.warning(f"Failed to export span {span.name}: {e}")
+
+
+def traced(name: str, kind: str = "internal"):
+    """把函数调用包装为span（支持同步和异步函数）"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            with tracer.span(name, kind):
+                return func(*args, **kwargs)
+        return sync_wrapper
+    return decorator
+
+
+def _exporter_from_env() -> Optional[SpanExporter]:
+    exporter = os.getenv("TRACE_EXPORTER", "none").lower()
+    if exporter == "memory":
+        return InMemoryExporter()
+    if exporter == "file":
+        return FileExporter(os.getenv("TRACE_FILE", "logs/traces.jsonl"))
+    return None
+
+
+# 全局追踪器实例
+tracer = Tracer(
+    exporter=_exporter_from_env(),
+    sample_ratio=float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+)
+
+
+_sqlalchemy_instrumented = False
+
+
+def instrument_sqlalchemy():
+    """为所有SQLAlchemy引擎的SQL执行创建span（只在已有追踪上下文时记录）"""
+    global _sqlalchemy_instrumented
+    if _sqlalchemy_instrumented:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_span.get() is None:
+            return
+        span = tracer.start_span("db.query", kind="client", attributes={
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            "db.executemany": executemany,
+        })
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            span = spans.pop()
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+
+    @event.listens_for(Engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        spans = connection.info.get("trace_spans") if connection is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_exception(exception_context.original_exception)
+            span.end()
+
+    _sqlalchemy_instrumented = True
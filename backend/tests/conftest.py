@@ -21,7 +21,7 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_path))
 
-from shared.config.database import Base, get_db
+from shared.config.database import Base, get_db, get_async_db, get_read_db, SyncSessionAdapter
 # 在测试环境中，暂时只导入User模型用于认证测试
 # 注意：Message和MediaFile模型有metadata字段，与SQLAlchemy保留字冲突
 # 暂时只导入需要的模型
@@ -74,7 +74,10 @@ def db_session():
         print(f"Warning: Table creation issue: {e}")
         # 继续执行，让测试显示具体错误
     
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # 与生产环境的会话配置一致：提交后不使对象过期
+    TestingSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+    )
     
     session = TestingSessionLocal()
     try:
@@ -87,6 +90,46 @@ def db_session():
             pass  # 忽略清理错误
 
 
+@pytest.fixture(scope="function")
+def async_db_session(db_session):
+    """以AsyncSession接口包装测试会话（SQLite测试环境没有异步驱动）"""
+    return SyncSessionAdapter(db_session)
+
+
+class QueryCounter:
+    """记录测试期间发往数据库的SQL语句"""
+    
+    def __init__(self):
+        self.statements = []
+    
+    def __len__(self):
+        return len(self.statements)
+    
+    @property
+    def selects(self):
+        """其中的SELECT语句"""
+        return [s for s in self.statements if s.lstrip().upper().startswith("SELECT")]
+    
+    def reset(self):
+        self.statements.clear()
+
+
+@pytest.fixture(scope="function")
+def query_counter(db_session):
+    """统计测试会话执行的SQL语句数（用于断言数据库往返次数）"""
+    from sqlalchemy import event
+    
+    counter = QueryCounter()
+    engine = db_session.get_bind()
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield counter
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """创建测试客户端"""
@@ -99,7 +142,12 @@ def client(db_session):
         finally:
             pass
     
+    async def override_get_async_db():
+        yield SyncSessionAdapter(db_session)
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_read_db] = override_get_async_db
     
     with TestClient(app) as test_client:
         yield test_client
@@ -312,3 +312,71 @@ class TestGatewayApp:
         
         # 应该返回401未授权
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    @staticmethod
+    def _token(**claims):
+        payload = {"sub": "user123", "exp": datetime.utcnow() + timedelta(hours=1), **claims}
+        return jwt.encode(payload, "test-secret-key-for-api-gateway-testing", algorithm="HS256")
+    
+    def test_gateway_memory_requires_admin(self):
+        """测试网关内存统计需要管理员令牌，且不依赖数据库"""
+        if app is None:
+            pytest.skip("API Gateway app not available")
+        client = TestClient(app)
+        
+        response = client.get("/gateway/memory")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        
+        response = client.get("/gateway/memory", headers={"Authorization": f"Bearer {self._token()}"})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        
+        response = client.get("/gateway/memory", headers={"Authorization": f"Bearer {self._token(admin=True)}"})
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()["data"]
+        assert data["service"] == "api_gateway"
+        assert "rate_limiter.requests" in data["structures"]
+    
+    def test_gateway_tracemalloc_snapshots(self):
+        """测试在网关进程中启动tracemalloc、拍摄快照并对比"""
+        if app is None:
+            pytest.skip("API Gateway app not available")
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {self._token(admin=True)}"}
+        
+        try:
+            assert client.post("/gateway/memory/tracemalloc/start", headers=headers).json()["data"]["tracing"]
+            assert client.post("/gateway/memory/snapshots?label=before", headers=headers).status_code == 200
+            assert client.post("/gateway/memory/snapshots?label=after", headers=headers).status_code == 200
+            
+            response = client.get("/gateway/memory/diff", headers=headers)
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["data"]["groupBy"] == "lineno"
+        finally:
+            response = client.post("/gateway/memory/tracemalloc/stop", headers=headers)
+        assert response.json()["data"]["tracing"] is False
+    
+    def test_metrics_requires_scrape_token(self, monkeypatch):
+        """测试网关指标端点需要抓取令牌，未配置令牌时不开放"""
+        if app is None:
+            pytest.skip("API Gateway app not available")
+        from api_gateway.src.config.settings import settings
+        client = TestClient(app)
+        
+        assert "/metrics" not in settings.PUBLIC_PATHS
+        assert client.get("/metrics?scope=local").status_code == status.HTTP_403_FORBIDDEN
+        
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+        # 普通用户的JWT不能代替抓取令牌
+        response = client.get("/metrics?scope=local", headers={"Authorization": f"Bearer {self._token(admin=True)}"})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        
+        response = client.get("/metrics?scope=local", headers={"Authorization": "Bearer scrape-secret"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Content-Type"].startswith("text/plain")
+    
+    def test_admin_routes_not_mounted(self):
+        """测试网关不挂载服务的管理路由（由通配路由转发给各服务）"""
+        if app is None:
+            pytest.skip("API Gateway app not available")
+        paths = {route.path for route in app.routes}
+        assert not any(path.startswith("/api/v1/admin") for path in paths)
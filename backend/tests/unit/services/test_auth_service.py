@@ -102,3 +102,23 @@ class TestAuthService:
         
         # 验证错误密码
         assert service.verify_password("wrongpassword", user.password_hash) is False
+    
+    def test_user_token_claims(self, db_session: Session, test_user):
+        """测试只有管理员令牌带 admin 声明（网关据此校验运维端点）"""
+        from shared.utils.auth import user_token_claims
+        
+        assert user_token_claims(test_user) == {"sub": str(test_user.id)}
+        
+        test_user.is_admin = True
+        assert user_token_claims(test_user) == {"sub": str(test_user.id), "admin": True}
+    
+    async def test_get_current_user_async_session(self, async_db_session, test_user):
+        """测试认证依赖通过异步会话查询用户"""
+        from shared.utils.auth import create_access_token, get_current_user, user_token_claims
+        
+        token = create_access_token(user_token_claims(test_user))
+        user = await get_current_user(token=token, db=async_db_session)
+        assert user.id == test_user.id
+        
+        with pytest.raises(AuthenticationError):
+            await get_current_user(token=create_access_token({"sub": "not-a-uuid"}), db=async_db_session)
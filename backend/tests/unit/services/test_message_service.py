@@ -1,6 +1,8 @@
 """消息服务单元测试"""
 import pytest
 from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
 from uuid import UUID, uuid4
 from datetime import datetime, timedelta
 from shared.models.message import MessageCreate, MessageRole, MessageType
@@ -10,32 +12,58 @@ from shared.models.conversation import ConversationCreate
 from shared.models.db_models import Message, Conversation
 
 
+class _FakeBind:
+    class dialect:
+        name = "postgresql"
+
+
+class _FakePostgresSession:
+    """记录按PostgreSQL方言编译的语句，不连接数据库"""
+    
+    def __init__(self):
+        self.statements = []
+        self.committed = False
+    
+    def get_bind(self):
+        return _FakeBind()
+    
+    async def scalar(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return Message(id=uuid4())
+    
+    async def commit(self):
+        self.committed = True
+    
+    async def rollback(self):
+        pass
+
+
 @pytest.mark.unit
 class TestMessageService:
     """消息服务测试类"""
     
-    def test_get_messages_empty(self, db_session: Session, test_user):
+    async def test_get_messages_empty(self, async_db_session, test_user):
         """测试获取空消息列表"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
-        messages, total = service.get_messages(conversation.id, test_user.id)
+        messages, total = await service.get_messages(conversation.id, test_user.id)
         
         assert messages == []
         assert total == 0
     
-    def test_get_messages_with_data(self, db_session: Session, test_user):
+    async def test_get_messages_with_data(self, async_db_session, test_user):
         """测试获取消息列表（有数据）"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         # 创建多条消息
         for i in range(5):
@@ -45,9 +73,9 @@ class TestMessageService:
                 content=f"消息内容{i+1}",
                 type=MessageType.TEXT
             )
-            service.create_message(conversation.id, test_user.id, message_data)
+            await service.create_message(conversation.id, test_user.id, message_data)
         
-        messages, total = service.get_messages(conversation.id, test_user.id)
+        messages, total = await service.get_messages(conversation.id, test_user.id)
         
         assert len(messages) == 5
         assert total == 5
@@ -55,14 +83,14 @@ class TestMessageService:
         assert messages[0].content == "消息内容5"
         assert messages[-1].content == "消息内容1"
     
-    def test_get_messages_pagination(self, db_session: Session, test_user):
+    async def test_get_messages_pagination(self, async_db_session, test_user):
         """测试消息列表分页"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         # 创建10条消息
         for i in range(10):
@@ -72,26 +100,106 @@ class TestMessageService:
                 content=f"消息{i+1}",
                 type=MessageType.TEXT
             )
-            service.create_message(conversation.id, test_user.id, message_data)
+            await service.create_message(conversation.id, test_user.id, message_data)
         
         # 第一页
-        messages, total = service.get_messages(conversation.id, test_user.id, page=1, page_size=5)
+        messages, total = await service.get_messages(conversation.id, test_user.id, page=1, page_size=5)
         assert len(messages) == 5
         assert total == 10
         
         # 第二页
-        messages, total = service.get_messages(conversation.id, test_user.id, page=2, page_size=5)
+        messages, total = await service.get_messages(conversation.id, test_user.id, page=2, page_size=5)
         assert len(messages) == 5
         assert total == 10
     
-    def test_get_messages_with_before_filter(self, db_session: Session, test_user):
+    async def test_get_messages_cursor_pagination(self, async_db_session, test_user, query_counter):
+        """测试游标分页：同一时间戳的消息按id排序，逐页不重不漏"""
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
+        
+        conv_data = ConversationCreate(title="测试对话")
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
+        
+        # 7条消息，其中4条创建时间相同
+        base = datetime(2026, 1, 1, 12, 0, 0)
+        for i in range(7):
+            async_db_session.add(Message(
+                conversation_id=conversation.id,
+                role="user",
+                content=f"消息{i+1}",
+                type="text",
+                created_at=base + timedelta(seconds=min(i, 3))
+            ))
+        await async_db_session.commit()
+        
+        seen = []
+        cursor = None
+        for _ in range(3):
+            messages, cursor, total = await service.get_messages_page(
+                conversation.id, test_user.id, limit=3, cursor=cursor
+            )
+            assert total is None
+            seen.extend(messages)
+        assert sum("(messages.created_at, messages.id) < (" in sql for sql in query_counter.selects) == 2
+        
+        assert cursor is None
+        assert len(seen) == 7
+        assert len({m.id for m in seen}) == 7
+        keys = [(m.created_at, m.id) for m in seen]
+        assert keys == sorted(keys, reverse=True)
+        
+        # 第一页的游标与OFFSET第二页结果一致
+        first, cursor, _ = await service.get_messages_page(conversation.id, test_user.id, limit=3)
+        by_cursor, _, _ = await service.get_messages_page(conversation.id, test_user.id, limit=3, cursor=cursor)
+        by_offset, _ = await service.get_messages(conversation.id, test_user.id, page=2, page_size=3)
+        assert [m.id for m in by_cursor] == [m.id for m in by_offset]
+    
+    async def test_get_messages_total_from_counter(self, async_db_session, test_user):
+        """测试总数默认读取对话的消息计数，要求精确值时才执行COUNT(*)"""
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
+        
+        conv_data = ConversationCreate(title="测试对话")
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
+        
+        # 绕过create_message直接插入，消息计数不会增加
+        for i in range(3):
+            async_db_session.add(Message(
+                conversation_id=conversation.id,
+                role="user",
+                content=f"消息{i+1}",
+                type="text"
+            ))
+        await async_db_session.commit()
+        
+        messages, total = await service.get_messages(conversation.id, test_user.id)
+        assert len(messages) == 3
+        assert total == 0
+        
+        messages, total = await service.get_messages(conversation.id, test_user.id, exact_total=True)
+        assert total == 3
+    
+    async def test_get_messages_without_total(self, async_db_session, test_user):
+        """测试OFFSET分页可以跳过总数统计"""
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
+        
+        conv_data = ConversationCreate(title="测试对话")
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
+        
+        messages, total = await service.get_messages(conversation.id, test_user.id, include_total=False)
+        
+        assert messages == []
+        assert total is None
+    
+    async def test_get_messages_with_before_filter(self, async_db_session, test_user):
         """测试使用before参数筛选消息"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         # 创建消息
         message_data1 = MessageCreate(
@@ -100,7 +208,7 @@ class TestMessageService:
             content="较早的消息",
             type=MessageType.TEXT
         )
-        msg1 = service.create_message(conversation.id, test_user.id, message_data1)
+        msg1 = await service.create_message(conversation.id, test_user.id, message_data1)
         
         # 等待一秒确保时间差
         import time
@@ -112,11 +220,11 @@ class TestMessageService:
             content="较新的消息",
             type=MessageType.TEXT
         )
-        msg2 = service.create_message(conversation.id, test_user.id, message_data2)
+        msg2 = await service.create_message(conversation.id, test_user.id, message_data2)
         
         # 使用msg2的创建时间作为before参数
         before_time = msg2.created_at
-        messages, total = service.get_messages(
+        messages, total = await service.get_messages(
             conversation.id, test_user.id, before=before_time
         )
         
@@ -125,20 +233,20 @@ class TestMessageService:
         assert len(messages) == 1
         assert messages[0].content == "较早的消息"
     
-    def test_get_messages_invalid_conversation(self, db_session: Session, test_user):
+    async def test_get_messages_invalid_conversation(self, async_db_session, test_user):
         """测试获取不存在对话的消息"""
-        service = MessageService(db_session)
+        service = MessageService(async_db_session)
         fake_conv_id = uuid4()
         
-        messages, total = service.get_messages(fake_conv_id, test_user.id)
+        messages, total = await service.get_messages(fake_conv_id, test_user.id)
         
         assert messages == []
         assert total == 0
     
-    def test_get_messages_wrong_user(self, db_session: Session, test_user):
+    async def test_get_messages_wrong_user(self, db_session: Session, async_db_session, test_user):
         """测试获取其他用户对话的消息（权限验证）"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建另一个用户
         from shared.models.user import UserCreate
@@ -153,23 +261,23 @@ class TestMessageService:
         
         # 为另一个用户创建对话
         conv_data = ConversationCreate(title="其他用户的对话")
-        conversation = conv_service.create_conversation(other_user.id, conv_data)
+        conversation = await conv_service.create_conversation(other_user.id, conv_data)
         
         # 尝试用test_user获取other_user的对话消息
-        messages, total = service.get_messages(conversation.id, test_user.id)
+        messages, total = await service.get_messages(conversation.id, test_user.id)
         
         # 应该返回空（权限验证失败）
         assert messages == []
         assert total == 0
     
-    def test_create_message_success(self, db_session: Session, test_user):
+    async def test_create_message_success(self, db_session: Session, async_db_session, test_user):
         """测试成功创建消息"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         message_data = MessageCreate(
             conversation_id=conversation.id,
@@ -179,7 +287,7 @@ class TestMessageService:
             metadata={"key": "value"}
         )
         
-        message = service.create_message(conversation.id, test_user.id, message_data)
+        message = await service.create_message(conversation.id, test_user.id, message_data)
         
         assert message is not None
         assert message.conversation_id == conversation.id
@@ -192,14 +300,14 @@ class TestMessageService:
         db_session.refresh(conversation)
         assert conversation.message_count == 1
     
-    def test_create_message_updates_conversation_count(self, db_session: Session, test_user):
+    async def test_create_message_updates_conversation_count(self, db_session: Session, async_db_session, test_user):
         """测试创建消息后更新对话消息计数"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         assert conversation.message_count == 0
         
         # 创建多条消息
@@ -210,15 +318,77 @@ class TestMessageService:
                 content=f"消息{i+1}",
                 type=MessageType.TEXT
             )
-            service.create_message(conversation.id, test_user.id, message_data)
+            await service.create_message(conversation.id, test_user.id, message_data)
         
         # 验证消息计数
         db_session.refresh(conversation)
         assert conversation.message_count == 3
     
-    def test_create_message_invalid_conversation(self, db_session: Session, test_user):
+    async def test_create_message_updates_preview(self, db_session: Session, async_db_session, test_user):
+        """测试创建消息时原子更新计数和预览文本，返回的消息无需refresh即可读取"""
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
+        
+        conv_data = ConversationCreate(title="测试对话")
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
+        
+        await service.create_message(conversation.id, test_user.id, MessageCreate(
+            conversation_id=conversation.id,
+            role=MessageRole.USER,
+            content="第一条",
+            type=MessageType.TEXT
+        ))
+        stale = datetime.utcnow() - timedelta(days=1)
+        db_session.execute(
+            update(Conversation).where(Conversation.id == conversation.id).values(updated_at=stale)
+        )
+        db_session.commit()
+        message = await service.create_message(conversation.id, test_user.id, MessageCreate(
+            conversation_id=conversation.id,
+            role=MessageRole.ASSISTANT,
+            content="第二条\n  回复" + "很长" * 100,
+            type=MessageType.TEXT
+        ))
+        
+        assert message.id is not None
+        assert message.created_at is not None
+        assert message.role == MessageRole.ASSISTANT.value
+        
+        db_session.refresh(conversation)
+        assert conversation.message_count == 2
+        assert conversation.preview_text.startswith("第二条 回复很长")
+        assert len(conversation.preview_text) == 100
+        assert conversation.updated_at > stale
+    
+    async def test_create_message_postgres_single_statement(self):
+        """测试PostgreSQL上更新对话和插入消息编译为一条 WITH ... INSERT ... RETURNING 语句"""
+        db = _FakePostgresSession()
+        service = MessageService(db)
+        
+        message = await service.create_message(uuid4(), uuid4(), MessageCreate(
+            conversation_id=uuid4(),
+            role=MessageRole.USER,
+            content="你好",
+            type=MessageType.TEXT
+        ))
+        
+        assert message is not None
+        assert db.committed
+        assert len(db.statements) == 1
+        sql = " ".join(db.statements[0].split())
+        assert sql.startswith("WITH conversation AS (UPDATE conversations SET")
+        assert "message_count=(conversations.message_count +" in sql
+        assert "preview_text=" in sql
+        assert "updated_at=" in sql
+        assert "RETURNING conversations.id)" in sql
+        assert sql.count("INSERT INTO messages") == 1
+        assert "SELECT conversation.id" in sql
+        assert sql.count("RETURNING") == 2
+        assert sql.rsplit("RETURNING", 1)[1].strip().startswith("messages.id")
+    
+    async def test_create_message_invalid_conversation(self, async_db_session, test_user):
         """测试在不存在对话中创建消息"""
-        service = MessageService(db_session)
+        service = MessageService(async_db_session)
         fake_conv_id = uuid4()
         
         message_data = MessageCreate(
@@ -228,14 +398,14 @@ class TestMessageService:
             type=MessageType.TEXT
         )
         
-        message = service.create_message(fake_conv_id, test_user.id, message_data)
+        message = await service.create_message(fake_conv_id, test_user.id, message_data)
         
         assert message is None
     
-    def test_create_message_wrong_user(self, db_session: Session, test_user):
+    async def test_create_message_wrong_user(self, db_session: Session, async_db_session, test_user):
         """测试在其他用户的对话中创建消息（权限验证）"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建另一个用户
         from shared.models.user import UserCreate
@@ -250,7 +420,7 @@ class TestMessageService:
         
         # 为另一个用户创建对话
         conv_data = ConversationCreate(title="其他用户的对话")
-        conversation = conv_service.create_conversation(other_user.id, conv_data)
+        conversation = await conv_service.create_conversation(other_user.id, conv_data)
         
         # 尝试用test_user在other_user的对话中创建消息
         message_data = MessageCreate(
@@ -259,19 +429,19 @@ class TestMessageService:
             content="测试消息",
             type=MessageType.TEXT
         )
-        message = service.create_message(conversation.id, test_user.id, message_data)
+        message = await service.create_message(conversation.id, test_user.id, message_data)
         
         # 应该返回None（权限验证失败）
         assert message is None
     
-    def test_get_message_success(self, db_session: Session, test_user):
+    async def test_get_message_success(self, async_db_session, test_user):
         """测试成功获取单条消息"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话和消息
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         message_data = MessageCreate(
             conversation_id=conversation.id,
@@ -279,40 +449,40 @@ class TestMessageService:
             content="测试消息",
             type=MessageType.TEXT
         )
-        created_message = service.create_message(conversation.id, test_user.id, message_data)
+        created_message = await service.create_message(conversation.id, test_user.id, message_data)
         
         # 获取消息
-        message = service.get_message(created_message.id, conversation.id, test_user.id)
+        message = await service.get_message(created_message.id, conversation.id, test_user.id)
         
         assert message is not None
         assert message.id == created_message.id
         assert message.content == "测试消息"
     
-    def test_get_message_not_found(self, db_session: Session, test_user):
+    async def test_get_message_not_found(self, async_db_session, test_user):
         """测试获取不存在的消息"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         fake_message_id = uuid4()
-        message = service.get_message(fake_message_id, conversation.id, test_user.id)
+        message = await service.get_message(fake_message_id, conversation.id, test_user.id)
         
         assert message is None
     
-    def test_get_message_wrong_conversation(self, db_session: Session, test_user):
+    async def test_get_message_wrong_conversation(self, async_db_session, test_user):
         """测试获取其他对话的消息"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建两个对话
         conv_data1 = ConversationCreate(title="对话1")
-        conversation1 = conv_service.create_conversation(test_user.id, conv_data1)
+        conversation1 = await conv_service.create_conversation(test_user.id, conv_data1)
         
         conv_data2 = ConversationCreate(title="对话2")
-        conversation2 = conv_service.create_conversation(test_user.id, conv_data2)
+        conversation2 = await conv_service.create_conversation(test_user.id, conv_data2)
         
         # 在对话1中创建消息
         message_data = MessageCreate(
@@ -321,21 +491,21 @@ class TestMessageService:
             content="对话1的消息",
             type=MessageType.TEXT
         )
-        message = service.create_message(conversation1.id, test_user.id, message_data)
+        message = await service.create_message(conversation1.id, test_user.id, message_data)
         
         # 尝试用对话2的ID获取消息
-        result = service.get_message(message.id, conversation2.id, test_user.id)
+        result = await service.get_message(message.id, conversation2.id, test_user.id)
         
         assert result is None
     
-    def test_delete_message_success(self, db_session: Session, test_user):
+    async def test_delete_message_success(self, db_session: Session, async_db_session, test_user):
         """测试成功删除消息"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话和消息
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         message_data = MessageCreate(
             conversation_id=conversation.id,
@@ -343,33 +513,33 @@ class TestMessageService:
             content="要删除的消息",
             type=MessageType.TEXT
         )
-        message = service.create_message(conversation.id, test_user.id, message_data)
+        message = await service.create_message(conversation.id, test_user.id, message_data)
         
         # 验证消息计数
         db_session.refresh(conversation)
         assert conversation.message_count == 1
         
         # 删除消息
-        result = service.delete_message(message.id, conversation.id, test_user.id)
+        result = await service.delete_message(message.id, conversation.id, test_user.id)
         
         assert result is True
         
         # 验证消息已删除
-        deleted_message = service.get_message(message.id, conversation.id, test_user.id)
+        deleted_message = await service.get_message(message.id, conversation.id, test_user.id)
         assert deleted_message is None
         
         # 验证消息计数已更新
         db_session.refresh(conversation)
         assert conversation.message_count == 0
     
-    def test_delete_message_updates_count(self, db_session: Session, test_user):
+    async def test_delete_message_updates_count(self, db_session: Session, async_db_session, test_user):
         """测试删除消息后更新对话消息计数"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话和消息
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         # 创建3条消息
         messages = []
@@ -380,37 +550,37 @@ class TestMessageService:
                 content=f"消息{i+1}",
                 type=MessageType.TEXT
             )
-            msg = service.create_message(conversation.id, test_user.id, message_data)
+            msg = await service.create_message(conversation.id, test_user.id, message_data)
             messages.append(msg)
         
         db_session.refresh(conversation)
         assert conversation.message_count == 3
         
         # 删除一条消息
-        service.delete_message(messages[0].id, conversation.id, test_user.id)
+        await service.delete_message(messages[0].id, conversation.id, test_user.id)
         
         # 验证消息计数
         db_session.refresh(conversation)
         assert conversation.message_count == 2
     
-    def test_delete_message_not_found(self, db_session: Session, test_user):
+    async def test_delete_message_not_found(self, async_db_session, test_user):
         """测试删除不存在的消息"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         fake_message_id = uuid4()
-        result = service.delete_message(fake_message_id, conversation.id, test_user.id)
+        result = await service.delete_message(fake_message_id, conversation.id, test_user.id)
         
         assert result is False
     
-    def test_delete_message_wrong_user(self, db_session: Session, test_user):
+    async def test_delete_message_wrong_user(self, db_session: Session, async_db_session, test_user):
         """测试删除其他用户的消息（权限验证）"""
-        service = MessageService(db_session)
-        conv_service = ConversationService(db_session)
+        service = MessageService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建另一个用户
         from shared.models.user import UserCreate
@@ -425,7 +595,7 @@ class TestMessageService:
         
         # 为另一个用户创建对话和消息
         conv_data = ConversationCreate(title="其他用户的对话")
-        conversation = conv_service.create_conversation(other_user.id, conv_data)
+        conversation = await conv_service.create_conversation(other_user.id, conv_data)
         
         message_data = MessageCreate(
             conversation_id=conversation.id,
@@ -433,14 +603,14 @@ class TestMessageService:
             content="其他用户的消息",
             type=MessageType.TEXT
         )
-        message = service.create_message(conversation.id, other_user.id, message_data)
+        message = await service.create_message(conversation.id, other_user.id, message_data)
         
         # 尝试用test_user删除other_user的消息
-        result = service.delete_message(message.id, conversation.id, test_user.id)
+        result = await service.delete_message(message.id, conversation.id, test_user.id)
         
         # 应该返回False（权限验证失败）
         assert result is False
         
         # 验证消息仍然存在
-        existing_message = service.get_message(message.id, conversation.id, other_user.id)
+        existing_message = await service.get_message(message.id, conversation.id, other_user.id)
         assert existing_message is not None
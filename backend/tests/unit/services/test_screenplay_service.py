@@ -14,17 +14,17 @@ from unittest.mock import AsyncMock, MagicMock, patch
 class TestScreenplayService:
     """剧本服务测试类"""
     
-    def test_get_screenplay_success(self, db_session: Session, test_user):
+    async def test_get_screenplay_success(self, db_session: Session, async_db_session, test_user):
         """测试成功获取剧本详情"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         
         # 创建任务
-        task_service = TaskService(db_session)
+        task_service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试提示词"}
         )
-        task = task_service.create_task(test_user.id, task_data)
+        task = await task_service.create_task(test_user.id, task_data)
         
         # 创建剧本（手动创建，因为create_draft需要mock GLM客户端）
         screenplay = Screenplay(
@@ -37,7 +37,7 @@ class TestScreenplayService:
         db_session.commit()
         db_session.refresh(screenplay)
         
-        result = service.get_screenplay(screenplay.id, test_user.id)
+        result = await service.get_screenplay(screenplay.id, test_user.id)
         
         assert result is not None
         assert result.id == screenplay.id
@@ -45,18 +45,18 @@ class TestScreenplayService:
         assert result.user_id == test_user.id
         assert result.status == ScreenplayStatus.DRAFT.value
     
-    def test_get_screenplay_not_found(self, db_session: Session, test_user):
+    async def test_get_screenplay_not_found(self, async_db_session, test_user):
         """测试获取不存在的剧本"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         non_existent_id = uuid4()
         
-        screenplay = service.get_screenplay(non_existent_id, test_user.id)
+        screenplay = await service.get_screenplay(non_existent_id, test_user.id)
         
         assert screenplay is None
     
-    def test_get_screenplay_wrong_user(self, db_session: Session, test_user):
+    async def test_get_screenplay_wrong_user(self, db_session: Session, async_db_session, test_user):
         """测试获取其他用户的剧本"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         
         # 创建另一个用户
         from shared.models.user import UserCreate
@@ -69,12 +69,12 @@ class TestScreenplayService:
         ))
         
         # 创建任务
-        task_service = TaskService(db_session)
+        task_service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试提示词"}
         )
-        task = task_service.create_task(other_user.id, task_data)
+        task = await task_service.create_task(other_user.id, task_data)
         
         # 为另一个用户创建剧本
         screenplay = Screenplay(
@@ -88,22 +88,22 @@ class TestScreenplayService:
         db_session.refresh(screenplay)
         
         # 尝试用test_user获取
-        result = service.get_screenplay(screenplay.id, test_user.id)
+        result = await service.get_screenplay(screenplay.id, test_user.id)
         
         assert result is None
     
     @pytest.mark.asyncio
-    async def test_create_draft_success(self, db_session: Session, test_user):
+    async def test_create_draft_success(self, async_db_session, test_user):
         """测试成功创建剧本草稿"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         
         # 创建任务
-        task_service = TaskService(db_session)
+        task_service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试提示词"}
         )
-        task = task_service.create_task(test_user.id, task_data)
+        task = await task_service.create_task(test_user.id, task_data)
         
         # Mock GLM客户端
         mock_screenplay_data = {
@@ -143,14 +143,14 @@ class TestScreenplayService:
             assert screenplay.task_id == task.id
             
             # 验证任务状态已更新
-            updated_task = task_service.get_task(task.id, test_user.id)
+            updated_task = await task_service.get_task(task.id, test_user.id)
             assert updated_task.status == TaskStatus.COMPLETED.value
             assert updated_task.progress == 100
     
     @pytest.mark.asyncio
-    async def test_create_draft_task_not_found(self, db_session: Session, test_user):
+    async def test_create_draft_task_not_found(self, async_db_session, test_user):
         """测试创建剧本草稿时任务不存在"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         non_existent_task_id = uuid4()
         
         with pytest.raises(ValueError, match="任务不存在"):
@@ -160,17 +160,17 @@ class TestScreenplayService:
                 prompt="测试提示词"
             )
     
-    def test_confirm_screenplay_success(self, db_session: Session, test_user):
+    async def test_confirm_screenplay_success(self, db_session: Session, async_db_session, test_user, query_counter):
         """测试成功确认剧本"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         
         # 创建任务
-        task_service = TaskService(db_session)
+        task_service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试提示词"}
         )
-        task = task_service.create_task(test_user.id, task_data)
+        task = await task_service.create_task(test_user.id, task_data)
         
         # 创建草稿状态的剧本
         screenplay = Screenplay(
@@ -183,36 +183,41 @@ class TestScreenplayService:
         db_session.commit()
         db_session.refresh(screenplay)
         
-        confirmed = service.confirm_screenplay(screenplay.id, test_user.id)
+        query_counter.reset()
+        confirmed = await service.confirm_screenplay(screenplay.id, test_user.id)
         
         assert confirmed is not None
         assert confirmed.status == ScreenplayStatus.GENERATING.value
         assert confirmed.id == screenplay.id
+        # 写入后不再SELECT：剧本UPDATE之后只有任务的UPDATE ... RETURNING
+        writes = [s.lstrip().split()[0].upper() for s in query_counter.statements]
+        assert writes[-2:] == ["UPDATE", "UPDATE"]
+        assert "SELECT" not in writes[writes.index("UPDATE"):]
         
         # 验证任务状态已更新
-        updated_task = task_service.get_task(task.id, test_user.id)
+        updated_task = await task_service.get_task(task.id, test_user.id)
         assert updated_task.status == TaskStatus.PROCESSING.value
     
-    def test_confirm_screenplay_not_found(self, db_session: Session, test_user):
+    async def test_confirm_screenplay_not_found(self, async_db_session, test_user):
         """测试确认不存在的剧本"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         non_existent_id = uuid4()
         
-        confirmed = service.confirm_screenplay(non_existent_id, test_user.id)
+        confirmed = await service.confirm_screenplay(non_existent_id, test_user.id)
         
         assert confirmed is None
     
-    def test_confirm_screenplay_wrong_status(self, db_session: Session, test_user):
+    async def test_confirm_screenplay_wrong_status(self, db_session: Session, async_db_session, test_user):
         """测试确认非草稿状态的剧本"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         
         # 创建任务
-        task_service = TaskService(db_session)
+        task_service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试提示词"}
         )
-        task = task_service.create_task(test_user.id, task_data)
+        task = await task_service.create_task(test_user.id, task_data)
         
         # 创建非草稿状态的剧本
         screenplay = Screenplay(
@@ -226,19 +231,19 @@ class TestScreenplayService:
         db_session.refresh(screenplay)
         
         with pytest.raises(ValueError, match="只能确认草稿状态的剧本"):
-            service.confirm_screenplay(screenplay.id, test_user.id)
+            await service.confirm_screenplay(screenplay.id, test_user.id)
     
-    def test_update_screenplay_title(self, db_session: Session, test_user):
+    async def test_update_screenplay_title(self, db_session: Session, async_db_session, test_user):
         """测试更新剧本标题"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         
         # 创建任务
-        task_service = TaskService(db_session)
+        task_service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试提示词"}
         )
-        task = task_service.create_task(test_user.id, task_data)
+        task = await task_service.create_task(test_user.id, task_data)
         
         # 创建剧本
         screenplay = Screenplay(
@@ -251,24 +256,24 @@ class TestScreenplayService:
         db_session.commit()
         db_session.refresh(screenplay)
         
-        updated = service.update_screenplay(screenplay.id, test_user.id, title="新标题")
+        updated = await service.update_screenplay(screenplay.id, test_user.id, title="新标题")
         
         assert updated is not None
         assert updated.title == "新标题"
         assert updated.id == screenplay.id
     
-    def test_update_screenplay_not_found(self, db_session: Session, test_user):
+    async def test_update_screenplay_not_found(self, async_db_session, test_user):
         """测试更新不存在的剧本"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         non_existent_id = uuid4()
         
-        updated = service.update_screenplay(non_existent_id, test_user.id, title="新标题")
+        updated = await service.update_screenplay(non_existent_id, test_user.id, title="新标题")
         
         assert updated is None
     
-    def test_update_screenplay_wrong_user(self, db_session: Session, test_user):
+    async def test_update_screenplay_wrong_user(self, db_session: Session, async_db_session, test_user):
         """测试更新其他用户的剧本"""
-        service = ScreenplayService(db_session)
+        service = ScreenplayService(async_db_session)
         
         # 创建另一个用户
         from shared.models.user import UserCreate
@@ -281,12 +286,12 @@ class TestScreenplayService:
         ))
         
         # 创建任务
-        task_service = TaskService(db_session)
+        task_service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试提示词"}
         )
-        task = task_service.create_task(other_user.id, task_data)
+        task = await task_service.create_task(other_user.id, task_data)
         
         # 为另一个用户创建剧本
         screenplay = Screenplay(
@@ -300,6 +305,6 @@ class TestScreenplayService:
         db_session.refresh(screenplay)
         
         # 尝试用test_user更新
-        updated = service.update_screenplay(screenplay.id, test_user.id, title="新标题")
+        updated = await service.update_screenplay(screenplay.id, test_user.id, title="新标题")
         
         assert updated is None
@@ -13,15 +13,15 @@ from shared.models.conversation import ConversationCreate
 class TestTaskService:
     """任务服务测试类"""
     
-    def test_create_task_success(self, db_session: Session, test_user):
+    async def test_create_task_success(self, async_db_session, test_user):
         """测试成功创建任务"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试提示词"}
         )
         
-        task = service.create_task(test_user.id, task_data)
+        task = await service.create_task(test_user.id, task_data)
         
         assert task is not None
         assert task.user_id == test_user.id
@@ -30,14 +30,14 @@ class TestTaskService:
         assert task.progress == 0
         assert task.params == {"prompt": "测试提示词"}
     
-    def test_create_task_with_conversation(self, db_session: Session, test_user):
+    async def test_create_task_with_conversation(self, async_db_session, test_user):
         """测试创建带对话ID的任务"""
-        service = TaskService(db_session)
-        conv_service = ConversationService(db_session)
+        service = TaskService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         task_data = TaskCreate(
             type=TaskType.IMAGE,
@@ -45,22 +45,22 @@ class TestTaskService:
             params={"prompt": "生成图片"}
         )
         
-        task = service.create_task(test_user.id, task_data)
+        task = await service.create_task(test_user.id, task_data)
         
         assert task is not None
         assert task.conversation_id == conversation.id
     
-    def test_get_tasks_empty(self, db_session: Session, test_user):
+    async def test_get_tasks_empty(self, async_db_session, test_user):
         """测试获取空任务列表"""
-        service = TaskService(db_session)
-        tasks, total = service.get_tasks(test_user.id)
+        service = TaskService(async_db_session)
+        tasks, total = await service.get_tasks(test_user.id)
         
         assert tasks == []
         assert total == 0
     
-    def test_get_tasks_with_data(self, db_session: Session, test_user):
+    async def test_get_tasks_with_data(self, async_db_session, test_user):
         """测试获取任务列表（有数据）"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         
         # 创建多个任务
         for i in range(5):
@@ -68,17 +68,17 @@ class TestTaskService:
                 type=TaskType.IMAGE,
                 params={"prompt": f"任务{i+1}"}
             )
-            service.create_task(test_user.id, task_data)
+            await service.create_task(test_user.id, task_data)
         
-        tasks, total = service.get_tasks(test_user.id)
+        tasks, total = await service.get_tasks(test_user.id)
         
         assert len(tasks) == 5
         assert total == 5
         assert all(t.user_id == test_user.id for t in tasks)
     
-    def test_get_tasks_pagination(self, db_session: Session, test_user):
+    async def test_get_tasks_pagination(self, async_db_session, test_user):
         """测试任务列表分页"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         
         # 创建10个任务
         for i in range(10):
@@ -86,46 +86,98 @@ class TestTaskService:
                 type=TaskType.VIDEO,
                 params={"prompt": f"任务{i+1}"}
             )
-            service.create_task(test_user.id, task_data)
+            await service.create_task(test_user.id, task_data)
         
         # 第一页
-        tasks, total = service.get_tasks(test_user.id, page=1, page_size=5)
+        tasks, total = await service.get_tasks(test_user.id, page=1, page_size=5)
         assert len(tasks) == 5
         assert total == 10
         
         # 第二页
-        tasks, total = service.get_tasks(test_user.id, page=2, page_size=5)
+        tasks, total = await service.get_tasks(test_user.id, page=2, page_size=5)
         assert len(tasks) == 5
         assert total == 10
     
-    def test_get_task_success(self, db_session: Session, test_user):
+    async def test_get_tasks_cursor_pagination(self, async_db_session, test_user, query_counter):
+        """测试任务列表游标分页（游标条件为行值比较）"""
+        service = TaskService(async_db_session)
+        
+        for i in range(5):
+            task_data = TaskCreate(type=TaskType.SCREENPLAY, params={"index": i})
+            await service.create_task(test_user.id, task_data)
+        
+        tasks, cursor, total = await service.get_tasks_page(test_user.id, limit=2, include_total=True)
+        assert len(tasks) == 2
+        assert total == 5
+        assert cursor is not None
+        
+        seen = list(tasks)
+        query_counter.reset()
+        while cursor:
+            tasks, cursor, total = await service.get_tasks_page(test_user.id, limit=2, cursor=cursor)
+            assert total is None
+            seen.extend(tasks)
+        assert all("(tasks.created_at, tasks.id) < (" in sql for sql in query_counter.selects)
+        
+        assert len({t.id for t in seen}) == 5
+        keys = [(t.created_at, t.id) for t in seen]
+        assert keys == sorted(keys, reverse=True)
+    
+    async def test_get_tasks_invalid_cursor(self, async_db_session, test_user):
+        """测试无效游标返回参数错误"""
+        from shared.utils.exceptions import ValidationError
+        service = TaskService(async_db_session)
+        
+        with pytest.raises(ValidationError):
+            await service.get_tasks_page(test_user.id, cursor="not-a-cursor")
+    
+    async def test_writes_without_refresh(self, async_db_session, test_user, query_counter):
+        """测试创建和更新任务各只有一条语句，提交后不再SELECT"""
+        service = TaskService(async_db_session)
+        
+        query_counter.reset()
+        task = await service.create_task(test_user.id, TaskCreate(type=TaskType.SCREENPLAY, params={}))
+        assert len(query_counter) == 1
+        assert query_counter.selects == []
+        assert task.status == TaskStatus.PENDING.value
+        assert task.created_at is not None
+        
+        query_counter.reset()
+        updated = await service.update_task_status(task.id, TaskStatus.COMPLETED, progress=100)
+        assert len(query_counter) == 1
+        assert query_counter.statements[0].lstrip().upper().startswith("UPDATE")
+        assert updated.status == TaskStatus.COMPLETED.value
+        assert updated.progress == 100
+        assert updated.completed_at is not None
+    
+    async def test_get_task_success(self, async_db_session, test_user):
         """测试成功获取任务详情"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试任务"}
         )
-        created = service.create_task(test_user.id, task_data)
+        created = await service.create_task(test_user.id, task_data)
         
-        task = service.get_task(created.id, test_user.id)
+        task = await service.get_task(created.id, test_user.id)
         
         assert task is not None
         assert task.id == created.id
         assert task.type == TaskType.SCREENPLAY.value
         assert task.user_id == test_user.id
     
-    def test_get_task_not_found(self, db_session: Session, test_user):
+    async def test_get_task_not_found(self, async_db_session, test_user):
         """测试获取不存在的任务"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         non_existent_id = uuid4()
         
-        task = service.get_task(non_existent_id, test_user.id)
+        task = await service.get_task(non_existent_id, test_user.id)
         
         assert task is None
     
-    def test_get_task_wrong_user(self, db_session: Session, test_user):
+    async def test_get_task_wrong_user(self, db_session: Session, async_db_session, test_user):
         """测试获取其他用户的任务"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         
         # 创建另一个用户
         from shared.models.user import UserCreate
@@ -142,23 +194,23 @@ class TestTaskService:
             type=TaskType.IMAGE,
             params={"prompt": "其他用户的任务"}
         )
-        other_task = service.create_task(other_user.id, task_data)
+        other_task = await service.create_task(other_user.id, task_data)
         
         # 尝试用test_user获取
-        task = service.get_task(other_task.id, test_user.id)
+        task = await service.get_task(other_task.id, test_user.id)
         
         assert task is None
     
-    def test_update_task_status_to_processing(self, db_session: Session, test_user):
+    async def test_update_task_status_to_processing(self, async_db_session, test_user):
         """测试更新任务状态为处理中"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.IMAGE,
             params={"prompt": "测试任务"}
         )
-        task = service.create_task(test_user.id, task_data)
+        task = await service.create_task(test_user.id, task_data)
         
-        updated = service.update_task_status(
+        updated = await service.update_task_status(
             task.id,
             TaskStatus.PROCESSING,
             progress=50
@@ -169,17 +221,17 @@ class TestTaskService:
         assert updated.progress == 50
         assert updated.completed_at is None
     
-    def test_update_task_status_to_completed(self, db_session: Session, test_user):
+    async def test_update_task_status_to_completed(self, async_db_session, test_user):
         """测试更新任务状态为已完成"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.VIDEO,
             params={"prompt": "测试任务"}
         )
-        task = service.create_task(test_user.id, task_data)
+        task = await service.create_task(test_user.id, task_data)
         
         result = {"url": "https://example.com/video.mp4"}
-        updated = service.update_task_status(
+        updated = await service.update_task_status(
             task.id,
             TaskStatus.COMPLETED,
             progress=100,
@@ -192,17 +244,17 @@ class TestTaskService:
         assert updated.result == result
         assert updated.completed_at is not None
     
-    def test_update_task_status_to_failed(self, db_session: Session, test_user):
+    async def test_update_task_status_to_failed(self, async_db_session, test_user):
         """测试更新任务状态为失败"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.IMAGE,
             params={"prompt": "测试任务"}
         )
-        task = service.create_task(test_user.id, task_data)
+        task = await service.create_task(test_user.id, task_data)
         
         error_message = "生成失败：网络错误"
-        updated = service.update_task_status(
+        updated = await service.update_task_status(
             task.id,
             TaskStatus.FAILED,
             error_message=error_message
@@ -213,54 +265,54 @@ class TestTaskService:
         assert updated.error_message == error_message
         assert updated.completed_at is not None
     
-    def test_update_task_status_not_found(self, db_session: Session, test_user):
+    async def test_update_task_status_not_found(self, async_db_session, test_user):
         """测试更新不存在的任务状态"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         non_existent_id = uuid4()
         
-        updated = service.update_task_status(
+        updated = await service.update_task_status(
             non_existent_id,
             TaskStatus.PROCESSING
         )
         
         assert updated is None
     
-    def test_get_task_progress_success(self, db_session: Session, test_user):
+    async def test_get_task_progress_success(self, async_db_session, test_user):
         """测试成功获取任务进度"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         task_data = TaskCreate(
             type=TaskType.SCREENPLAY,
             params={"prompt": "测试任务"}
         )
-        task = service.create_task(test_user.id, task_data)
+        task = await service.create_task(test_user.id, task_data)
         
         # 更新任务状态
-        service.update_task_status(
+        await service.update_task_status(
             task.id,
             TaskStatus.PROCESSING,
             progress=75,
             result={"step": "生成中"}
         )
         
-        progress = service.get_task_progress(task.id, test_user.id)
+        progress = await service.get_task_progress(task.id, test_user.id)
         
         assert progress is not None
         assert progress["status"] == TaskStatus.PROCESSING.value
         assert progress["progress"] == 75
         assert progress["result"] == {"step": "生成中"}
     
-    def test_get_task_progress_not_found(self, db_session: Session, test_user):
+    async def test_get_task_progress_not_found(self, async_db_session, test_user):
         """测试获取不存在任务的进度"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         non_existent_id = uuid4()
         
-        progress = service.get_task_progress(non_existent_id, test_user.id)
+        progress = await service.get_task_progress(non_existent_id, test_user.id)
         
         assert progress is None
     
-    def test_get_task_progress_wrong_user(self, db_session: Session, test_user):
+    async def test_get_task_progress_wrong_user(self, db_session: Session, async_db_session, test_user):
         """测试获取其他用户任务的进度"""
-        service = TaskService(db_session)
+        service = TaskService(async_db_session)
         
         # 创建另一个用户
         from shared.models.user import UserCreate
@@ -277,9 +329,38 @@ class TestTaskService:
             type=TaskType.IMAGE,
             params={"prompt": "其他用户的任务"}
         )
-        other_task = service.create_task(other_user.id, task_data)
+        other_task = await service.create_task(other_user.id, task_data)
         
         # 尝试用test_user获取进度
-        progress = service.get_task_progress(other_task.id, test_user.id)
+        progress = await service.get_task_progress(other_task.id, test_user.id)
         
         assert progress is None
+    
+    async def test_get_task_timeline(self, db_session: Session, async_db_session, test_user):
+        """测试按时间顺序返回任务阶段耗时并按阶段汇总"""
+        from datetime import datetime, timedelta
+        from shared.models.db_models import TaskLog
+        
+        service = TaskService(async_db_session)
+        task = await service.create_task(test_user.id, TaskCreate(
+            type=TaskType.IMAGE,
+            params={"prompt": "测试任务"}
+        ))
+        start = datetime.utcnow()
+        for offset, stage, duration in [(1, "key_lookup", 3.0), (0, "queue_wait", 120.0), (2, "provider_request", 900.5)]:
+            db_session.add(TaskLog(
+                task_id=task.id,
+                level="info",
+                message=stage,
+                details={"stage": stage, "duration_ms": duration, "provider": "gemini"},
+                created_at=start + timedelta(seconds=offset)
+            ))
+        db_session.commit()
+        
+        timeline = await service.get_task_timeline(task.id, test_user.id)
+        
+        assert [event["stage"] for event in timeline["events"]] == ["queue_wait", "key_lookup", "provider_request"]
+        assert timeline["events"][2]["durationMs"] == 900.5
+        assert timeline["events"][2]["details"] == {"provider": "gemini"}
+        assert timeline["totals"]["provider_request"] == 900.5
+        assert await service.get_task_timeline(uuid4(), test_user.id) is None
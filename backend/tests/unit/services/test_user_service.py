@@ -15,32 +15,32 @@ from datetime import datetime, timedelta
 class TestUserService:
     """用户数据服务测试类"""
     
-    def test_get_user_success(self, db_session: Session, test_user):
+    async def test_get_user_success(self, async_db_session, test_user):
         """测试成功获取用户信息"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         
-        user = service.get_user(test_user.id)
+        user = await service.get_user(test_user.id)
         
         assert user is not None
         assert user.id == test_user.id
         assert user.username == test_user.username
         assert user.email == test_user.email
     
-    def test_get_user_not_found(self, db_session: Session):
+    async def test_get_user_not_found(self, async_db_session):
         """测试获取不存在的用户"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         fake_user_id = uuid4()
         
-        user = service.get_user(fake_user_id)
+        user = await service.get_user(fake_user_id)
         
         assert user is None
     
-    def test_update_user_username(self, db_session: Session, test_user):
+    async def test_update_user_username(self, db_session: Session, async_db_session, test_user):
         """测试更新用户名"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         
         new_username = "newusername"
-        updated_user = service.update_user(test_user.id, username=new_username)
+        updated_user = await service.update_user(test_user.id, username=new_username)
         
         assert updated_user is not None
         assert updated_user.username == new_username
@@ -50,12 +50,12 @@ class TestUserService:
         db_session.refresh(updated_user)
         assert updated_user.username == new_username
     
-    def test_update_user_avatar_url(self, db_session: Session, test_user):
+    async def test_update_user_avatar_url(self, db_session: Session, async_db_session, test_user):
         """测试更新头像URL"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         
         new_avatar_url = "https://example.com/avatar.jpg"
-        updated_user = service.update_user(test_user.id, avatar_url=new_avatar_url)
+        updated_user = await service.update_user(test_user.id, avatar_url=new_avatar_url)
         
         assert updated_user is not None
         assert updated_user.avatar_url == new_avatar_url
@@ -65,13 +65,13 @@ class TestUserService:
         db_session.refresh(updated_user)
         assert updated_user.avatar_url == new_avatar_url
     
-    def test_update_user_both_fields(self, db_session: Session, test_user):
+    async def test_update_user_both_fields(self, db_session: Session, async_db_session, test_user):
         """测试同时更新用户名和头像"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         
         new_username = "newusername"
         new_avatar_url = "https://example.com/new-avatar.jpg"
-        updated_user = service.update_user(
+        updated_user = await service.update_user(
             test_user.id,
             username=new_username,
             avatar_url=new_avatar_url
@@ -86,33 +86,45 @@ class TestUserService:
         assert updated_user.username == new_username
         assert updated_user.avatar_url == new_avatar_url
     
-    def test_update_user_no_changes(self, db_session: Session, test_user):
+    async def test_update_user_single_statement(self, async_db_session, test_user, query_counter):
+        """测试更新用户只有一条UPDATE ... RETURNING"""
+        service = UserService(async_db_session)
+        
+        query_counter.reset()
+        updated_user = await service.update_user(test_user.id, username="returning")
+        
+        assert len(query_counter) == 1
+        assert query_counter.selects == []
+        assert updated_user.username == "returning"
+        assert updated_user.email == test_user.email
+    
+    async def test_update_user_no_changes(self, async_db_session, test_user):
         """测试不提供任何更新字段"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         
         original_username = test_user.username
         original_avatar_url = test_user.avatar_url
         
-        updated_user = service.update_user(test_user.id)
+        updated_user = await service.update_user(test_user.id)
         
         assert updated_user is not None
         assert updated_user.username == original_username
         assert updated_user.avatar_url == original_avatar_url
     
-    def test_update_user_not_found(self, db_session: Session):
+    async def test_update_user_not_found(self, async_db_session):
         """测试更新不存在的用户"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         fake_user_id = uuid4()
         
-        updated_user = service.update_user(fake_user_id, username="newusername")
+        updated_user = await service.update_user(fake_user_id, username="newusername")
         
         assert updated_user is None
     
-    def test_get_user_stats_empty(self, db_session: Session, test_user):
+    async def test_get_user_stats_empty(self, async_db_session, test_user):
         """测试获取空用户统计数据"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         
-        stats = service.get_user_stats(test_user.id)
+        stats = await service.get_user_stats(test_user.id)
         
         assert stats is not None
         assert stats["conversation_count"] == 0
@@ -122,32 +134,32 @@ class TestUserService:
         assert stats["recent_activity"] == 0
         assert stats["created_at"] is not None
     
-    def test_get_user_stats_with_conversations(self, db_session: Session, test_user):
+    async def test_get_user_stats_with_conversations(self, async_db_session, test_user):
         """测试获取有对话的用户统计数据"""
-        service = UserService(db_session)
-        conv_service = ConversationService(db_session)
+        service = UserService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建多个对话
         for i in range(5):
             conv_data = ConversationCreate(title=f"对话{i+1}")
-            conv_service.create_conversation(test_user.id, conv_data)
+            await conv_service.create_conversation(test_user.id, conv_data)
         
-        stats = service.get_user_stats(test_user.id)
+        stats = await service.get_user_stats(test_user.id)
         
         assert stats is not None
         assert stats["conversation_count"] == 5
     
-    def test_get_user_stats_with_messages(self, db_session: Session, test_user):
+    async def test_get_user_stats_with_messages(self, async_db_session, test_user):
         """测试获取有消息的用户统计数据"""
-        service = UserService(db_session)
-        conv_service = ConversationService(db_session)
+        service = UserService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         from services.agent_service.src.services.message_service import MessageService
         from shared.models.message import MessageCreate, MessageRole, MessageType
-        message_service = MessageService(db_session)
+        message_service = MessageService(async_db_session)
         
         # 创建对话和消息
         conv_data = ConversationCreate(title="测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         # 创建多条消息
         for i in range(10):
@@ -157,16 +169,16 @@ class TestUserService:
                 content=f"消息{i+1}",
                 type=MessageType.TEXT
             )
-            message_service.create_message(conversation.id, test_user.id, message_data)
+            await message_service.create_message(conversation.id, test_user.id, message_data)
         
-        stats = service.get_user_stats(test_user.id)
+        stats = await service.get_user_stats(test_user.id)
         
         assert stats is not None
         assert stats["message_count"] == 10
     
-    def test_get_user_stats_with_tasks(self, db_session: Session, test_user):
+    async def test_get_user_stats_with_tasks(self, db_session: Session, async_db_session, test_user):
         """测试获取有任务的用户统计数据"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         
         # 创建多个任务
         for i in range(8):
@@ -181,45 +193,45 @@ class TestUserService:
             db_session.add(task)
         db_session.commit()
         
-        stats = service.get_user_stats(test_user.id)
+        stats = await service.get_user_stats(test_user.id)
         
         assert stats is not None
         assert stats["task_count"] == 8
         assert stats["completed_task_count"] == 4  # 一半任务完成
     
-    def test_get_user_stats_recent_activity(self, db_session: Session, test_user):
+    async def test_get_user_stats_recent_activity(self, db_session: Session, async_db_session, test_user):
         """测试获取最近活跃度统计"""
-        service = UserService(db_session)
-        conv_service = ConversationService(db_session)
+        service = UserService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建最近访问的对话（7天内）
         conv_data = ConversationCreate(title="最近对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         conversation.last_accessed_at = datetime.utcnow() - timedelta(days=3)
         db_session.commit()
         
         # 创建较旧的对话（超过7天）
         old_conv_data = ConversationCreate(title="旧对话")
-        old_conversation = conv_service.create_conversation(test_user.id, old_conv_data)
+        old_conversation = await conv_service.create_conversation(test_user.id, old_conv_data)
         old_conversation.last_accessed_at = datetime.utcnow() - timedelta(days=10)
         db_session.commit()
         
-        stats = service.get_user_stats(test_user.id)
+        stats = await service.get_user_stats(test_user.id)
         
         assert stats is not None
         assert stats["recent_activity"] >= 1  # 至少有一个最近访问的对话
     
-    def test_get_user_stats_comprehensive(self, db_session: Session, test_user):
+    async def test_get_user_stats_comprehensive(self, db_session: Session, async_db_session, test_user):
         """测试获取综合用户统计数据"""
-        service = UserService(db_session)
-        conv_service = ConversationService(db_session)
+        service = UserService(async_db_session)
+        conv_service = ConversationService(async_db_session)
         from services.agent_service.src.services.message_service import MessageService
         from shared.models.message import MessageCreate, MessageRole, MessageType
-        message_service = MessageService(db_session)
+        message_service = MessageService(async_db_session)
         
         # 创建对话
         conv_data = ConversationCreate(title="综合测试对话")
-        conversation = conv_service.create_conversation(test_user.id, conv_data)
+        conversation = await conv_service.create_conversation(test_user.id, conv_data)
         
         # 创建消息
         for i in range(5):
@@ -229,7 +241,7 @@ class TestUserService:
                 content=f"消息{i+1}",
                 type=MessageType.TEXT
             )
-            message_service.create_message(conversation.id, test_user.id, message_data)
+            await message_service.create_message(conversation.id, test_user.id, message_data)
         
         # 创建任务
         for i in range(3):
@@ -244,7 +256,7 @@ class TestUserService:
             db_session.add(task)
         db_session.commit()
         
-        stats = service.get_user_stats(test_user.id)
+        stats = await service.get_user_stats(test_user.id)
         
         assert stats is not None
         assert stats["conversation_count"] >= 1
@@ -253,21 +265,21 @@ class TestUserService:
         assert stats["completed_task_count"] >= 1
         assert stats["created_at"] is not None
     
-    def test_get_user_stats_not_found(self, db_session: Session):
+    async def test_get_user_stats_not_found(self, async_db_session):
         """测试获取不存在用户的统计数据"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         fake_user_id = uuid4()
         
-        stats = service.get_user_stats(fake_user_id)
+        stats = await service.get_user_stats(fake_user_id)
         
         # 应该返回空字典
         assert stats == {}
     
-    def test_get_user_stats_multiple_users(self, db_session: Session, test_user):
+    async def test_get_user_stats_multiple_users(self, db_session: Session, async_db_session, test_user):
         """测试多个用户的统计数据隔离"""
-        service = UserService(db_session)
+        service = UserService(async_db_session)
         auth_service = AuthService(db_session)
-        conv_service = ConversationService(db_session)
+        conv_service = ConversationService(async_db_session)
         
         # 创建另一个用户
         other_user_data = UserCreate(
@@ -278,18 +290,18 @@ class TestUserService:
         other_user = auth_service.create_user(other_user_data)
         
         # 为两个用户创建对话
-        conv1 = conv_service.create_conversation(
+        conv1 = await conv_service.create_conversation(
             test_user.id,
             ConversationCreate(title="用户1的对话")
         )
-        conv2 = conv_service.create_conversation(
+        conv2 = await conv_service.create_conversation(
             other_user.id,
             ConversationCreate(title="用户2的对话")
         )
         
         # 获取各自的统计数据
-        stats1 = service.get_user_stats(test_user.id)
-        stats2 = service.get_user_stats(other_user.id)
+        stats1 = await service.get_user_stats(test_user.id)
+        stats2 = await service.get_user_stats(other_user.id)
         
         # 验证数据隔离
         assert stats1["conversation_count"] == 1
@@ -0,0 +1 @@
+"""共享模块单元测试"""
@@ -0,0 +1,20 @@
+"""共享模块测试fixtures"""
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def fake_redis():
+    """内存版Redis客户端（二进制，与缓存使用的客户端一致）"""
+    client = fakeredis.FakeRedis(decode_responses=False)
+    yield client
+    client.flushall()
+
+
+@pytest.fixture
+def text_redis():
+    """内存版Redis客户端（文本响应，与指标使用的客户端一致）"""
+    client = fakeredis.FakeRedis(decode_responses=True)
+    yield client
+    client.flushall()
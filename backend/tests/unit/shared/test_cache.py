@@ -0,0 +1,184 @@
+"""缓存工具单元测试"""
+import pytest
+from unittest.mock import MagicMock
+from shared.utils.cache import CacheManager, CacheSweeper, cached, cached_items, user_tag
+import shared.utils.cache as cache_module
+
+
+@pytest.mark.unit
+class TestCacheInvalidation:
+    """代数失效测试类"""
+    
+    def test_tagged_key_changes_after_invalidate(self, fake_redis):
+        """测试标签失效后键的代数变化"""
+        cache = CacheManager(redis_client=fake_redis)
+        tag = user_tag("u1")
+        
+        key_before = cache.make_tagged_key("tasks", [tag], "u1", page=1)
+        cache.set(key_before, {"items": [1, 2]})
+        
+        assert cache.invalidate_tags(tag)
+        key_after = cache.make_tagged_key("tasks", [tag], "u1", page=1)
+        
+        assert key_before != key_after
+        assert cache.get(key_after) is None
+        # 旧值仍然存在，由TTL自然淘汰
+        assert fake_redis.ttl(key_before) > 0
+    
+    def test_clear_user_cache_is_single_incr(self, fake_redis):
+        """测试清除用户缓存只递增代数"""
+        cache = CacheManager(redis_client=fake_redis)
+        
+        cache.clear_user_cache("u1")
+        cache.clear_user_cache("u1")
+        
+        assert cache.get_generations([user_tag("u1"), user_tag("u2")]) == [2, 0]
+    
+    def test_delete_pattern_uses_scan_batches(self, fake_redis):
+        """测试按批删除匹配模式的键"""
+        cache = CacheManager(redis_client=fake_redis)
+        for i in range(25):
+            fake_redis.set(f"purge:{i}", i)
+        fake_redis.set("keep:1", 1)
+        
+        deleted = cache.delete_pattern("purge:*", batch_size=10)
+        
+        assert deleted == 25
+        assert fake_redis.exists("keep:1")
+    
+    def test_sweeper_purges_in_background(self, fake_redis):
+        """测试后台清理器"""
+        cache = CacheManager(redis_client=fake_redis)
+        sweeper = CacheSweeper(cache, batch_size=50, pause_seconds=0)
+        for i in range(12):
+            fake_redis.set(f"old:{i}", i)
+        
+        sweeper.submit("old:*")
+        sweeper.join()
+        sweeper.stop(timeout=1)
+        
+        assert list(fake_redis.scan_iter("old:*")) == []
+    
+    def test_cached_decorator_respects_tags(self, fake_redis, monkeypatch):
+        """测试装饰器在标签失效后重新计算"""
+        cache = CacheManager(redis_client=fake_redis)
+        monkeypatch.setattr(cache_module, "cache_manager", cache)
+        calls = []
+        
+        @cached(prefix="stats", ttl=60, tags_func=lambda user_id: [user_tag(user_id)])
+        def load_stats(user_id):
+            calls.append(user_id)
+            return {"count": len(calls)}
+        
+        assert load_stats("u1") == {"count": 1}
+        assert load_stats("u1") == {"count": 1}
+        
+        cache.clear_user_cache("u1")
+        
+        assert load_stats("u1") == {"count": 2}
+        assert calls == ["u1", "u1"]
+
+
+@pytest.mark.unit
+class TestCacheBulk:
+    """批量缓存测试类"""
+    
+    def test_get_set_delete_many(self, fake_redis):
+        """测试批量读写删除"""
+        cache = CacheManager(redis_client=fake_redis)
+        
+        assert cache.set_many({"a": 1, "b": {"x": [1, 2]}}, ttl=60)
+        
+        assert cache.get_many(["a", "missing", "b"]) == {"a": 1, "b": {"x": [1, 2]}}
+        assert cache.delete_many(["a", "b", "missing"]) == 2
+        assert cache.get_many(["a", "b"]) == {}
+    
+    def test_cached_items_loads_only_missing(self, fake_redis, monkeypatch):
+        """测试按条目缓存只加载缺失的ID并保持顺序"""
+        cache = CacheManager(redis_client=fake_redis)
+        monkeypatch.setattr(cache_module, "cache_manager", cache)
+        rows = {i: {"id": i, "title": f"任务{i}"} for i in range(1, 6)}
+        requested = []
+        
+        @cached_items(prefix="task", ttl=60)
+        def load_tasks(ids):
+            requested.append(list(ids))
+            return [rows[i] for i in reversed(ids) if i in rows]
+        
+        assert load_tasks([1, 2]) == [rows[1], rows[2]]
+        assert load_tasks([3, 2, 99, 1]) == [rows[3], rows[2], rows[1]]
+        assert requested == [[1, 2], [3, 99]]
+    
+    @pytest.mark.asyncio
+    async def test_cached_items_async(self, fake_redis, monkeypatch):
+        """测试异步批量加载"""
+        cache = CacheManager(redis_client=fake_redis)
+        monkeypatch.setattr(cache_module, "cache_manager", cache)
+        requested = []
+        
+        @cached_items(prefix="conv", ids_arg="conversation_ids", ttl=60)
+        async def load_conversations(user_id, conversation_ids):
+            requested.append(list(conversation_ids))
+            return [{"id": i, "user_id": user_id} for i in conversation_ids]
+        
+        await load_conversations("u1", conversation_ids=["a", "b"])
+        result = await load_conversations("u1", conversation_ids=["b", "c"])
+        
+        assert [item["id"] for item in result] == ["b", "c"]
+        assert requested == [["a", "b"], ["c"]]
+
+
+@pytest.mark.unit
+class TestCacheStats:
+    """缓存统计测试类"""
+    
+    def test_per_prefix_hit_ratio(self, fake_redis):
+        """测试按前缀统计命中和未命中"""
+        cache = CacheManager(redis_client=fake_redis)
+        cache.set("tasks:1", {"id": 1})
+        cache.get("tasks:1")
+        cache.get("tasks:2")
+        cache.get_many(["stats:1", "tasks:1"])
+        
+        prefixes = cache.get_stats()["prefixes"]
+        
+        assert prefixes["tasks"]["hits"] == 2
+        assert prefixes["tasks"]["misses"] == 1
+        assert prefixes["tasks"]["hit_ratio"] == round(2 / 3, 4)
+        assert prefixes["tasks"]["avg_stored_bytes"] > 0
+        assert prefixes["stats"]["hit_ratio"] == 0
+    
+    def test_export_stats_merges_across_processes(self, fake_redis):
+        """测试多个进程导出的统计在Redis中合并"""
+        worker_a = CacheManager(redis_client=fake_redis)
+        worker_b = CacheManager(redis_client=fake_redis)
+        worker_a.get("conv:1")
+        worker_b.set("conv:1", 1)
+        worker_b.get("conv:1")
+        
+        assert worker_a.export_stats()
+        assert worker_b.export_stats()
+        # 没有新增量时重复导出不会重复累加
+        assert worker_b.export_stats()
+        
+        stats = worker_a.get_cluster_stats()["conv"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["sets"] == 1
+    
+    def test_memory_report_groups_by_prefix(self):
+        """测试内存抽样按前缀汇总"""
+        redis_client = MagicMock()
+        redis_client.scan_iter.return_value = [b"tasks:1", b"tasks:2", b"user:1"]
+        pipe = MagicMock()
+        pipe.execute.return_value = [100, 60, 300, 60, 50, -1]
+        redis_client.pipeline.return_value = pipe
+        cache = CacheManager(redis_client=redis_client)
+        
+        report = cache.memory_report(sample_size=10)
+        
+        assert report["sampled_keys"] == 3
+        assert report["prefixes"]["tasks"]["avg_bytes"] == 200
+        assert report["prefixes"]["tasks"]["avg_ttl_seconds"] == 60
+        assert report["prefixes"]["user"]["no_ttl_keys"] == 1
+        assert list(report["prefixes"]) == ["tasks", "user"]
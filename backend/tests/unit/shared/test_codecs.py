@@ -0,0 +1,67 @@
+"""缓存编解码器单元测试"""
+import json
+import pytest
+from uuid import uuid4
+from datetime import datetime, date
+from shared.utils.codecs import (
+    FLAG_ZLIB,
+    JSONCodec,
+    decode_value,
+    encode_value,
+    get_codec,
+)
+from shared.utils.cache import CacheManager
+
+msgpack = pytest.importorskip("msgpack")
+
+
+@pytest.mark.unit
+class TestCodecs:
+    """编解码器测试类"""
+    
+    def test_msgpack_preserves_types(self):
+        """测试msgpack保留UUID和datetime类型"""
+        value = {
+            "id": uuid4(),
+            "created_at": datetime(2026, 1, 15, 10, 30, 5, 123456),
+            "day": date(2026, 1, 15),
+            "scenes": [{"scene_id": 1, "narration": "旁白"}],
+        }
+        
+        data = encode_value(value, get_codec("msgpack"))
+        
+        assert decode_value(data) == value
+    
+    def test_compression_above_threshold(self):
+        """测试超过阈值时压缩"""
+        value = {"narration": "长文本" * 1000}
+        
+        small = encode_value({"a": 1}, get_codec("msgpack"), compress_threshold=64)
+        large = encode_value(value, get_codec("msgpack"), compress_threshold=64)
+        
+        assert not small[1] & FLAG_ZLIB
+        assert large[1] & FLAG_ZLIB
+        assert decode_value(large) == value
+    
+    def test_codecs_coexist(self):
+        """测试不同格式的值可以同时解码"""
+        legacy = json.dumps({"a": 1}).encode("utf-8")
+        tagged_json = encode_value({"a": 1}, JSONCodec())
+        tagged_msgpack = encode_value({"a": 1}, get_codec("msgpack"))
+        
+        assert decode_value(legacy) == {"a": 1}
+        assert decode_value(tagged_json) == {"a": 1}
+        assert decode_value(tagged_msgpack) == {"a": 1}
+    
+    def test_cache_manager_reports_sizes(self, fake_redis):
+        """测试缓存统计中包含序列化大小"""
+        cache = CacheManager(redis_client=fake_redis, compress_threshold=64)
+        
+        cache.set("k1", {"a": 1})
+        cache.set("k2", {"text": "x" * 500})
+        stats = cache.get_stats()["totals"]
+        
+        assert stats["sets"] == 2
+        assert stats["compressed_sets"] == 1
+        assert stats["stored_bytes"] == len(fake_redis.get("k1")) + len(fake_redis.get("k2"))
+        assert cache.get("k2") == {"text": "x" * 500}
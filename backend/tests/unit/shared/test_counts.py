@@ -0,0 +1,84 @@
+"""列表总数单元测试"""
+import pytest
+from uuid import uuid4
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from shared.models.db_models import Task
+from shared.utils.cache import CacheManager
+from shared.utils.counts import CountCache, TASKS, count_rows, estimate_count
+
+
+class _FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class _FakeBind:
+    dialect = postgresql.dialect()
+
+
+class _FakePostgresSession:
+    """只记录EXPLAIN语句并返回固定查询计划的PostgreSQL会话"""
+
+    def __init__(self, plan_rows: int):
+        self.plan_rows = plan_rows
+        self.statements = []
+
+    def get_bind(self):
+        return _FakeBind()
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return _FakeResult([{"Plan": {"Node Type": "Index Scan", "Plan Rows": self.plan_rows}}])
+
+
+@pytest.mark.unit
+class TestCounts:
+    """列表总数测试类"""
+    
+    async def test_count_loaded_once(self, fake_redis):
+        """测试总数只精确统计一次，失效后重新统计"""
+        counts = CountCache(cache=CacheManager(redis_client=fake_redis))
+        user_id = uuid4()
+        calls = []
+        
+        async def loader():
+            calls.append(user_id)
+            return len(calls) * 10
+        
+        assert await counts.get_count(TASKS, user_id, loader) == 10
+        assert await counts.get_count(TASKS, user_id, loader) == 10
+        assert len(calls) == 1
+        
+        counts.invalidate(TASKS, user_id)
+        assert await counts.get_count(TASKS, user_id, loader) == 20
+        assert len(calls) == 2
+        
+        await counts.invalidate_async(TASKS, user_id)
+        assert await counts.get_count(TASKS, user_id, loader) == 30
+        assert len(calls) == 3
+    
+    async def test_estimate_uses_query_plan(self):
+        """测试PostgreSQL上用EXPLAIN的估计行数，不执行COUNT(*)"""
+        db = _FakePostgresSession(plan_rows=1234)
+        query = select(Task).where(Task.user_id == uuid4()).order_by(Task.created_at)
+        
+        assert await count_rows(db, query) == 1234
+        assert len(db.statements) == 1
+        assert db.statements[0].startswith("EXPLAIN (FORMAT JSON) SELECT")
+        assert "count(" not in db.statements[0]
+        assert "ORDER BY" not in db.statements[0]
+    
+    async def test_fallback_to_exact_count(self, async_db_session, test_user):
+        """测试非PostgreSQL数据库或要求精确值时执行COUNT(*)"""
+        for _ in range(3):
+            async_db_session.add(Task(user_id=test_user.id, type="screenplay", status="pending"))
+        await async_db_session.commit()
+        query = select(Task).where(Task.user_id == test_user.id)
+        
+        assert await estimate_count(async_db_session, query) is None
+        assert await count_rows(async_db_session, query) == 3
+        assert await count_rows(async_db_session, query, exact=True) == 3
@@ -0,0 +1,218 @@
+"""数据库会话单元测试"""
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy import Column, Integer, create_engine, select, text
+from sqlalchemy.orm import declarative_base
+from sqlalchemy import exc as sa_exc
+
+from shared.config.database import (
+    InstrumentedQueuePool,
+    ReplicaRouter,
+    SyncSessionAdapter,
+    db_pool_checkout_timeouts_total,
+    db_pool_checkout_wait_seconds,
+    db_pool_connections,
+    db_pool_pre_pings_total,
+    get_async_database_url,
+    get_pool_settings,
+    instrument_pool,
+)
+from shared.models.db_models import User
+
+_Base = declarative_base()
+
+
+class _Row(_Base):
+    __tablename__ = "t"
+    id = Column(Integer, primary_key=True)
+
+
+@pytest.mark.unit
+class TestDatabase:
+    """数据库会话测试类"""
+    
+    def test_async_database_url(self):
+        """测试同步驱动连接串转换为异步驱动"""
+        assert get_async_database_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+        assert get_async_database_url("postgresql+psycopg2://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+        assert get_async_database_url("postgresql+asyncpg://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    
+    async def test_sync_session_adapter(self, db_session, test_user):
+        """测试兼容层以AsyncSession接口执行同步会话的操作"""
+        db = SyncSessionAdapter(db_session)
+        
+        user = await db.get(User, test_user.id)
+        assert user is test_user
+        
+        user.username = "renamed"
+        await db.commit()
+        await db.refresh(user)
+        assert await db.scalar(select(User.username).where(User.id == test_user.id)) == "renamed"
+        
+        result = await db.execute(select(User).where(User.id == test_user.id))
+        assert result.scalars().first() is user
+    
+    def test_pool_settings(self, monkeypatch):
+        """测试从环境变量读取连接池配置"""
+        monkeypatch.setenv("DB_POOL_SIZE", "20")
+        monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+        monkeypatch.setenv("DB_POOL_PRE_PING", "ALWAYS")
+        settings = get_pool_settings()
+        assert settings["pool_size"] == 20
+        assert settings["max_overflow"] == 0
+        assert settings["pre_ping"] == "always"
+        
+        monkeypatch.setenv("DB_POOL_PRE_PING", "sometimes")
+        with pytest.raises(ValueError):
+            get_pool_settings()
+    
+    def test_checkout_wait_and_timeout_metrics(self, tmp_path):
+        """测试检出等待时间和等待超时计数"""
+        settings = dict(get_pool_settings(), pre_ping="never")
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+        )
+        instrument_pool(engine, settings)
+        waits_before = _sample(db_pool_checkout_wait_seconds, pool="sync")
+        timeouts_before = _sample(db_pool_checkout_timeouts_total, pool="sync") or 0
+        
+        connection = engine.connect()
+        assert _sample(db_pool_connections, pool="sync", state="checked_out") == 1
+        with pytest.raises(sa_exc.TimeoutError):
+            engine.connect()
+        connection.close()
+        
+        assert _sample(db_pool_checkout_timeouts_total, pool="sync") == timeouts_before + 1
+        waits = _sample(db_pool_checkout_wait_seconds, pool="sync")
+        assert sum(waits["counts"]) == sum((waits_before or {"counts": [0]})["counts"]) + 1
+        engine.dispose()
+    
+    def test_idle_pre_ping_replaces_dead_connection(self, tmp_path, monkeypatch):
+        """测试空闲连接检出前检测，检测失败时换用新连接"""
+        settings = dict(get_pool_settings(), pre_ping="idle", pre_ping_idle=0)
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'ping.db'}",
+            poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0
+        )
+        instrument_pool(engine, settings)
+        
+        with engine.connect() as connection:
+            first = connection.connection.dbapi_connection
+        with engine.connect() as connection:
+            assert connection.connection.dbapi_connection is first
+        assert _sample(db_pool_pre_pings_total, pool="sync", result="ok") >= 1
+        
+        def dead(dbapi_connection):
+            raise OSError("connection reset")
+        monkeypatch.setattr(engine.dialect, "do_ping", dead)
+        failed_before = _sample(db_pool_pre_pings_total, pool="sync", result="failed") or 0
+        with engine.connect() as connection:
+            # 新建的连接没有归还记录，不再检测
+            assert connection.connection.dbapi_connection is not first
+        assert _sample(db_pool_pre_pings_total, pool="sync", result="failed") == failed_before + 1
+        engine.dispose()
+
+
+def _sample(metric, **labels):
+    for sample_labels, value in metric.samples():
+        if sample_labels == labels:
+            return value
+    return None
+
+
+class _FakeLagRouter(ReplicaRouter):
+    """按预设值返回复制延迟"""
+    
+    def __init__(self, lags, **kwargs):
+        super().__init__(**kwargs)
+        self.lags = lags
+        self.checks = 0
+        for name in lags:
+            self.add_replica(name, session_local=name)
+    
+    async def _measure_lag(self, replica):
+        self.checks += 1
+        lag = self.lags[replica.name]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+
+@pytest.mark.unit
+class TestReplicaRouter:
+    """只读副本路由测试类"""
+    
+    async def test_without_replicas_uses_primary(self, fake_redis):
+        """测试未配置副本时走主库"""
+        router = ReplicaRouter(redis_client=fake_redis)
+        assert await router.route("user-1") == (None, "primary", "no_replica")
+    
+    async def test_routes_to_healthy_replicas(self, fake_redis):
+        """测试轮询延迟在阈值内的副本，跳过延迟过大和检测失败的副本"""
+        router = _FakeLagRouter(
+            {"r1": 0.5, "r2": 30.0, "r3": ConnectionError("down"), "r4": 0.0},
+            max_lag=5, redis_client=fake_redis
+        )
+        targets = {(await router.route("user-1"))[1] for _ in range(4)}
+        assert targets == {"r1", "r4"}
+        # 检测间隔内不重复检测
+        assert router.checks == 4
+        assert {item["name"]: item["healthy"] for item in router.status()} == {
+            "r1": True, "r2": False, "r3": False, "r4": True
+        }
+    
+    async def test_falls_back_when_all_lagging(self, fake_redis):
+        """测试所有副本延迟过大时走主库，恢复后重新使用副本"""
+        router = _FakeLagRouter({"r1": 12.0}, max_lag=5, check_interval=0, redis_client=fake_redis)
+        assert await router.route() == (None, "primary", "lagging")
+        router.lags["r1"] = 1.0
+        assert await router.route() == ("r1", "r1", "replica")
+    
+    async def test_read_your_writes(self, fake_redis):
+        """测试用户写入后其读请求在一段时间内留在主库"""
+        router = _FakeLagRouter({"r1": 0.0}, sticky_seconds=10, redis_client=fake_redis)
+        pending = router.mark_write("user-1")
+        # Redis写入完成前，本进程的读请求已留在主库
+        assert await router.route("user-1") == (None, "primary", "read_your_writes")
+        assert (await router.route("user-2"))[1] == "r1"
+        await pending
+        assert 0 < fake_redis.ttl("db:recent_write:user-1") <= 10
+        
+        # 其他进程通过Redis看到写入标记
+        other = _FakeLagRouter({"r1": 0.0}, redis_client=fake_redis)
+        assert await other.route("user-1") == (None, "primary", "read_your_writes")
+    
+    async def test_redis_failure_falls_back_to_primary(self):
+        """测试Redis不可用时记录写入不抛出异常，读请求走主库"""
+        broken = MagicMock()
+        broken.set.side_effect = ConnectionError("redis down")
+        broken.exists.side_effect = ConnectionError("redis down")
+        router = _FakeLagRouter({"r1": 0.0}, redis_client=broken)
+        
+        await router.mark_write("user-1")
+        assert await router.route("user-2") == (None, "primary", "read_your_writes")
+    
+    def test_primary_session_marks_writes(self, fake_redis, monkeypatch, tmp_path):
+        """测试主库会话提交写入后记录当前用户，只读查询不记录"""
+        from shared.config import database
+        from shared.utils.request_context import bind_request_context, reset_request_context
+        
+        router = _FakeLagRouter({"r1": 0.0}, redis_client=fake_redis)
+        monkeypatch.setattr(database, "replica_router", router)
+        engine = create_engine(f"sqlite:///{tmp_path / 'rw.db'}")
+        session = database.PrimarySession(bind=engine)
+        token = bind_request_context(user_id="user-1")
+        try:
+            session.execute(select(1))
+            session.commit()
+            assert not router.recently_wrote("user-1")
+            
+            session.execute(text("CREATE TABLE t (id INTEGER)"))
+            session.add(_Row(id=1))
+            session.commit()
+            assert router.recently_wrote("user-1")
+        finally:
+            reset_request_context(token)
+            session.close()
+            engine.dispose()
@@ -0,0 +1,49 @@
+"""延迟直方图单元测试"""
+import random
+import pytest
+from shared.utils.histogram import (
+    LatencyHistogram,
+    bucket_index,
+    bucket_lower_bound,
+    bucket_upper_bound,
+)
+
+
+@pytest.mark.unit
+class TestLatencyHistogram:
+    """延迟直方图测试类"""
+    
+    def test_bucket_bounds_contain_value(self):
+        """测试每个值都落在所在桶的上下界之间"""
+        for value in [0, 1, 15, 16, 17, 31, 32, 33, 1000, 123456, 10 ** 9]:
+            index = bucket_index(value)
+            assert bucket_lower_bound(index) <= value < bucket_upper_bound(index)
+    
+    def test_percentiles_within_relative_error(self):
+        """测试分位数相对误差在桶精度以内"""
+        rng = random.Random(42)
+        samples = [rng.lognormvariate(3, 1) for _ in range(5000)]
+        histogram = LatencyHistogram()
+        for sample in samples:
+            histogram.record(sample)
+        
+        ordered = sorted(samples)
+        for percent in (50, 90, 99, 99.9):
+            exact = ordered[int(len(ordered) * percent / 100) - 1]
+            assert histogram.percentile(percent) == pytest.approx(exact, rel=0.07)
+        assert histogram.mean_ms == pytest.approx(sum(samples) / len(samples))
+    
+    def test_merge_and_round_trip(self):
+        """测试合并与Redis字段往返"""
+        worker_a, worker_b = LatencyHistogram(), LatencyHistogram()
+        for value in range(1, 51):
+            worker_a.record(float(value))
+        for value in range(51, 101):
+            worker_b.record(float(value))
+        
+        fields = {str(k): str(v) for k, v in worker_a.to_fields().items()}
+        merged = LatencyHistogram.from_fields(fields).merge(worker_b)
+        
+        assert merged.count == 100
+        assert merged.percentile(50) == pytest.approx(50, rel=0.07)
+        assert set(merged.summary()) == {"count", "avg_ms", "p50", "p90", "p99", "p99.9"}
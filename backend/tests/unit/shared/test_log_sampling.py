@@ -0,0 +1,125 @@
+"""访问日志采样与请求上下文测试"""
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from shared.middleware.error_handler import error_handler_middleware
+from shared.utils.log_sampling import REASON_ERROR, REASON_SAMPLED, REASON_SLOW, AccessLogSampler
+from shared.utils.logger import JSONFormatter, TextFormatter
+from shared.utils.request_context import (
+    bind_request_context,
+    get_request_context,
+    reset_request_context,
+    update_request_context,
+)
+
+
+@pytest.mark.unit
+class TestRequestContext:
+    """请求上下文测试类"""
+
+    def test_log_records_pick_up_context(self):
+        """上下文中的字段自动写入日志记录"""
+        token = bind_request_context(request_id="req-1", route="/api/v1/tasks")
+        try:
+            update_request_context(user_id=42)
+            record = logging.getLogger("tests.context").makeRecord(
+                "tests.context", logging.INFO, __file__, 1, "hello", None, None
+            )
+        finally:
+            reset_request_context(token)
+
+        assert (record.request_id, record.user_id, record.route) == ("req-1", "42", "/api/v1/tasks")
+        assert '"request_id":"req-1"' in JSONFormatter().format(record)
+        assert TextFormatter().format(record).endswith("[request_id=req-1 user_id=42]")
+        assert get_request_context() is None
+
+    def test_records_outside_request(self):
+        """请求之外的日志记录没有上下文字段"""
+        record = logging.getLogger("tests.context").makeRecord(
+            "tests.context", logging.INFO, __file__, 1, "hello", None, None
+        )
+        assert record.request_id is None
+        assert "request_id" not in JSONFormatter().format(record)
+
+    def test_oversized_request_id_is_replaced(self):
+        """过长的上游请求ID被重新生成"""
+        token = bind_request_context(request_id="x" * 500)
+        try:
+            assert len(get_request_context().request_id) == 32
+        finally:
+            reset_request_context(token)
+
+
+@pytest.mark.unit
+class TestAccessLogSampler:
+    """访问日志采样器测试类"""
+
+    def test_errors_and_slow_requests_always_logged(self, fake_redis):
+        """错误和慢请求不受采样比例影响"""
+        sampler = AccessLogSampler(fake_redis, default_rate=0.0, slow_ms=500)
+
+        assert sampler.decide("/a", 500, 1) == (True, REASON_ERROR, 1.0)
+        assert sampler.decide("/a", 404, 1) == (True, REASON_ERROR, 1.0)
+        assert sampler.decide("/a", 200, 800) == (True, REASON_SLOW, 1.0)
+        assert sampler.decide("/a", 200, 10) == (False, REASON_SAMPLED, 0.0)
+
+    def test_route_rates_and_runtime_update(self, fake_redis):
+        """按路由设置采样比例，配置通过Redis同步到其他进程"""
+        sampler = AccessLogSampler(fake_redis, default_rate=1.0)
+        sampler.update(default_rate=0.0, route="/api/v1/health", route_rate=1.0)
+        sampler.update(route="/api/v1/tasks", route_rate=0.0)
+
+        assert sampler.decide("/api/v1/health", 200, 1)[0]
+        assert not sampler.decide("/api/v1/tasks", 200, 1)[0]
+
+        other = AccessLogSampler(fake_redis, default_rate=1.0)
+        assert other.refresh()
+        assert other.get_config() == sampler.get_config()
+
+        sampler.update(route="/api/v1/health")
+        assert "/api/v1/health" not in sampler.get_config()["routes"]
+
+
+@pytest.mark.unit
+class TestAccessLogMiddleware:
+    """访问日志中间件测试类"""
+
+    @pytest.fixture
+    def client(self, monkeypatch, fake_redis):
+        sampler = AccessLogSampler(fake_redis, default_rate=0.0, slow_ms=10000)
+        monkeypatch.setattr("shared.middleware.error_handler.access_log_sampler", sampler)
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def error_handler(request, call_next):
+            return await error_handler_middleware(request, call_next)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            update_request_context(user_id="u1")
+            logging.getLogger("shared.middleware.error_handler").warning("inside handler")
+            if item_id == 0:
+                from shared.utils.exceptions import NotFoundError
+                raise NotFoundError("物品")
+            return {"id": item_id}
+
+        return TestClient(app)
+
+    def test_success_logs_sampled_and_errors_kept(self, client, caplog):
+        """成功请求按比例采样，错误请求始终记录；日志带上请求上下文"""
+        caplog.set_level(logging.INFO, logger="shared.middleware.error_handler")
+        ok = client.get("/items/1", headers={"X-Request-ID": "abc"})
+        missing = client.get("/items/0")
+
+        assert ok.headers["X-Request-ID"] == "abc"
+        access = [r for r in caplog.records if r.levelno == logging.INFO and "/items/1" in r.getMessage()]
+        assert access == []
+        inside = [r for r in caplog.records if r.getMessage() == "inside handler"]
+        assert inside[0].request_id == "abc" and inside[0].user_id == "u1"
+        errors = [r for r in caplog.records if "/items/0 - 404" in r.getMessage()]
+        assert errors[0].extra_data["sample_reason"] == "error"
+        assert errors[0].request_id == missing.headers["X-Request-ID"]
+        assert errors[0].route == "/items/{item_id}"
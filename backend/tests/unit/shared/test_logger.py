@@ -0,0 +1,150 @@
+"""日志工具测试"""
+import gzip
+import logging
+import os
+import queue
+import time
+
+import pytest
+
+from shared.utils import logger as logger_module
+from shared.utils.logger import (
+    JSONFormatter,
+    NonBlockingQueueHandler,
+    RotatingCompressedFileHandler,
+    json_dumps,
+    setup_logger,
+)
+
+
+def _record(message: str, level: int = logging.INFO, **kwargs) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, message, kwargs.get("args"), kwargs.get("exc_info"))
+
+
+@pytest.mark.unit
+class TestJSONFormatter:
+    """JSON格式化测试类"""
+
+    def test_json_dumps_handles_non_serializable_values(self):
+        """无法序列化的值转为字符串，中文不转义"""
+        import uuid
+        value = uuid.UUID("12345678-1234-5678-1234-567812345678")
+        assert json_dumps({"id": value, "消息": "你好"}) == '{"id":"12345678-1234-5678-1234-567812345678","消息":"你好"}'
+
+    def test_json_dumps_fallback_matches_orjson(self, monkeypatch):
+        """未安装orjson或orjson无法序列化时，标准库输出格式一致"""
+        data = {"n": 1, "消息": "你好", "tags": ["a", "b"]}
+        expected = json_dumps(data)
+        monkeypatch.setattr(logger_module, "ORJSON_AVAILABLE", False)
+        assert json_dumps(data) == expected
+        assert json_dumps({"big": 2 ** 70}) == '{"big":%d}' % 2 ** 70
+
+    def test_exception_text_survives_queue_preparation(self):
+        """经过队列的记录保留格式化后的异常文本"""
+        try:
+            raise ValueError("坏了")
+        except ValueError:
+            import sys
+            record = _record("失败 %s", logging.ERROR, args=("x",), exc_info=sys.exc_info())
+
+        handler = NonBlockingQueueHandler(queue.Queue(), ("key",))
+        prepared = handler.prepare(record)
+
+        assert prepared.exc_info is None and prepared.args is None
+        assert prepared.log_sinks == ("key",)
+        output = JSONFormatter().format(prepared)
+        assert '"message":"失败 x"' in output
+        assert "ValueError: 坏了" in output
+
+
+@pytest.mark.unit
+class TestQueueOverflow:
+    """队列溢出策略测试类"""
+
+    @pytest.fixture(autouse=True)
+    def reset_drops(self, monkeypatch):
+        monkeypatch.setattr(logger_module._pipeline, "_dropped", {})
+        monkeypatch.setattr(logger_module._pipeline, "_dropped_reported", 0)
+
+    def test_drop_policy(self):
+        """drop策略下队列满时立即丢弃新记录"""
+        handler = NonBlockingQueueHandler(queue.Queue(1), ("key",), overflow="drop")
+        handler.emit(_record("first"))
+        handler.emit(_record("second", logging.ERROR))
+
+        assert handler.queue.qsize() == 1
+        assert logger_module.get_logging_stats()["dropped"] == {"ERROR": 1}
+
+    def test_keep_errors_policy(self):
+        """keep_errors策略只丢弃WARNING以下的记录，错误等待队列空出"""
+        handler = NonBlockingQueueHandler(queue.Queue(1), ("key",), overflow="keep_errors", block_timeout=0.01)
+        handler.emit(_record("first"))
+        started = time.perf_counter()
+        handler.emit(_record("info"))
+        assert time.perf_counter() - started < 0.01
+        handler.emit(_record("error", logging.ERROR))
+
+        assert logger_module.get_logging_stats()["dropped"] == {"INFO": 1, "ERROR": 1}
+
+    def test_unknown_policy(self):
+        """未知的溢出策略"""
+        with pytest.raises(ValueError):
+            NonBlockingQueueHandler(queue.Queue(), ("key",), overflow="ignore")
+
+
+@pytest.mark.unit
+class TestRotatingCompressedFileHandler:
+    """日志轮转测试类"""
+
+    def _handler(self, tmp_path, **kwargs):
+        handler = RotatingCompressedFileHandler(str(tmp_path / "app.log"), **kwargs)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        return handler
+
+    def test_size_rotation_compresses_and_prunes(self, tmp_path):
+        """超过大小时轮转并压缩，只保留指定数量的历史文件"""
+        handler = self._handler(tmp_path, max_bytes=100, interval=0, backup_count=2)
+        for i in range(20):
+            handler.handle(_record(f"line {i:02d} " + "x" * 30))
+        handler.close()
+
+        rotated = sorted(p.name for p in tmp_path.iterdir() if p.name != "app.log")
+        assert len(rotated) == 2
+        assert all(name.endswith(".gz") for name in rotated)
+        newest = max((tmp_path / name for name in rotated), key=os.path.getmtime)
+        with gzip.open(newest, "rt", encoding="utf-8") as f:
+            assert "line" in f.read()
+        assert "line 19" in (tmp_path / "app.log").read_text(encoding="utf-8")
+
+    def test_time_rotation(self, tmp_path):
+        """到达轮转时间时轮转"""
+        handler = self._handler(tmp_path, max_bytes=0, interval=3600, compress=False)
+        handler.handle(_record("before"))
+        handler.rollover_at = time.time() - 1
+        handler.handle(_record("after"))
+        handler.close()
+
+        rotated = [p for p in tmp_path.iterdir() if p.name != "app.log"]
+        assert len(rotated) == 1
+        assert rotated[0].read_text(encoding="utf-8") == "before\n"
+        assert (tmp_path / "app.log").read_text(encoding="utf-8") == "after\n"
+        assert handler.rollover_at > time.time()
+
+
+@pytest.mark.unit
+class TestQueuedLogger:
+    """队列日志测试类"""
+
+    def test_records_are_written_by_background_thread(self, tmp_path):
+        """日志记录经过队列由后台线程写入文件"""
+        log = setup_logger("tests.queued_logger", log_file="queued.log", use_json=True, log_dir=str(tmp_path))
+        log.propagate = False
+        log.info("hello %s", "world", extra={"extra_data": {"user_id": "u1"}})
+
+        deadline = time.time() + 2
+        path = tmp_path / "queued.log"
+        while time.time() < deadline and not (path.exists() and path.read_text(encoding="utf-8")):
+            time.sleep(0.01)
+        content = path.read_text(encoding="utf-8")
+        assert '"message":"hello world"' in content
+        assert '"extra":{"user_id":"u1"}' in content
@@ -0,0 +1,71 @@
+"""事件循环延迟监控测试"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from shared.utils.loop_monitor import EventLoopMonitor
+
+
+def _blocking_db_call():
+    time.sleep(0.3)
+
+
+@pytest.mark.unit
+class TestEventLoopMonitor:
+    """事件循环监控测试类"""
+
+    async def test_detects_blocking_call(self):
+        """同步调用阻塞事件循环时记录延迟并抓取调用栈"""
+        monitor = EventLoopMonitor(interval=0.02, stall_threshold=0.1)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            _blocking_db_call()
+            await asyncio.sleep(0.05)
+        finally:
+            monitor.stop(timeout=1)
+
+        stats = monitor.get_stats()
+        assert stats["stalls"] >= 1
+        assert stats["max_lag"] >= 0.1
+        assert stats["logged"] == 1
+        assert not monitor.running
+
+    async def test_stall_logs_are_rate_limited(self):
+        """抓取阻塞位置的调用栈，同一位置在限流间隔内只记录一次"""
+        # 阈值足够大，看门狗不会自行抓取
+        monitor = EventLoopMonitor(interval=0.02, stall_threshold=10, log_interval=60)
+        results = []
+
+        def capture():
+            time.sleep(0.05)
+            results.append(monitor.capture_stall(0.2))
+            results.append(monitor.capture_stall(0.2))
+
+        monitor.start()
+        try:
+            watcher = threading.Thread(target=capture)
+            watcher.start()
+            _blocking_db_call()
+            watcher.join()
+        finally:
+            monitor.stop(timeout=1)
+
+        first, second = results
+        assert "_blocking_db_call" in first["stack"]
+        assert first["site"][0].endswith("test_loop_monitor.py")
+        assert "test_stall_logs_are_rate_limited" in first["task"]
+        assert second is None
+        assert monitor.get_stats()["captured"] == 2
+
+    def test_observe_lag_counts_stalls(self):
+        """只有超过阈值的延迟计为阻塞"""
+        monitor = EventLoopMonitor(stall_threshold=0.25)
+        monitor.observe_lag(0.01)
+        monitor.observe_lag(0.5)
+
+        stats = monitor.get_stats()
+        assert stats["stalls"] == 1
+        assert stats["max_lag"] == 0.5
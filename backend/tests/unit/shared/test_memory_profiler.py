@@ -0,0 +1,71 @@
+"""内存分析测试"""
+import pytest
+
+from shared.utils.exceptions import ConflictError, NotFoundError
+from shared.utils.memory_profiler import MemoryProfiler
+
+_retained = []
+
+
+def _leak(count: int):
+    _retained.extend(bytearray(1024) for _ in range(count))
+
+
+@pytest.fixture
+def profiler():
+    profiler = MemoryProfiler(max_snapshots=3)
+    profiler.register_structure("retained", lambda: {"items": len(_retained)})
+    yield profiler
+    profiler.stop()
+    _retained.clear()
+
+
+@pytest.mark.unit
+class TestMemoryProfiler:
+    """内存分析器测试类"""
+
+    def test_snapshot_requires_tracing(self, profiler):
+        """tracemalloc未启动时不能拍摄快照"""
+        with pytest.raises(ConflictError):
+            profiler.take_snapshot()
+
+    def test_diff_reports_growth_site(self, profiler):
+        """快照比较指向增长最多的分配位置，并给出数据结构数量变化"""
+        profiler.start(frames=5)
+        first = profiler.take_snapshot("before")
+        _leak(500)
+        second = profiler.take_snapshot("after")
+
+        diff = profiler.diff(limit=5)
+
+        assert (diff["base"], diff["target"]) == (first["id"], second["id"])
+        assert "test_memory_profiler.py" in diff["top"][0]["site"]
+        assert diff["top"][0]["sizeDiff"] >= 500 * 1024
+        assert diff["structures"]["retained"]["items"] == {"count": 500, "diff": 500}
+
+    def test_traceback_grouping(self, profiler):
+        """按调用栈分组时返回完整调用栈"""
+        profiler.start(frames=5)
+        profiler.take_snapshot()
+        _leak(10)
+        profiler.take_snapshot()
+
+        diff = profiler.diff(group_by="traceback", limit=1)
+        assert len(diff["top"][0]["traceback"]) > 1
+
+    def test_snapshot_retention(self, profiler):
+        """超过保留数量时丢弃最早的快照"""
+        profiler.start()
+        ids = [profiler.take_snapshot()["id"] for _ in range(4)]
+
+        assert [snapshot["id"] for snapshot in profiler.status()["snapshots"]] == ids[1:]
+        with pytest.raises(NotFoundError):
+            profiler.diff(base_id=ids[0])
+
+    def test_structure_errors_are_reported(self, profiler):
+        """统计函数出错时返回错误信息而不是中断"""
+        profiler.register_structure("broken", lambda: 1 / 0)
+
+        summary = profiler.structure_summary()
+        assert summary["retained"] == {"items": 0}
+        assert "error" in summary["broken"]
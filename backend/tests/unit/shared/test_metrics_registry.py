@@ -0,0 +1,169 @@
+"""进程内指标注册表测试"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from shared.utils.metrics_registry import MetricsRegistry, track_background_task, background_tasks_total
+
+
+def _lines(text: str):
+    return [line for line in text.splitlines() if not line.startswith("#")]
+
+
+@pytest.mark.unit
+class TestMetricsRegistry:
+    """指标注册表测试类"""
+
+    def test_render_text_format(self):
+        """计数器、仪表盘和直方图按Prometheus文本格式输出"""
+        registry = MetricsRegistry(service="test")
+        registry.counter("jobs_total", "任务数", ("kind",)).inc(2, kind="a")
+        registry.gauge("in_flight", "进行中").set(3)
+        histogram = registry.histogram("latency_seconds", "耗时", ("route",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, route="/x")
+        histogram.observe(0.5, route="/x")
+        histogram.observe(5, route="/x")
+
+        text = registry.render()
+        assert "# TYPE jobs_total counter" in text
+        assert "# TYPE latency_seconds histogram" in text
+        lines = _lines(text)
+        assert 'jobs_total{kind="a"} 2' in lines
+        assert "in_flight 3" in lines
+        assert 'latency_seconds_bucket{route="/x",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{route="/x",le="1"} 2' in lines
+        assert 'latency_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+        assert 'latency_seconds_count{route="/x"} 3' in lines
+        assert 'latency_seconds_sum{route="/x"} 5.55' in lines
+
+    def test_label_mismatch_raises(self):
+        """标签与注册时不一致时报错"""
+        registry = MetricsRegistry(service="test")
+        counter = registry.counter("jobs_total", "任务数", ("kind",))
+        with pytest.raises(ValueError):
+            counter.inc(other="x")
+        with pytest.raises(ValueError):
+            registry.gauge("jobs_total", "重复注册为其他类型")
+
+    def test_gauge_function_and_label_escaping(self):
+        """回调仪表盘在采集时取值，标签值被转义"""
+        registry = MetricsRegistry(service="test")
+        pool = {"used": 4}
+        registry.gauge("pool", "连接池", ("state",)).set_function(lambda: pool["used"], state='a"b')
+        pool["used"] = 7
+        assert 'pool{state="a\\"b"} 7' in _lines(registry.render())
+
+    def test_cluster_aggregation(self, text_redis):
+        """多个worker的快照合并：计数器相加，max仪表盘取最大值，过期worker被移除"""
+        workers = []
+        for worker_id, value in (("w1", 1), ("w2", 2)):
+            registry = MetricsRegistry(redis_client=text_redis, service="svc")
+            registry.worker_id = worker_id
+            registry.counter("requests_total", "请求数").inc(value)
+            registry.gauge("lag_seconds", "延迟", multiprocess_mode="max").set(value * 10)
+            registry.histogram("latency_seconds", "耗时", buckets=(1.0,)).observe(value)
+            workers.append(registry)
+        workers[1].export()
+
+        stale = MetricsRegistry(redis_client=text_redis, service="svc")
+        stale.worker_id = "w3"
+        stale.counter("requests_total", "请求数").inc(100)
+        stale.export()
+        text_redis.hset("metrics:prom:svc", "w3", '{"ts": %f, "metrics": []}' % (time.time() - 3600))
+
+        lines = _lines(workers[0].render_cluster())
+        assert "requests_total 3" in lines
+        assert "lag_seconds 20" in lines
+        assert 'latency_seconds_bucket{le="1"} 1' in lines
+        assert "latency_seconds_count 2" in lines
+        assert not text_redis.hexists("metrics:prom:svc", "w3")
+
+    def test_dead_worker_counters_kept(self, text_redis):
+        """worker退出后其计数器和直方图仍计入汇总，汇总值不下降；仪表盘随之移除"""
+        live = MetricsRegistry(redis_client=text_redis, service="svc")
+        live.worker_id = "w1"
+        live.counter("jobs_total", "任务数", ("kind",)).inc(1, kind="a")
+        live.histogram("latency_seconds", "耗时", buckets=(1.0,)).observe(0.5)
+        
+        dead = MetricsRegistry(redis_client=text_redis, service="svc")
+        dead.worker_id = "w2"
+        dead.counter("jobs_total", "任务数", ("kind",)).inc(5, kind="a")
+        dead.histogram("latency_seconds", "耗时", buckets=(1.0,)).observe(3)
+        dead.gauge("in_flight", "进行中").set(7)
+        dead.export()
+        
+        before = _lines(live.render_cluster())
+        assert 'jobs_total{kind="a"} 6' in before
+        assert "in_flight 7" in before
+        
+        # w2 停止上报，快照过期
+        snapshot = json.loads(text_redis.hget("metrics:prom:svc", "w2"))
+        snapshot["ts"] -= 3600
+        text_redis.hset("metrics:prom:svc", "w2", json.dumps(snapshot))
+        for _ in range(2):
+            lines = _lines(live.render_cluster())
+            assert 'jobs_total{kind="a"} 6' in lines
+            assert 'latency_seconds_bucket{le="1"} 1' in lines
+            assert "latency_seconds_count 2" in lines
+            assert "latency_seconds_sum 3.5" in lines
+            assert not any(line.startswith("in_flight") for line in lines)
+        assert not text_redis.hexists("metrics:prom:svc", "w2")
+    
+    def test_stopped_worker_counters_kept(self, text_redis):
+        """正常停止的worker把计数器最终值转入退役哈希"""
+        live = MetricsRegistry(redis_client=text_redis, service="svc")
+        live.worker_id = "w1"
+        live.counter("jobs_total", "任务数").inc(1)
+        
+        stopping = MetricsRegistry(redis_client=text_redis, service="svc")
+        stopping.worker_id = "w2"
+        stopping.counter("jobs_total", "任务数").inc(4)
+        stopping.export()
+        stopping.stop_exporter()
+        
+        assert "jobs_total 5" in _lines(live.render_cluster())
+    
+    def test_cluster_falls_back_to_local(self):
+        """Redis不可用时只输出本进程指标"""
+        class BrokenRedis:
+            def hgetall(self, key):
+                raise ConnectionError("down")
+
+        registry = MetricsRegistry(redis_client=BrokenRedis(), service="svc")
+        registry.counter("requests_total", "请求数").inc()
+        assert "requests_total 1" in _lines(registry.render_cluster())
+
+
+@pytest.mark.unit
+class TestBackgroundTaskTracking:
+    """后台任务指标测试类"""
+
+    def test_async_task_status(self):
+        """异步后台任务按结束状态计数"""
+        @track_background_task("unit_async")
+        async def ok():
+            return 1
+
+        @track_background_task("unit_async")
+        async def fail():
+            raise RuntimeError("boom")
+
+        assert asyncio.run(ok()) == 1
+        with pytest.raises(RuntimeError):
+            asyncio.run(fail())
+
+        samples = {tuple(sorted(labels.items())): value for labels, value in background_tasks_total.samples()}
+        assert samples[(("status", "success"), ("task", "unit_async"))] == 1
+        assert samples[(("status", "error"), ("task", "unit_async"))] == 1
+
+    def test_sync_task_status(self):
+        """同步后台任务同样计数"""
+        @track_background_task("unit_sync")
+        def ok():
+            return 2
+
+        assert ok() == 2
+        samples = {tuple(sorted(labels.items())): value for labels, value in background_tasks_total.samples()}
+        assert samples[(("status", "success"), ("task", "unit_sync"))] == 1
@@ -0,0 +1,191 @@
+"""监控工具单元测试"""
+import pytest
+import time
+from unittest.mock import MagicMock
+from datetime import datetime
+from shared.utils.monitoring import MetricsCollector, AlertManager
+
+
+@pytest.mark.unit
+class TestMetricsCollector:
+    """指标收集器测试类"""
+    
+    def test_record_is_buffered_until_flush(self, text_redis):
+        """测试记录只写入缓冲区，刷新时批量写入"""
+        collector = MetricsCollector(redis_client=text_redis, flush_interval=3600)
+        collector._thread = MagicMock()  # 不启动后台线程
+        
+        for duration in (10.0, 20.0, 30.0):
+            collector.record_request("/api/v1/tasks", "GET", 200, duration, user_id="u1")
+        collector.record_error("ValueError", "/api/v1/tasks", "boom")
+        
+        assert text_redis.dbsize() == 0
+        assert collector.flush()
+        
+        metrics = collector.get_metrics(endpoint="/api/v1/tasks")
+        assert metrics["total_requests"] == 3
+        assert metrics["total_errors"] == 1
+        assert metrics["endpoint_requests"] == 3
+        assert metrics["avg_response_time_ms"] == 20.0
+        assert collector.get_buffer_stats()["pending_events"] == 0
+    
+    def test_flush_uses_single_pipeline(self):
+        """测试刷新只执行一次管道"""
+        redis_client = MagicMock()
+        pipe = MagicMock()
+        redis_client.pipeline.return_value = pipe
+        collector = MetricsCollector(redis_client=redis_client)
+        collector._thread = MagicMock()
+        
+        for _ in range(5):
+            collector.record_request("/health", "GET", 200, 1.0)
+        collector.flush()
+        
+        pipe.execute.assert_called_once()
+        date_key = datetime.utcnow().strftime("%Y-%m-%d")
+        pipe.incrby.assert_any_call(f"metrics:requests:total:{date_key}", 5)
+        redis_client.incr.assert_not_called()
+    
+    def test_bounded_buffer_drops_events(self):
+        """测试缓冲区满时丢弃事件并计数"""
+        collector = MetricsCollector(redis_client=MagicMock(), max_buffer_events=3)
+        collector._thread = MagicMock()
+        
+        for _ in range(5):
+            collector.record_request("/x", "GET", 200, 1.0)
+        
+        stats = collector.get_buffer_stats()
+        assert stats["pending_events"] == 3
+        assert stats["dropped_events"] == 2
+    
+    def test_failed_flush_counts_drops(self):
+        """测试Redis写入失败时计入丢弃"""
+        redis_client = MagicMock()
+        redis_client.pipeline.return_value.execute.side_effect = ConnectionError("down")
+        collector = MetricsCollector(redis_client=redis_client)
+        collector._thread = MagicMock()
+        
+        collector.record_request("/x", "GET", 200, 1.0)
+        
+        assert not collector.flush()
+        stats = collector.get_buffer_stats()
+        assert stats["flush_failures"] == 1
+        assert stats["dropped_events"] == 1
+    
+    def test_background_flush_on_threshold(self, text_redis):
+        """测试达到阈值时后台线程刷新"""
+        collector = MetricsCollector(redis_client=text_redis, flush_interval=3600, flush_threshold=2)
+        
+        collector.record_request("/x", "GET", 200, 1.0)
+        collector.record_request("/x", "GET", 200, 1.0)
+        deadline = time.time() + 2
+        while collector.get_buffer_stats()["flushes"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        
+        try:
+            assert collector.get_buffer_stats()["flushes"] == 1
+            assert collector.get_metrics()["total_requests"] == 2
+        finally:
+            collector.stop(timeout=2)
+
+
+@pytest.mark.unit
+class TestLatencyAlerts:
+    """延迟告警测试类"""
+    
+    def test_check_response_time_uses_histogram(self, text_redis):
+        """测试按窗口内直方图的分位数检查响应时间"""
+        collector = MetricsCollector(redis_client=text_redis)
+        collector._thread = MagicMock()
+        for _ in range(98):
+            collector.record_request("/api/v1/tasks", "GET", 200, 50.0)
+        for _ in range(2):
+            collector.record_request("/api/v1/tasks", "GET", 200, 3000.0)
+        collector.flush()
+        alerts = AlertManager(redis_client=text_redis, metrics=collector)
+        
+        assert not alerts.check_response_time("/api/v1/tasks", threshold_ms=1000)
+        assert alerts.check_response_time("/api/v1/tasks", threshold_ms=1000, percentile=99)
+        assert collector.get_latency("/api/v1/tasks", window_minutes=5).count == 100
+
+
+@pytest.mark.unit
+class TestErrorRateAlerts:
+    """错误率告警测试类"""
+    
+    def _collector(self, text_redis):
+        collector = MetricsCollector(redis_client=text_redis)
+        collector._thread = MagicMock()
+        return collector
+    
+    def test_window_counters_written_on_flush(self, text_redis):
+        """测试分钟计数器经缓冲写入并带过期时间，窗口通过一次MGET读取"""
+        collector = self._collector(text_redis)
+        for _ in range(7):
+            collector.record_request("/x", "GET", 200, 1.0)
+        collector.record_request("/x", "GET", 503, 1.0)
+        collector.record_error("ValueError", "/x", "boom")
+        collector.flush()
+        
+        window_keys = text_redis.keys("metrics:window:*")
+        assert window_keys and all(text_redis.ttl(key) > 0 for key in window_keys)
+        assert collector.get_window_counts(5) == {"requests": 9, "errors": 2}
+        
+        alerts = AlertManager(redis_client=text_redis, metrics=collector)
+        assert alerts.check_error_rate(threshold=0.2)
+        assert not alerts.check_error_rate(threshold=0.25)
+        assert not alerts.check_error_rate(threshold=0.2, min_requests=10)
+    
+    def test_evaluate_deduplicates_alerts(self, text_redis):
+        """测试规则触发后冷却期内不重复发送"""
+        collector = self._collector(text_redis)
+        for _ in range(5):
+            collector.record_error("ValueError", "/x", "boom")
+        collector.flush()
+        alerts = AlertManager(redis_client=text_redis, metrics=collector)
+        alerts.add_rule(alerts.error_rate_rule(threshold=0.5, min_requests=5))
+        alerts.send_alert = MagicMock()
+        
+        assert alerts.evaluate() == ["high_error_rate"]
+        assert alerts.evaluate() == []
+        
+        alerts.send_alert.assert_called_once()
+        name, message = alerts.send_alert.call_args[0]
+        assert name == "high_error_rate"
+        assert "5/5" in message
+    
+    def test_client_errors_not_counted_as_errors(self, text_redis):
+        """测试4xx异常只计入请求数，不计入告警窗口的错误数"""
+        collector = self._collector(text_redis)
+        for _ in range(5):
+            collector.record_error("ValidationError", "/x", "bad", status_code=400)
+        collector.flush()
+        alerts = AlertManager(redis_client=text_redis, metrics=collector)
+        alerts.add_rule(alerts.error_rate_rule(threshold=0.5, min_requests=5))
+        alerts.send_alert = MagicMock()
+        
+        assert alerts.evaluate() == []
+        alerts.send_alert.assert_not_called()
+    
+    def test_evaluate_survives_notification_failure(self, text_redis):
+        """测试发送告警失败时评估不抛出异常，后续规则继续执行"""
+        collector = self._collector(text_redis)
+        for _ in range(5):
+            collector.record_error("ValueError", "/x", "boom")
+        collector.flush()
+        alerts = AlertManager(redis_client=text_redis, metrics=collector)
+        alerts.add_rule(alerts.error_rate_rule(threshold=0.5, min_requests=5))
+        alerts.send_alert = MagicMock(side_effect=ConnectionError("redis down"))
+        
+        assert alerts.evaluate() == []
+        alerts.send_alert.assert_called_once()
+    
+    def test_rule_below_min_requests_does_not_fire(self, text_redis):
+        """测试低流量时不触发"""
+        collector = self._collector(text_redis)
+        collector.record_error("ValueError", "/x", "boom")
+        collector.flush()
+        alerts = AlertManager(redis_client=text_redis, metrics=collector)
+        alerts.add_rule(alerts.error_rate_rule(threshold=0.1, min_requests=20))
+        
+        assert alerts.evaluate() == []
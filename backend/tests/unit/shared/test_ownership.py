@@ -0,0 +1,88 @@
+"""资源归属缓存单元测试"""
+import pytest
+from uuid import uuid4
+from shared.utils.cache import CacheManager
+from shared.utils.ownership import OwnershipCache, CONVERSATION
+
+
+@pytest.mark.unit
+class TestOwnershipCache:
+    """资源归属缓存测试类"""
+    
+    def test_owner_loaded_once(self, fake_redis):
+        """测试归属只从数据库加载一次"""
+        ownership = OwnershipCache(cache=CacheManager(redis_client=fake_redis))
+        conversation_id, user_id = uuid4(), uuid4()
+        calls = []
+        
+        def loader():
+            calls.append(conversation_id)
+            return user_id
+        
+        assert ownership.is_owner(CONVERSATION, conversation_id, user_id, loader)
+        assert ownership.is_owner(CONVERSATION, conversation_id, user_id, loader)
+        assert not ownership.is_owner(CONVERSATION, conversation_id, uuid4(), loader)
+        assert len(calls) == 1
+    
+    def test_negative_entry(self, fake_redis):
+        """测试不存在的资源被负缓存"""
+        ownership = OwnershipCache(cache=CacheManager(redis_client=fake_redis), negative_ttl=10)
+        forged_id = uuid4()
+        calls = []
+        
+        def loader():
+            calls.append(forged_id)
+            return None
+        
+        assert ownership.get_owner(CONVERSATION, forged_id, loader) is None
+        assert ownership.get_owner(CONVERSATION, forged_id, loader) is None
+        assert len(calls) == 1
+        assert ownership.peek(CONVERSATION, forged_id) == ""
+        assert 0 < fake_redis.ttl(f"owner:{CONVERSATION}:{forged_id}") <= 10
+    
+    def test_invalidate_and_remember(self, fake_redis):
+        """测试删除后失效、创建后覆盖负缓存"""
+        ownership = OwnershipCache(cache=CacheManager(redis_client=fake_redis))
+        conversation_id, user_id = uuid4(), uuid4()
+        
+        ownership.remember(CONVERSATION, conversation_id, user_id)
+        assert ownership.peek(CONVERSATION, conversation_id) == str(user_id)
+        
+        ownership.invalidate(CONVERSATION, conversation_id)
+        assert ownership.get_owner(CONVERSATION, conversation_id, lambda: user_id) is None
+    
+    async def test_async_loader(self, fake_redis):
+        """测试异步加载函数（AsyncSession查询）同样只调用一次"""
+        ownership = OwnershipCache(cache=CacheManager(redis_client=fake_redis))
+        task_id, user_id = uuid4(), uuid4()
+        calls = []
+        
+        async def loader():
+            calls.append(task_id)
+            return user_id
+        
+        assert await ownership.is_owner_async(CONVERSATION, task_id, user_id, loader)
+        assert not await ownership.is_owner_async(CONVERSATION, task_id, uuid4(), loader)
+        assert len(calls) == 1
+    
+    async def test_async_methods_run_off_loop(self, fake_redis):
+        """测试异步方法在线程中访问缓存，不阻塞事件循环"""
+        import threading
+        cache = CacheManager(redis_client=fake_redis)
+        threads = []
+        original_get = cache.get
+        
+        def tracking_get(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return original_get(*args, **kwargs)
+        
+        cache.get = tracking_get
+        ownership = OwnershipCache(cache=cache)
+        conversation_id, user_id = uuid4(), uuid4()
+        
+        await ownership.remember_async(CONVERSATION, conversation_id, user_id)
+        assert await ownership.peek_async(CONVERSATION, conversation_id) == str(user_id)
+        await ownership.invalidate_async(CONVERSATION, conversation_id)
+        assert await ownership.peek_async(CONVERSATION, conversation_id) == ""
+        
+        assert threads and threading.get_ident() not in threads
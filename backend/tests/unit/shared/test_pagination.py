@@ -0,0 +1,67 @@
+"""游标分页工具单元测试"""
+import pytest
+from uuid import UUID, uuid4
+from datetime import datetime
+from sqlalchemy.dialects import postgresql
+from shared.models.db_models import Conversation, Message, Task
+from shared.utils.exceptions import ValidationError
+from shared.utils.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_before,
+    parse_bool,
+    split_page,
+)
+
+
+@pytest.mark.unit
+class TestPagination:
+    """游标分页工具测试类"""
+    
+    def test_cursor_round_trip(self):
+        """测试游标编码后能还原排序键"""
+        created_at = datetime(2026, 1, 15, 10, 30, 5, 123456)
+        item_id = uuid4()
+        
+        cursor = encode_cursor(True, created_at, item_id)
+        
+        assert "=" not in cursor
+        assert decode_cursor(cursor, parse_bool, datetime.fromisoformat, UUID) == [True, created_at, item_id]
+    
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor(1, 2), encode_cursor("x", str(uuid4()))])
+    def test_invalid_cursor(self, cursor):
+        """测试格式错误或与排序键不匹配的游标"""
+        with pytest.raises(ValidationError) as exc_info:
+            decode_cursor(cursor, datetime.fromisoformat, UUID)
+        assert exc_info.value.field == "cursor"
+    
+    def test_split_page(self):
+        """测试多取一行时才生成下一页游标"""
+        items, cursor = split_page([1, 2, 3], 2, lambda x: (x,))
+        assert items == [1, 2]
+        assert decode_cursor(cursor, int) == [2]
+        
+        items, cursor = split_page([1, 2], 2, lambda x: (x,))
+        assert items == [1, 2]
+        assert cursor is None
+    
+    @pytest.mark.parametrize("model,table", [(Message, "messages"), (Task, "tasks")])
+    def test_keyset_row_comparison(self, model, table):
+        """测试消息、任务游标条件编译为行值比较，可直接走 (…, created_at, id) 索引"""
+        condition = keyset_before((model.created_at, model.id), (datetime(2026, 1, 1), uuid4()))
+        sql = str(condition.compile(dialect=postgresql.dialect()))
+        
+        assert sql.startswith(f"({table}.created_at, {table}.id) < (")
+        assert " OR " not in sql
+    
+    def test_keyset_expanded_has_leading_range(self):
+        """测试展开形式以首列范围条件开头，OR只在范围内过滤"""
+        condition = keyset_before(
+            (Conversation.is_pinned, Conversation.updated_at, Conversation.id),
+            (True, datetime(2026, 1, 1), uuid4()),
+            row_value=False
+        )
+        sql = " ".join(str(condition.compile(dialect=postgresql.dialect())).split())
+        
+        assert sql.startswith("conversations.is_pinned <= %(param_1)s AND (")
+        assert sql.count(" OR ") == 2
@@ -0,0 +1,78 @@
+"""采样性能分析器测试"""
+import threading
+import time
+
+import pytest
+
+from shared.utils.exceptions import ConflictError
+from shared.utils.profiler import EVENT_LOOP_THREAD, SamplingProfiler
+
+
+def _busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _blocking_call(stop: threading.Event):
+    while not stop.is_set():
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def threads():
+    """一个忙碌线程、一个模拟阻塞事件循环的线程、一个空闲线程"""
+    stop = threading.Event()
+    idle = threading.Event()
+    workers = [
+        threading.Thread(target=_busy_worker, args=(stop,), name="ThreadPoolExecutor-0_1"),
+        threading.Thread(target=_blocking_call, args=(stop,), name="loop"),
+        threading.Thread(target=idle.wait, name="idle-worker"),
+    ]
+    for worker in workers:
+        worker.start()
+    yield workers
+    stop.set()
+    idle.set()
+    for worker in workers:
+        worker.join()
+
+
+@pytest.mark.unit
+class TestSamplingProfiler:
+    """采样分析器测试类"""
+
+    def test_collapsed_stacks(self, threads):
+        """折叠栈按线程归类，线程池线程合并，空闲线程默认跳过"""
+        profiler = SamplingProfiler()
+        result = profiler.profile(0.2, interval=0.005, loop_thread_id=threads[1].ident)
+
+        lines = result["collapsed"].splitlines()
+        assert result["samples"] > 1
+        assert any(line.startswith("ThreadPoolExecutor;") and "_busy_worker" in line for line in lines)
+        assert any(line.startswith(f"{EVENT_LOOP_THREAD};") and "_blocking_call" in line for line in lines)
+        assert not any(line.startswith("idle-worker;") for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert result["threads"]["idle-worker"]["idle"] == result["threads"]["idle-worker"]["samples"]
+        assert result["eventLoop"]["busyRatio"] == 1.0
+
+    def test_include_idle(self, threads):
+        """include_idle保留空闲线程的栈"""
+        result = SamplingProfiler().profile(0.05, interval=0.005, include_idle=True)
+
+        assert "idle-worker;" in result["collapsed"]
+        assert result["eventLoop"] is None
+
+    def test_single_profile_per_process(self):
+        """同一时间只允许运行一个分析"""
+        profiler = SamplingProfiler()
+        worker = threading.Thread(target=profiler.profile, args=(5,))
+        worker.start()
+        try:
+            while not profiler.running:
+                time.sleep(0.001)
+            with pytest.raises(ConflictError):
+                profiler.profile(0.01)
+        finally:
+            profiler.stop()
+            worker.join()
+        assert not profiler.running
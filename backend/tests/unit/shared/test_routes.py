@@ -0,0 +1,80 @@
+"""路由模板解析测试"""
+import uuid
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from shared.utils.routes import (
+    OVERFLOW_ROUTE,
+    UNMATCHED_ROUTE,
+    RouteLabelLimiter,
+    normalize_path,
+    resolve_route,
+)
+
+
+def _make_app(seen: list) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/tasks/{task_id}")
+    async def get_task(task_id: str):
+        return {"task_id": task_id}
+
+    @app.api_route("/proxy/{path:path}", methods=["GET"])
+    async def proxy(path: str):
+        return {"path": path}
+
+    @app.middleware("http")
+    async def capture_route(request: Request, call_next):
+        response = await call_next(request)
+        seen.append(resolve_route(request))
+        return response
+
+    return app
+
+
+@pytest.mark.unit
+class TestRouteResolution:
+    """路由模板解析测试"""
+
+    def test_matched_route_uses_template(self):
+        """匹配的路由返回模板而不是原始路径"""
+        seen = []
+        client = TestClient(_make_app(seen))
+        client.get(f"/api/v1/tasks/{uuid.uuid4()}")
+        client.get(f"/api/v1/tasks/{uuid.uuid4()}")
+        assert seen == ["/api/v1/tasks/{task_id}", "/api/v1/tasks/{task_id}"]
+
+    def test_unknown_path_is_bucketed(self):
+        """未匹配的路径归入统一标签"""
+        seen = []
+        client = TestClient(_make_app(seen))
+        client.get("/wp-admin/setup.php")
+        assert seen == [UNMATCHED_ROUTE]
+
+    def test_catch_all_route_normalizes_ids(self):
+        """通配路由退回到替换ID片段后的路径"""
+        seen = []
+        client = TestClient(_make_app(seen))
+        client.get(f"/proxy/api/v1/conversations/{uuid.uuid4()}/messages")
+        assert seen == ["/proxy/api/v1/conversations/{id}/messages"]
+
+    def test_normalize_path(self):
+        """UUID、数字和长十六进制串被替换"""
+        assert normalize_path("/api/v1/tasks/42") == "/api/v1/tasks/{id}"
+        assert normalize_path(f"/a/{uuid.uuid4().hex}/b") == "/a/{id}/b"
+        assert normalize_path("/api/v1/health") == "/api/v1/health"
+
+
+@pytest.mark.unit
+class TestRouteLabelLimiter:
+    """端点标签数量上限测试"""
+
+    def test_overflow_after_cap(self):
+        """超过上限的新端点归入 OVERFLOW_ROUTE，已有端点不受影响"""
+        limiter = RouteLabelLimiter(max_labels=2)
+        assert limiter.label("/a") == "/a"
+        assert limiter.label("/b") == "/b"
+        assert limiter.label("/c") == OVERFLOW_ROUTE
+        assert limiter.label("/a") == "/a"
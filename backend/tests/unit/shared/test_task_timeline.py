@@ -0,0 +1,91 @@
+"""任务阶段耗时记录测试"""
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+
+from shared.utils.task_timeline import (
+    DB_PERSIST,
+    KEY_LOOKUP,
+    QUEUE_WAIT,
+    TaskLogWriter,
+    TaskTimeline,
+)
+
+
+def _writer(session=None, **kwargs):
+    session = session or MagicMock()
+    writer = TaskLogWriter(session_factory=lambda: session, **kwargs)
+    writer._thread = MagicMock()  # 不启动后台线程
+    return writer, session
+
+
+@pytest.mark.unit
+class TestTaskLogWriter:
+    """批量写入器测试类"""
+
+    def test_flush_inserts_batch_in_one_statement(self):
+        """缓冲的事件在一个事务中通过一条语句批量插入"""
+        writer, session = _writer()
+        task_id = uuid.uuid4()
+        for stage in (QUEUE_WAIT, KEY_LOOKUP, DB_PERSIST):
+            writer.record(task_id, stage, 12.5)
+
+        assert writer.get_stats()["pending"] == 3
+        assert writer.flush()
+
+        session.execute.assert_called_once()
+        rows = session.execute.call_args[0][1]
+        assert [row["message"] for row in rows] == [QUEUE_WAIT, KEY_LOOKUP, DB_PERSIST]
+        assert rows[0]["details"] == {"stage": QUEUE_WAIT, "duration_ms": 12.5}
+        session.commit.assert_called_once()
+        assert writer.get_stats()["written"] == 3
+
+    def test_failed_flush_counts_drops(self):
+        """写入失败时回滚并计入丢弃"""
+        session = MagicMock()
+        session.execute.side_effect = RuntimeError("db down")
+        writer, _ = _writer(session)
+        writer.record(uuid.uuid4(), KEY_LOOKUP, 1.0)
+
+        assert not writer.flush()
+        session.rollback.assert_called_once()
+        stats = writer.get_stats()
+        assert stats["dropped"] == 1 and stats["flush_failures"] == 1
+
+    def test_bounded_buffer(self):
+        """缓冲区满时丢弃事件"""
+        writer, _ = _writer(max_pending=2)
+        for _ in range(3):
+            writer.record(uuid.uuid4(), KEY_LOOKUP, 1.0)
+        assert writer.get_stats() == {"written": 0, "dropped": 1, "flush_failures": 0, "pending": 2}
+
+
+@pytest.mark.unit
+class TestTaskTimeline:
+    """阶段计时测试类"""
+
+    def test_stage_records_duration_and_details(self):
+        """阶段耗时和补充详情写入事件"""
+        writer, _ = _writer()
+        timeline = TaskTimeline(uuid.uuid4(), writer)
+        with timeline.stage(DB_PERSIST, provider="gemini") as details:
+            details["rows"] = 2
+
+        row = writer._pending[0]
+        assert row["level"] == "info"
+        assert row["details"]["provider"] == "gemini"
+        assert row["details"]["rows"] == 2
+        assert row["details"]["duration_ms"] >= 0
+
+    def test_stage_failure_is_recorded_as_error(self):
+        """阶段抛出异常时以error级别记录并继续抛出"""
+        writer, _ = _writer()
+        timeline = TaskTimeline(uuid.uuid4(), writer)
+        with pytest.raises(ValueError):
+            with timeline.stage(KEY_LOOKUP):
+                raise ValueError("用户未配置API密钥")
+
+        row = writer._pending[0]
+        assert row["level"] == "error"
+        assert "用户未配置API密钥" in row["details"]["error"]
@@ -0,0 +1,83 @@
+"""多分辨率时间序列测试"""
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from shared.utils.monitoring import MetricsCollector
+from shared.utils.timeseries import RollupTier, TimeSeriesStore
+
+
+@pytest.mark.unit
+class TestTimeSeriesStore:
+    """时间序列存储测试类"""
+
+    def test_write_rolls_up_into_all_tiers(self, text_redis):
+        """同一增量累加到所有层级，各层级按自身精度对齐"""
+        store = TimeSeriesStore(redis_client=text_redis)
+        base = int(time.time()) // 3600 * 3600
+        for offset in (1, 5, 12, 65):
+            store.add("requests:total", 1, timestamp=base + offset)
+
+        fine = store.range("requests:total", base, base + 69, tier="10s")
+        assert fine["resolution"] == 10
+        assert [value for _, value in fine["points"]] == [2, 1, 0, 0, 0, 0, 1]
+
+        minute = store.range("requests:total", base, base + 119, tier="1m")
+        assert minute["points"] == [[base, 3], [base + 60, 1]]
+
+        hour = store.range("requests:total", base, base, tier="1h")
+        assert hour["points"] == [[base, 4]]
+
+    def test_each_tier_has_own_ttl(self, text_redis):
+        """每个层级的哈希按层级保留时间过期"""
+        store = TimeSeriesStore(redis_client=text_redis)
+        store.add("errors:total")
+
+        ttls = {key.split(":")[3]: text_redis.ttl(key) for key in text_redis.keys("ts:errors:total:*")}
+        assert set(ttls) == {"10s", "1m", "1h"}
+        assert 0 < ttls["10s"] <= 6 * 3600 + 3600
+        assert ttls["10s"] < ttls["1m"] < ttls["1h"]
+
+    def test_select_tier_by_range_and_retention(self):
+        """自动选择点数不超过上限且保留时间覆盖起点的最高精度层级"""
+        store = TimeSeriesStore(redis_client=MagicMock(), max_points=1000)
+        now = time.time()
+        assert store.select_tier(now - 3600, now).name == "10s"
+        assert store.select_tier(now - 12 * 3600, now).name == "1m"
+        assert store.select_tier(now - 10 * 86400, now).name == "1h"
+
+    def test_range_limits_points(self, text_redis):
+        """指定层级时最多返回max_points个点（保留最近的点）"""
+        store = TimeSeriesStore(
+            redis_client=text_redis,
+            tiers=(RollupTier("10s", 10, 3600, 3600),),
+            max_points=5
+        )
+        result = store.range("x", 0, 1000, tier="10s")
+        assert [ts for ts, _ in result["points"]] == [960, 970, 980, 990, 1000]
+
+
+@pytest.mark.unit
+class TestCollectorSeries:
+    """指标收集器时间序列测试类"""
+
+    def test_flush_writes_series_and_daily_ttl(self, text_redis):
+        """请求和错误写入时间序列，按天计数器带过期时间"""
+        collector = MetricsCollector(redis_client=text_redis)
+        collector._thread = MagicMock()
+        collector.record_request("/api/v1/tasks/{task_id}", "GET", 200, 5.0)
+        collector.record_request("/api/v1/tasks/{task_id}", "GET", 500, 5.0)
+        collector.flush()
+
+        now = time.time()
+        total = collector.get_series("requests:total", now - 60, now)
+        errors = collector.get_series("errors:/api/v1/tasks/{task_id}", now - 60, now)
+        server_errors = collector.get_series("status:5xx", now - 60, now)
+        assert total["tier"] == "10s"
+        assert sum(value for _, value in total["points"]) == 2
+        assert sum(value for _, value in errors["points"]) == 1
+        assert sum(value for _, value in server_errors["points"]) == 1
+
+        daily_keys = text_redis.keys("metrics:requests:*")
+        assert daily_keys and all(text_redis.ttl(key) > 0 for key in daily_keys)
@@ -0,0 +1,130 @@
+"""分布式追踪测试"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from shared.middleware.error_handler import error_handler_middleware
+from shared.utils.tracing import (
+    FileExporter,
+    InMemoryExporter,
+    SpanContext,
+    instrument_sqlalchemy,
+    traced,
+    tracer,
+)
+
+
+@pytest.fixture
+def memory_exporter():
+    """临时把全局追踪器切换到内存导出器"""
+    exporter = InMemoryExporter()
+    previous = (tracer.exporter, tracer.sample_ratio)
+    tracer.configure(exporter=exporter, sample_ratio=1.0)
+    yield exporter
+    tracer.exporter, tracer.sample_ratio = previous
+
+
+@pytest.mark.unit
+class TestTraceparent:
+    """traceparent解析测试类"""
+
+    def test_round_trip(self):
+        """格式化后可以解析回同样的上下文"""
+        context = SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", sampled=True)
+        header = context.to_traceparent()
+        assert header == "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        parsed = SpanContext.from_traceparent(header)
+        assert (parsed.trace_id, parsed.span_id, parsed.sampled) == (context.trace_id, context.span_id, True)
+
+    def test_invalid_headers(self):
+        """无效的traceparent被忽略"""
+        assert SpanContext.from_traceparent(None) is None
+        assert SpanContext.from_traceparent("garbage") is None
+        assert SpanContext.from_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+
+
+@pytest.mark.unit
+class TestTracer:
+    """追踪器测试类"""
+
+    def test_nested_spans_share_trace(self, memory_exporter):
+        """子span继承追踪ID和父span"""
+        with tracer.span("parent") as parent:
+            with tracer.span("child") as child:
+                pass
+        spans = {span["name"]: span for span in memory_exporter.get_trace(parent.trace_id)}
+        assert spans["child"]["parent_id"] == parent.span_id
+        assert child.trace_id == parent.trace_id
+
+    def test_unsampled_root_is_not_exported(self, memory_exporter):
+        """未采样的追踪仍传播上下文，但不导出"""
+        tracer.configure(sample_ratio=0.0)
+        headers = {}
+        with tracer.span("root") as root:
+            tracer.inject(headers)
+        assert headers["traceparent"].endswith("-00")
+        assert memory_exporter.get_trace(root.trace_id) == []
+
+    def test_async_decorator_records_error(self, memory_exporter):
+        """装饰器记录异步函数的异常"""
+        @traced("provider.call", kind="client")
+        async def call():
+            raise RuntimeError("boom")
+
+        with tracer.span("root") as root:
+            with pytest.raises(RuntimeError):
+                asyncio.run(call())
+        provider = [s for s in memory_exporter.get_trace(root.trace_id) if s["name"] == "provider.call"][0]
+        assert provider["status"] == "error"
+        assert provider["kind"] == "client"
+
+    def test_sqlalchemy_queries_create_spans(self, memory_exporter):
+        """有追踪上下文时SQL执行生成db.query span"""
+        instrument_sqlalchemy()
+        engine = create_engine("sqlite://")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            with tracer.span("request") as root:
+                conn.execute(text("SELECT 2"))
+        spans = memory_exporter.get_trace(root.trace_id)
+        queries = [span for span in spans if span["name"] == "db.query"]
+        assert len(queries) == 1
+        assert queries[0]["attributes"]["db.statement"] == "SELECT 2"
+        assert queries[0]["parent_id"] == root.span_id
+
+    def test_file_exporter_writes_json_lines(self, tmp_path):
+        """文件导出器每个span一行"""
+        exporter = FileExporter(str(tmp_path / "traces.jsonl"))
+        exporter.export([{"name": "a"}, {"name": "b"}])
+        assert len((tmp_path / "traces.jsonl").read_text(encoding="utf-8").splitlines()) == 2
+
+
+@pytest.mark.unit
+class TestTracingMiddleware:
+    """中间件追踪传播测试类"""
+
+    def test_continues_incoming_trace(self, memory_exporter):
+        """请求携带traceparent时延续上游追踪，并在响应头返回"""
+        app = FastAPI()
+        seen = {}
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str, request: Request):
+            seen["span"] = tracer.current_span()
+            return {"id": item_id}
+
+        @app.middleware("http")
+        async def error_handler(request, call_next):
+            return await error_handler_middleware(request, call_next)
+
+        upstream = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        response = TestClient(app).get("/items/1", headers={"traceparent": upstream})
+
+        assert response.headers["traceparent"].startswith("00-4bf92f3577b34da6a3ce929d0e0e4736-")
+        server = [s for s in memory_exporter.get_trace("4bf92f3577b34da6a3ce929d0e0e4736") if s["kind"] == "server"][0]
+        assert server["parent_id"] == "00f067aa0ba902b7"
+        assert server["name"] == "GET /items/{item_id}"
+        assert seen["span"].trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"